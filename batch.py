@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from puzzle import PuzzleState
+from packed import decode_moves, solution_moves
+from heuristics import HEURISTICS
+from search import ALGORITHMS
+from metrics import MetricsRecorder
+from scramble import Corpus, is_corpus
+from profiling import MODES, profile_search
+
+
+def parse_board(line: str) -> List[int]:
+    tiles = [int(token) for token in line.replace(",", " ").split()]
+    size = int(round(len(tiles) ** 0.5))
+    if size < 2 or size * size != len(tiles) or sorted(tiles) != list(range(len(tiles))):
+        raise ValueError(f"not a valid board: {line.strip()!r}")
+    return tiles
+
+
+def read_boards(lines: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    index = 0
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        yield index, line
+        index += 1
+
+
+def solve_board(
+    index: int,
+    line: str,
+    algorithm: str,
+    heuristic: str,
+    max_nodes: int,
+    time_limit: Optional[float],
+    metrics: bool = False,
+    weight: Optional[float] = None,
+    profile: Optional[str] = None,
+    profile_dir: str = "profiles",
+) -> dict:
+    result = {"index": index, "board": line}
+    try:
+        tiles = parse_board(line)
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+    state = PuzzleState(int(round(len(tiles) ** 0.5)), tiles)
+    result["board"] = tiles
+    recorder = MetricsRecorder() if metrics else None
+    options = {} if weight is None else {"weight": weight}
+    start_time = time.perf_counter()
+    if profile is None:
+        solution, stats = ALGORITHMS[algorithm](
+            state, HEURISTICS[heuristic], max_nodes, time_limit, recorder=recorder, **options
+        )
+    else:
+        extension = {"cprofile": "prof", "tracemalloc": "snapshot"}.get(profile)
+        solution, stats = profile_search(
+            ALGORITHMS[algorithm],
+            state,
+            HEURISTICS[heuristic],
+            max_nodes,
+            time_limit,
+            recorder=recorder,
+            mode=profile,
+            output=extension and os.path.join(profile_dir, f"board-{index}.{extension}"),
+            **options,
+        )
+    result["time"] = time.perf_counter() - start_time
+    result["solved"] = solution is not None
+    result["moves"] = decode_moves(solution_moves(solution)) if solution else None
+    result["stats"] = stats
+    if recorder is not None:
+        result["metrics"] = recorder.to_dict()
+    return result
+
+
+def run_batch(
+    lines: Iterable[str],
+    output: TextIO,
+    algorithm: str = "best_first",
+    heuristic: str = "manhattan_distance",
+    max_nodes: int = 100000,
+    time_limit: Optional[float] = None,
+    workers: Optional[int] = None,
+    metrics: bool = False,
+    weight: Optional[float] = None,
+    profile: Optional[str] = None,
+    profile_dir: str = "profiles",
+) -> int:
+    workers = workers or os.cpu_count() or 1
+    boards = read_boards(lines)
+    completed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < workers * 4:
+                board = next(boards, None)
+                if board is None:
+                    exhausted = True
+                    break
+                future = pool.submit(
+                    solve_board,
+                    *board,
+                    algorithm,
+                    heuristic,
+                    max_nodes,
+                    time_limit,
+                    metrics,
+                    weight,
+                    profile,
+                    profile_dir,
+                )
+                pending[future] = board
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, line = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"index": index, "board": line, "error": f"{type(e).__name__}: {e}"}
+                output.write(json.dumps(result) + "\n")
+                completed += 1
+            output.flush()
+    return completed
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Solve boards from a file or stdin and stream JSON lines."
+    )
+    parser.add_argument(
+        "input", nargs="?", default="-", help="board file or corpus, '-' for stdin"
+    )
+    parser.add_argument("-o", "--output", default="-", help="output file, '-' for stdout")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="best_first")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS), default="manhattan_distance")
+    parser.add_argument("--max-nodes", type=int, default=100000)
+    parser.add_argument("--time-limit", type=float, help="seconds per board")
+    parser.add_argument(
+        "--weight",
+        type=float,
+        help="heuristic weight for weighted_a_star, or the starting weight for anytime",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=MODES,
+        help="attach a timing breakdown; cprofile/tracemalloc also dump one file per board",
+    )
+    parser.add_argument("--profile-dir", default="profiles")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument(
+        "--metrics", action="store_true", help="include downsampled search metrics"
+    )
+    args = parser.parse_args(argv)
+
+    if args.input != "-" and is_corpus(args.input):
+        corpus = Corpus(args.input)
+        source = (" ".join(map(str, board)) for board in corpus)
+    else:
+        source = sys.stdin if args.input == "-" else open(args.input)
+    sink = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        run_batch(
+            source,
+            sink,
+            args.algorithm,
+            args.heuristic,
+            args.max_nodes,
+            args.time_limit,
+            args.workers,
+            args.metrics,
+            args.weight,
+            args.profile,
+            args.profile_dir,
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,586 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from puzzle import PuzzleState
+from heuristics import HEURISTICS
+from search import ALGORITHMS
+from scramble import Corpus, scramble
+from parity import inversion_count, is_solvable
+
+DEFAULT_DEPTHS = {3: (8, 16, 24), 4: (20, 40), 5: (20, 40)}
+HIGHER_IS_BETTER = ("nodes_per_sec", "ops_per_sec", "solved")
+LOWER_IS_BETTER = ("wall_time", "peak_rss_kb", "solution_length")
+HEAVY_MODULES = ("PyQt5", "matplotlib", "numpy", "multiprocessing", "sqlite3")
+
+_STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from puzzle import PuzzleState
+from search import best_first_search
+from heuristics import manhattan_distance
+imported = time.perf_counter()
+solution, stats = best_first_search(PuzzleState({size}, {tiles}), manhattan_distance)
+solved = time.perf_counter()
+heavy = [name for name in {heavy} if name in sys.modules]
+print(json.dumps([imported - start, solved - imported, solution.depth, heavy]))
+"""
+
+
+def make_corpus(size: int, depth: int, count: int, seed: int) -> List[List[int]]:
+    measure = "exact" if size == 3 else "walk"
+    boards = scramble(size, (depth, depth), f"{seed}:{size}:{depth}", measure, count=count)
+    return [list(board) for board in boards]
+
+
+def peak_rss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def _time_ops(fn: Callable[[], None], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    elapsed = time.perf_counter() - start
+    return repeat / elapsed if elapsed > 0 else float("inf")
+
+
+def bench_heuristic(name: str, size: int, corpus: List[List[int]], repeat: int) -> dict:
+    heuristic_fn = HEURISTICS[name]
+    states = [PuzzleState(size, tiles) for tiles in corpus]
+    heuristic_fn(states[0])
+
+    def run():
+        for state in states:
+            heuristic_fn(state)
+
+    return {"ops_per_sec": _time_ops(run, repeat) * len(states)}
+
+
+def bench_state_ops(size: int, corpus: List[List[int]], repeat: int) -> Dict[str, dict]:
+    states = [PuzzleState(size, tiles) for tiles in corpus]
+    directions = [state.get_valid_moves()[0] for state in states]
+
+    def move():
+        for state, direction in zip(states, directions):
+            state.move(direction)
+
+    def copy():
+        for state in states:
+            state.copy()
+
+    def is_solvable():
+        for state in states:
+            state.is_solvable()
+
+    return {
+        name: {"ops_per_sec": _time_ops(fn, repeat) * len(states)}
+        for name, fn in (("move", move), ("copy", copy), ("is_solvable", is_solvable))
+    }
+
+
+def _quadratic_is_solvable(tiles: List[int], size: int) -> bool:
+    inversions = 0
+    for i in range(len(tiles)):
+        if tiles[i] == 0:
+            continue
+        for j in range(i + 1, len(tiles)):
+            if tiles[j] == 0:
+                continue
+            if tiles[i] > tiles[j]:
+                inversions += 1
+    blank_row_from_bottom = size - tiles.index(0) // size
+    if size % 2 == 1:
+        return inversions % 2 == 0
+    return (inversions + blank_row_from_bottom) % 2 == 1
+
+
+def bench_parity(size: int, count: int, seed: int, repeat: int) -> Dict[str, dict]:
+    rng = random.Random(f"{seed}:{size}:parity")
+    boards = [rng.sample(range(size * size), size * size) for _ in range(count)]
+    methods = {
+        "quadratic": lambda tiles: _quadratic_is_solvable(tiles, size),
+        "fenwick": inversion_count,
+        "cycles": lambda tiles: is_solvable(tiles, size),
+    }
+    results = {}
+    for name, fn in methods.items():
+
+        def run():
+            for tiles in boards:
+                fn(tiles)
+
+        results[name] = {"ops_per_sec": _time_ops(run, repeat) * count}
+    try:
+        import numpy as np
+        from vectorized import batch_is_solvable
+    except ImportError:
+        pass
+    else:
+        array = np.array(boards, dtype=np.uint8)
+        results["numpy"] = {
+            "ops_per_sec": _time_ops(lambda: batch_is_solvable(array), repeat) * count
+        }
+    baseline = results["quadratic"]["ops_per_sec"]
+    for result in results.values():
+        result["speedup"] = result["ops_per_sec"] / baseline
+    return results
+
+
+def bench_visited(size: int, count: int, seed: int) -> Dict[str, dict]:
+    from packed import pack_tiles, tile_bits
+    from visited import make_visited, set_bytes_per_entry
+
+    rng = random.Random(f"{seed}:{size}:visited")
+    bits = tile_bits(size)
+    keys = [pack_tiles(PuzzleState(size).shuffle(rng=rng).tiles, bits) for _ in range(count)]
+    factories = {"set": set, "index": lambda: make_visited(size)}
+    if size == 3:
+        factories["bitset"] = lambda: make_visited(size, bitset=True)
+    results = {}
+    for name, factory in factories.items():
+        visited = factory()
+        start = time.perf_counter()
+        for key in keys:
+            visited.add(key)
+        for key in keys:
+            key in visited
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "ops_per_sec": 2 * count / elapsed,
+            "bytes_per_entry": (
+                set_bytes_per_entry(keys) if name == "set" else visited.bytes_per_entry()
+            ),
+        }
+    return results
+
+
+def bench_startup(size: int, repeat: int, seed: int = 0) -> dict:
+    tiles = make_corpus(size, 20, 1, seed)[0]
+    script = _STARTUP_SCRIPT.format(size=size, tiles=tiles, heavy=HEAVY_MODULES)
+    root = os.path.dirname(os.path.abspath(__file__))
+    walls, imports, solves = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=root, capture_output=True, text=True, check=True
+        ).stdout
+        walls.append(time.perf_counter() - start)
+        import_time, solve_time, depth, heavy = json.loads(output)
+        imports.append(import_time)
+        solves.append(solve_time)
+    return {
+        "wall_time": statistics.median(walls),
+        "import_time": statistics.median(imports),
+        "solve_time": statistics.median(solves),
+        "solution_length": depth,
+        "heavy_modules": heavy,
+    }
+
+
+def bench_node_counts(
+    size: int,
+    corpus: List[List[int]],
+    heuristics: List[str],
+    algorithm: str = "ida_star",
+    max_nodes: int = 10000000,
+) -> Dict[str, dict]:
+    results = {}
+    for name in heuristics:
+        nodes = 0
+        lengths = 0
+        start = time.perf_counter()
+        for tiles in corpus:
+            solution, stats = ALGORITHMS[algorithm](
+                PuzzleState(size, tiles), HEURISTICS[name], max_nodes
+            )
+            nodes += stats["nodes_expanded"]
+            lengths += solution.depth if solution else 0
+        results[name] = {
+            "nodes": nodes,
+            "wall_time": time.perf_counter() - start,
+            "solution_length": lengths,
+        }
+    baseline = results[heuristics[0]]["nodes"]
+    for result in results.values():
+        result["node_ratio"] = result["nodes"] / baseline if baseline else 1.0
+    return results
+
+
+def record_frontier_trace(size: int, corpus: List[List[int]], max_nodes: int) -> List[int]:
+    from frontier import FRONTIERS, HeapQueue
+    from search import best_first_search
+    from heuristics import manhattan_distance
+
+    trace: List[int] = []
+
+    class TracingQueue(HeapQueue):
+        def push(self, priority: int, item: int) -> bool:
+            trace.append(priority)
+            return super().push(priority, item)
+
+        def pop(self):
+            trace.append(-1)
+            return super().pop()
+
+    FRONTIERS["trace"] = TracingQueue
+    try:
+        for tiles in corpus:
+            best_first_search(PuzzleState(size, tiles), manhattan_distance, max_nodes, frontier="trace")
+            trace.append(-2)
+    finally:
+        del FRONTIERS["trace"]
+    return trace
+
+
+def replay_frontier(name: str, trace: List[int]) -> dict:
+    from frontier import FRONTIERS
+
+    def run(measure_memory: bool) -> Tuple[float, int]:
+        queue = FRONTIERS[name]()
+        peak = 0
+        if measure_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        for item, op in enumerate(trace):
+            if op >= 0:
+                queue.push(op, item)
+            elif op == -1:
+                queue.pop()
+            else:
+                if measure_memory:
+                    peak = max(peak, tracemalloc.get_traced_memory()[1])
+                    tracemalloc.stop()
+                    tracemalloc.start()
+                queue = FRONTIERS[name]()
+        elapsed = time.perf_counter() - start
+        if measure_memory:
+            tracemalloc.stop()
+        return elapsed, peak
+
+    elapsed, _ = run(False)
+    _, peak = run(True)
+    return {"ops_per_sec": len(trace) / elapsed, "peak_kb": peak // 1024}
+
+
+def bench_frontier(
+    frontier: str, dedupe: bool, size: int, corpus: List[List[int]], max_nodes: int
+) -> dict:
+    from search import best_first_search
+    from heuristics import manhattan_distance
+
+    nodes = 0
+    peak_queue = 0
+    start = time.perf_counter()
+    for tiles in corpus:
+        _, stats = best_first_search(
+            PuzzleState(size, tiles),
+            manhattan_distance,
+            max_nodes,
+            frontier=frontier,
+            dedupe=dedupe,
+        )
+        nodes += stats["nodes_expanded"]
+        peak_queue = max(peak_queue, stats["max_queue_size"])
+    wall_time = time.perf_counter() - start
+    return {
+        "wall_time": wall_time,
+        "pops_per_sec": nodes / wall_time if wall_time > 0 else float("inf"),
+        "nodes": nodes,
+        "max_queue_size": peak_queue,
+    }
+
+
+def bench_search(
+    algorithm: str, heuristic: str, size: int, corpus: List[List[int]], max_nodes: int
+) -> dict:
+    search_fn = ALGORITHMS[algorithm]
+    heuristic_fn = HEURISTICS[heuristic]
+    nodes = 0
+    solved = 0
+    lengths = []
+    start = time.perf_counter()
+    for tiles in corpus:
+        solution, stats = search_fn(PuzzleState(size, tiles), heuristic_fn, max_nodes)
+        nodes += stats["nodes_expanded"]
+        if solution is not None:
+            solved += 1
+            lengths.append(solution.depth)
+    wall_time = time.perf_counter() - start
+    return {
+        "wall_time": wall_time,
+        "nodes": nodes,
+        "nodes_per_sec": nodes / wall_time if wall_time > 0 else float("inf"),
+        "solved": solved,
+        "boards": len(corpus),
+        "solution_length": sum(lengths) / len(lengths) if lengths else None,
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def _run_case(case: Tuple) -> dict:
+    kind, args = case
+    if kind == "search":
+        return bench_search(*args)
+    if kind == "heuristic":
+        return bench_heuristic(*args)
+    return bench_state_ops(*args)
+
+
+def run_benchmarks(
+    sizes: List[int],
+    algorithms: List[str],
+    heuristics: List[str],
+    count: int,
+    max_nodes: int,
+    seed: int,
+    repeat: int,
+    isolate: bool = True,
+    corpus_path: Optional[str] = None,
+) -> dict:
+    cases: Dict[str, Tuple] = {}
+    if corpus_path is not None:
+        corpus = Corpus(corpus_path)
+        sizes = [corpus.size]
+        loaded = {"corpus": list(corpus)}
+        corpus.close()
+    for size in sizes:
+        if corpus_path is not None:
+            corpora = loaded
+        else:
+            corpora = {
+                f"d{depth}": make_corpus(size, depth, count, seed)
+                for depth in DEFAULT_DEPTHS[size]
+            }
+        every_board = [tiles for corpus in corpora.values() for tiles in corpus]
+        cases[f"state/{size}x{size}"] = ("state", (size, every_board, repeat))
+        for heuristic in heuristics:
+            cases[f"heuristic/{heuristic}/{size}x{size}"] = (
+                "heuristic",
+                (heuristic, size, every_board, repeat),
+            )
+        for group, corpus in corpora.items():
+            for algorithm in algorithms:
+                for heuristic in heuristics:
+                    name = f"search/{algorithm}/{heuristic}/{size}x{size}/{group}"
+                    cases[name] = ("search", (algorithm, heuristic, size, corpus, max_nodes))
+
+    results: Dict[str, dict] = {}
+    for name, case in cases.items():
+        if isolate and case[0] == "search":
+            with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+                result = pool.apply(_run_case, (case,))
+        else:
+            result = _run_case(case)
+        if case[0] == "state":
+            for op, op_result in result.items():
+                results[f"{name}/{op}"] = op_result
+        else:
+            results[name] = result
+        print(f"{name}: {json.dumps(result)}", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": seed,
+            "count": count,
+            "max_nodes": max_nodes,
+            "corpus": corpus_path,
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> List[str]:
+    regressions = []
+    for name, old in baseline["results"].items():
+        new = current["results"].get(name)
+        if new is None:
+            continue
+        for metric, old_value in old.items():
+            new_value = new.get(metric)
+            if old_value is None or new_value is None or old_value == 0:
+                continue
+            change = (new_value - old_value) / abs(old_value)
+            if metric in HIGHER_IS_BETTER and change < -threshold:
+                regressions.append(f"{name} {metric}: {old_value:.6g} -> {new_value:.6g} ({change:+.1%})")
+            elif metric in LOWER_IS_BETTER and change > threshold:
+                regressions.append(f"{name} {metric}: {old_value:.6g} -> {new_value:.6g} ({change:+.1%})")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark heuristics and solvers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run benchmarks and save results")
+    run_parser.add_argument("-o", "--output", default="bench_results.json")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5])
+    run_parser.add_argument("--algorithms", nargs="+", default=["best_first"], choices=sorted(ALGORITHMS))
+    run_parser.add_argument(
+        "--heuristics",
+        nargs="+",
+        default=["manhattan_distance", "misplaced_tiles", "linear_conflict", "nilssons_sequence"],
+        choices=sorted(HEURISTICS),
+    )
+    run_parser.add_argument("--count", type=int, default=5, help="boards per depth group")
+    run_parser.add_argument("--max-nodes", type=int, default=20000)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=200, help="repeats for micro benchmarks")
+    run_parser.add_argument("--no-isolate", action="store_true", help="run searches in-process")
+    run_parser.add_argument("--corpus", help="board corpus written by scramble.py")
+    run_parser.add_argument("--baseline", help="compare against this results file")
+    run_parser.add_argument("--threshold", type=float, default=0.1)
+
+    parity_parser = subparsers.add_parser(
+        "parity", help="compare solvability checks against the quadratic loop"
+    )
+    parity_parser.add_argument("--sizes", type=int, nargs="+", default=list(range(3, 11)))
+    parity_parser.add_argument("--count", type=int, default=1000)
+    parity_parser.add_argument("--seed", type=int, default=0)
+    parity_parser.add_argument("--repeat", type=int, default=5)
+
+    frontier_parser = subparsers.add_parser("frontier", help="compare frontier queues")
+    frontier_parser.add_argument("--size", type=int, default=4)
+    frontier_parser.add_argument("--depth", type=int, default=60)
+    frontier_parser.add_argument("--count", type=int, default=10)
+    frontier_parser.add_argument("--max-nodes", type=int, default=200000)
+    frontier_parser.add_argument("--seed", type=int, default=0)
+
+    visited_parser = subparsers.add_parser("visited", help="compare visited-set encodings")
+    visited_parser.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5])
+    visited_parser.add_argument("--count", type=int, default=100000)
+    visited_parser.add_argument("--seed", type=int, default=0)
+
+    nodes_parser = subparsers.add_parser(
+        "nodes", help="compare heuristics by nodes expanded on one corpus"
+    )
+    nodes_parser.add_argument("--size", type=int, default=4)
+    nodes_parser.add_argument("--depth", type=int, default=45)
+    nodes_parser.add_argument("--count", type=int, default=8)
+    nodes_parser.add_argument("--seed", type=int, default=0)
+    nodes_parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="ida_star")
+    nodes_parser.add_argument(
+        "--heuristics",
+        nargs="+",
+        choices=sorted(HEURISTICS),
+        default=["linear_conflict", "walking_distance"],
+        help="the first one is the baseline",
+    )
+    nodes_parser.add_argument("--max-nodes", type=int, default=10000000)
+
+    startup_parser = subparsers.add_parser(
+        "startup", help="time a cold one-board solve in a fresh interpreter"
+    )
+    startup_parser.add_argument("--size", type=int, default=4)
+    startup_parser.add_argument("--repeat", type=int, default=5)
+    startup_parser.add_argument("--budget", type=float, default=0.5, help="seconds")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+    if args.command == "parity":
+        for size in args.sizes:
+            for name, result in bench_parity(size, args.count, args.seed, args.repeat).items():
+                print(
+                    f"{size}x{size} {name}: {result['ops_per_sec']:.0f} boards/s "
+                    f"({result['speedup']:.1f}x)"
+                )
+        return 0
+    if args.command == "nodes":
+        corpus = make_corpus(args.size, args.depth, args.count, args.seed)
+        results = bench_node_counts(
+            args.size, corpus, args.heuristics, args.algorithm, args.max_nodes
+        )
+        for name, result in results.items():
+            print(
+                f"{name:20} {result['nodes']:10} nodes ({result['node_ratio']:.2f}x)  "
+                f"{result['wall_time']:6.2f}s  total length {result['solution_length']}"
+            )
+        return 0
+    if args.command == "startup":
+        result = bench_startup(args.size, args.repeat)
+        print(
+            f"cold start {result['wall_time'] * 1000:.0f} ms "
+            f"(imports {result['import_time'] * 1000:.0f} ms, "
+            f"solve {result['solve_time'] * 1000:.0f} ms, budget {args.budget * 1000:.0f} ms)"
+        )
+        if result["heavy_modules"]:
+            print(f"heavy modules loaded: {', '.join(result['heavy_modules'])}")
+        return int(result["wall_time"] > args.budget or bool(result["heavy_modules"]))
+    if args.command == "visited":
+        for size in args.sizes:
+            for name, result in bench_visited(size, args.count, args.seed).items():
+                print(
+                    f"{size}x{size} {name:7} {result['ops_per_sec']:9.0f} ops/s  "
+                    f"{result['bytes_per_entry']:5.1f} bytes/entry"
+                )
+        return 0
+    if args.command == "frontier":
+        corpus = make_corpus(args.size, args.depth, args.count, args.seed)
+        trace = record_frontier_trace(args.size, corpus, args.max_nodes)
+        print(f"replaying {len(trace)} queue operations from {args.count} searches")
+        for frontier in ("heap", "bucket"):
+            result = replay_frontier(frontier, trace)
+            print(
+                f"{frontier:14} {result['ops_per_sec']:9.0f} ops/s  "
+                f"peak queue memory {result['peak_kb']} KiB"
+            )
+        for frontier in ("heap", "bucket"):
+            for dedupe in (False, True):
+                result = bench_frontier(frontier, dedupe, args.size, corpus, args.max_nodes)
+                label = frontier + (" +dedupe" if dedupe else "")
+                print(
+                    f"{label:14} {result['wall_time']:6.2f}s  {result['nodes']:8} pops  "
+                    f"peak queue {result['max_queue_size']:7}"
+                )
+        return 0
+    if args.command == "run":
+        current = run_benchmarks(
+            args.sizes,
+            args.algorithms,
+            args.heuristics,
+            args.count,
+            args.max_nodes,
+            args.seed,
+            args.repeat,
+            not args.no_isolate,
+            args.corpus,
+        )
+        with open(args.output, "w") as f:
+            json.dump(current, f, indent=2)
+        if not args.baseline:
+            return 0
+        baseline_path = args.baseline
+    else:
+        with open(args.current) as f:
+            current = json.load(f)
+        baseline_path = args.baseline
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare_results(baseline, current, args.threshold)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if not regressions:
+        print("No regressions.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
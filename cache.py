@@ -0,0 +1,206 @@
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from puzzle import PuzzleState
+from packed import (
+    build_solution,
+    decode_moves,
+    encode_moves,
+    pack_tiles,
+    solution_moves,
+    tile_bits,
+)
+from search import best_first_search
+
+_TRANSPOSED_MOVES = str.maketrans("UDLR", "LRUD")
+_TRANSPOSE: Dict[int, Tuple[List[int], List[int]]] = {}
+
+
+def _transpose_tables(size: int) -> Tuple[List[int], List[int]]:
+    tables = _TRANSPOSE.get(size)
+    if tables is None:
+        n = size * size
+        position = [(pos % size) * size + pos // size for pos in range(n)]
+        relabel = [0] + [position[tile - 1] + 1 for tile in range(1, n)]
+        tables = _TRANSPOSE[size] = (position, relabel)
+    return tables
+
+
+def canonical_key(tiles: Sequence[int], size: int) -> Tuple[int, bool]:
+    position, relabel = _transpose_tables(size)
+    transposed = [0] * len(tiles)
+    for pos, tile in enumerate(tiles):
+        transposed[position[pos]] = relabel[tile]
+    bits = tile_bits(size)
+    key = pack_tiles(tiles, bits)
+    transposed_key = pack_tiles(transposed, bits)
+    if transposed_key < key:
+        return transposed_key, True
+    return key, False
+
+
+class SolutionCache:
+    def __init__(
+        self,
+        max_entries: int = 100000,
+        path: Optional[str] = None,
+        store_suffixes: bool = True,
+    ):
+        self.max_entries = max_entries
+        self.store_suffixes = store_suffixes
+        self.entries: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self.namespace_sizes: Counter = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.suffix_hits = 0
+        self.lookup_time = 0.0
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS solutions ("
+                "namespace TEXT, size INTEGER, key TEXT, moves TEXT, "
+                "PRIMARY KEY (namespace, size, key))"
+            )
+            self._db.commit()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def has_entries(self, size: int, namespace: str = "") -> bool:
+        with self._lock:
+            return self.namespace_sizes[(namespace, size)] > 0
+
+    def get(self, tiles: Sequence[int], size: int, namespace: str = "") -> Optional[List[str]]:
+        start = time.perf_counter()
+        key, transposed = canonical_key(tiles, size)
+        entry = (namespace, size, key)
+        with self._lock:
+            codes = self.entries.get(entry)
+            if codes is not None:
+                self.entries.move_to_end(entry)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT moves FROM solutions WHERE namespace=? AND size=? AND key=?",
+                    (namespace, size, format(key, "x")),
+                ).fetchone()
+                if row is not None:
+                    codes = row[0]
+                    self.disk_hits += 1
+                    self._remember(entry, codes)
+            if codes is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self.lookup_time += time.perf_counter() - start
+        if codes is None:
+            return None
+        if transposed:
+            codes = codes.translate(_TRANSPOSED_MOVES)
+        return decode_moves(codes)
+
+    def lookup_suffix(
+        self, tiles: Sequence[int], size: int, namespace: str = ""
+    ) -> Optional[List[str]]:
+        key, transposed = canonical_key(tiles, size)
+        with self._lock:
+            codes = self.entries.get((namespace, size, key))
+            if codes is None:
+                return None
+            self.suffix_hits += 1
+        if transposed:
+            codes = codes.translate(_TRANSPOSED_MOVES)
+        return decode_moves(codes)
+
+    def put(
+        self, tiles: Sequence[int], size: int, moves: Sequence[str], namespace: str = ""
+    ) -> None:
+        codes = encode_moves(moves)
+        state = PuzzleState(size, list(tiles))
+        rows = []
+        with self._lock:
+            for i in range(len(codes) + 1 if self.store_suffixes else 1):
+                key, transposed = canonical_key(state.tiles, size)
+                suffix = codes[i:]
+                if transposed:
+                    suffix = suffix.translate(_TRANSPOSED_MOVES)
+                entry = (namespace, size, key)
+                existing = self.entries.get(entry)
+                if existing is None or len(suffix) < len(existing):
+                    self._remember(entry, suffix)
+                    rows.append((namespace, size, format(key, "x"), suffix))
+                if i < len(codes):
+                    state = state.move(moves[i])
+            if self._db is not None and rows:
+                self._db.executemany(
+                    "INSERT INTO solutions VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (namespace, size, key) DO UPDATE SET moves=excluded.moves "
+                    "WHERE length(excluded.moves) < length(solutions.moves)",
+                    rows,
+                )
+                self._db.commit()
+
+    def _remember(self, entry: Tuple[str, int, int], codes: str) -> None:
+        if entry not in self.entries:
+            self.namespace_sizes[entry[:2]] += 1
+        self.entries[entry] = codes
+        self.entries.move_to_end(entry)
+        while len(self.entries) > self.max_entries:
+            evicted, _ = self.entries.popitem(last=False)
+            self.namespace_sizes[evicted[:2]] -= 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "suffix_hits": self.suffix_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self.entries),
+            "mean_lookup_time": self.lookup_time / lookups if lookups else 0.0,
+        }
+
+
+def cached_solve(
+    cache: SolutionCache,
+    search_fn: Callable,
+    initial_state: PuzzleState,
+    heuristic_fn: Callable[[PuzzleState], int],
+    *args,
+    **kwargs,
+) -> Tuple[Optional[PuzzleState], dict]:
+    namespace = f"{search_fn.__name__}:{heuristic_fn.__name__}"
+    start = time.perf_counter()
+    moves = cache.get(initial_state.tiles, initial_state.size, namespace)
+    lookup_time = time.perf_counter() - start
+    if moves is not None:
+        solution = build_solution(initial_state, moves)
+        stats = {
+            "nodes_expanded": 0,
+            "max_queue_size": 0,
+            "start_heuristic": heuristic_fn(initial_state),
+            "solution_depth": solution.depth,
+            "end_heuristic": 0,
+        }
+    else:
+        if search_fn is best_first_search:
+            kwargs.setdefault("cache", cache)
+            kwargs.setdefault("cache_namespace", namespace)
+        solution, stats = search_fn(initial_state, heuristic_fn, *args, **kwargs)
+        if solution is not None:
+            moves = decode_moves(solution_moves(solution))
+            cache.put(initial_state.tiles, initial_state.size, moves, namespace)
+            moves = None
+    stats["cache"] = dict(cache.stats(), hit=moves is not None, lookup_time=lookup_time)
+    return solution, stats
@@ -0,0 +1,166 @@
+import os
+import struct
+from collections import deque
+from math import factorial
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from puzzle import PuzzleState
+from packed import MOVE_CODES, build_solution, neighbors
+from pattern_db import table_dir
+
+MAGIC = b"NP8T"
+VERSION = 1
+UNREACHABLE = 0xFF
+SIZE = 3
+STATES = factorial(SIZE * SIZE)
+MAX_DISTANCE = 31
+
+_HEADER = struct.Struct("<4sHI")
+_FACTORIALS = [factorial(i) for i in range(SIZE * SIZE)]
+
+_TABLE: Optional[bytes] = None
+
+
+def default_path() -> str:
+    return os.path.join(table_dir(), "eight_puzzle.bin")
+
+
+def permutation_rank(tiles: Sequence[int]) -> int:
+    n = len(tiles)
+    rank = 0
+    for i in range(n - 1):
+        tile = tiles[i]
+        smaller = 0
+        for j in range(i + 1, n):
+            if tiles[j] < tile:
+                smaller += 1
+        rank += smaller * _FACTORIALS[n - 1 - i]
+    return rank
+
+
+def permutation_unrank(rank: int, n: int = SIZE * SIZE) -> List[int]:
+    remaining = list(range(n))
+    tiles = []
+    for i in range(n - 1, -1, -1):
+        index, rank = divmod(rank, _FACTORIALS[i])
+        tiles.append(remaining.pop(index))
+    return tiles
+
+
+def build_distance_table() -> bytearray:
+    table = bytearray([UNREACHABLE]) * STATES
+    goal = tuple(range(1, SIZE * SIZE)) + (0,)
+    table[permutation_rank(goal)] = 0
+    moves_table = neighbors(SIZE)
+    queue = deque([(goal, SIZE * SIZE - 1, 0)])
+    while queue:
+        tiles, blank, distance = queue.popleft()
+        for new_blank, _ in moves_table[blank]:
+            child = list(tiles)
+            child[blank], child[new_blank] = child[new_blank], 0
+            rank = permutation_rank(child)
+            if table[rank] == UNREACHABLE:
+                table[rank] = distance + 1
+                queue.append((tuple(child), new_blank, distance + 1))
+    return table
+
+
+def save_table(path: str, table: bytes) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(table)))
+        f.write(table)
+    os.replace(tmp_path, path)
+
+
+def read_table(path: str) -> bytes:
+    with open(path, "rb") as f:
+        magic, version, length = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an 8-puzzle table")
+        if version != VERSION:
+            raise ValueError(f"{path} has unsupported version {version}")
+        table = f.read(length)
+    if len(table) != STATES:
+        raise ValueError(f"{path} is truncated")
+    return table
+
+
+def load_table() -> bytes:
+    global _TABLE
+    if _TABLE is None:
+        path = default_path()
+        if not os.path.exists(path):
+            save_table(path, build_distance_table())
+        _TABLE = read_table(path)
+    return _TABLE
+
+
+def distance(tiles: Sequence[int]) -> Optional[int]:
+    value = load_table()[permutation_rank(tiles)]
+    return None if value == UNREACHABLE else value
+
+
+def exact_distance(state: PuzzleState) -> int:
+    if state.size != SIZE:
+        from heuristics import manhattan_distance
+
+        return manhattan_distance(state)
+    return load_table()[permutation_rank(state.tiles)]
+
+
+def table_solve(
+    initial_state: PuzzleState,
+    heuristic_fn: Optional[Callable[[PuzzleState], int]] = None,
+    max_nodes: int = 100000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder=None,
+) -> Tuple[Optional[PuzzleState], dict]:
+    if initial_state.size != SIZE:
+        from heuristics import manhattan_distance
+        from search import ida_star_search
+
+        return ida_star_search(
+            initial_state,
+            heuristic_fn or manhattan_distance,
+            max_nodes,
+            time_limit,
+            progress_fn,
+            progress_interval,
+            recorder,
+        )
+
+    table = load_table()
+    tiles = list(initial_state.tiles)
+    blank = initial_state.blank_pos
+    remaining = table[permutation_rank(tiles)]
+    stats = {
+        "nodes_expanded": 0,
+        "max_queue_size": 1,
+        "start_heuristic": remaining,
+    }
+    if remaining == UNREACHABLE:
+        stats["end_heuristic"] = remaining
+        return None, stats
+
+    moves_table = neighbors(SIZE)
+    moves = []
+    while remaining:
+        stats["nodes_expanded"] += 1
+        for new_blank, move in moves_table[blank]:
+            tiles[blank], tiles[new_blank] = tiles[new_blank], 0
+            if table[permutation_rank(tiles)] == remaining - 1:
+                blank = new_blank
+                moves.append(MOVE_CODES[move])
+                remaining -= 1
+                break
+            tiles[new_blank], tiles[blank] = tiles[blank], 0
+    solution = build_solution(initial_state, "".join(moves))
+    stats["solution_depth"] = solution.depth
+    stats["end_heuristic"] = 0
+    return solution, stats
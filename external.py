@@ -0,0 +1,408 @@
+import argparse
+import heapq
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from puzzle import PuzzleState
+from packed import (
+    MOVE_CODES,
+    build_solution,
+    decode_moves,
+    goal_packed,
+    neighbors,
+    pack_tiles,
+    solution_moves,
+    tile_bits,
+)
+from moves import manhattan_deltas
+from heuristics import manhattan_distance
+from metrics import MetricsRecorder
+
+CHECKPOINT = "checkpoint.json"
+NO_MOVE = 4
+_OPPOSITE = (1, 0, 3, 2, -1)
+_CHUNK = 1 << 20
+MERGE_FAN_IN = 16
+_ENTRY_OVERHEAD = 57
+
+
+def key_width(size: int) -> int:
+    return (size * size * tile_bits(size) + 7) // 8
+
+
+class RunWriter:
+    def __init__(self, path: str, level: int = 1):
+        self.path = path
+        self._file = open(path + ".tmp", "wb", buffering=_CHUNK)
+        self._compressor = zlib.compressobj(level)
+        self._pending: List[bytes] = []
+        self._pending_size = 0
+        self.records = 0
+        self.bytes_written = 0
+
+    def write(self, record: bytes) -> None:
+        self._pending.append(record)
+        self._pending_size += len(record)
+        self.records += 1
+        if self._pending_size >= _CHUNK:
+            self._flush()
+
+    def _flush(self) -> None:
+        data = self._compressor.compress(b"".join(self._pending))
+        self._pending.clear()
+        self._pending_size = 0
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def close(self) -> None:
+        self._flush()
+        data = self._compressor.flush()
+        self._file.write(data)
+        self.bytes_written += len(data)
+        self._file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+def read_run(path: str, record_size: int, chunk_size: int = _CHUNK) -> Iterator[bytes]:
+    decompressor = zlib.decompressobj()
+    leftover = b""
+    with open(path, "rb", buffering=chunk_size) as f:
+        while True:
+            chunk = f.read(chunk_size)
+            data = leftover + (decompressor.decompress(chunk) if chunk else decompressor.flush())
+            end = len(data) - len(data) % record_size
+            for start in range(0, end, record_size):
+                yield data[start : start + record_size]
+            leftover = data[end:]
+            if not chunk:
+                break
+
+
+def _unique(records: Iterator[bytes], width: int) -> Iterator[bytes]:
+    previous = None
+    for record in records:
+        key = record[:width]
+        if key != previous:
+            previous = key
+            yield record
+
+
+def _subtract(records: Iterator[bytes], removed: Iterator[bytes], width: int) -> Iterator[bytes]:
+    other = next(removed, None)
+    for record in records:
+        key = record[:width]
+        while other is not None and other[:width] < key:
+            other = next(removed, None)
+        if other is None or other[:width] != key:
+            yield record
+
+
+def read_chunk_size(memory_limit: int, fan_in: int = MERGE_FAN_IN) -> int:
+    # Each open run holds a file buffer, a compressed chunk and its decompressed records;
+    # budget a few chunks per run for up to fan_in runs plus the previous layer.
+    return min(_CHUNK, max(memory_limit // (8 * (fan_in + 1)), 1 << 12))
+
+
+def reduce_runs(
+    paths: List[str], record_size: int, width: int, chunk_size: int, fan_in: int = MERGE_FAN_IN
+) -> Tuple[List[str], int]:
+    written = 0
+    passes = 0
+    while len(paths) > fan_in:
+        passes += 1
+        merged = []
+        for start in range(0, len(paths), fan_in):
+            group = paths[start : start + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            path = f"{group[0][:-2]}-m{passes}.z"
+            writer = RunWriter(path)
+            readers = (read_run(p, record_size, chunk_size) for p in group)
+            for entry in _unique(heapq.merge(*readers), width):
+                writer.write(entry)
+            writer.close()
+            written += writer.bytes_written
+            for p in group:
+                os.remove(p)
+            merged.append(path)
+        paths = merged
+    return paths, written
+
+
+def external_search(
+    initial_state: PuzzleState,
+    heuristic_fn: Optional[Callable[[PuzzleState], int]] = None,
+    max_nodes: int = 100000000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder: Optional[MetricsRecorder] = None,
+    work_dir: Optional[str] = None,
+    memory_limit: int = 64 << 20,
+    resume: bool = False,
+    prune: bool = True,
+) -> Tuple[Optional[PuzzleState], dict]:
+    from search import _SearchMonitor, _unwrap
+
+    heuristic_fn = heuristic_fn or manhattan_distance
+    size = initial_state.size
+    n = size * size
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    shifts = [i * bits for i in range(n)]
+    width = key_width(size)
+    record_size = width + 2
+    buffer_limit = max(memory_limit // (record_size + _ENTRY_OVERHEAD), 1024)
+    chunk_size = read_chunk_size(memory_limit)
+    moves_table = neighbors(size)
+    goal = goal_packed(size)
+    incremental = _unwrap(heuristic_fn) is manhattan_distance
+    deltas = manhattan_deltas(size)
+
+    scratch = PuzzleState(size, initial_state.tiles, initial_state.blank_pos)
+    tiles = scratch.tiles
+    start_h = heuristic_fn(scratch)
+    stats = {
+        "nodes_expanded": 0,
+        "max_queue_size": 1,
+        "start_heuristic": start_h,
+        "layers": 0,
+        "iterations": 0,
+        "runs": 0,
+        "bytes_written": 0,
+        "buffer_limit": buffer_limit,
+    }
+    if not initial_state.is_solvable():
+        stats["end_heuristic"] = start_h
+        return None, stats
+
+    owns_dir = work_dir is None
+    work_dir = work_dir or tempfile.mkdtemp(prefix="npuzzle-external-")
+    os.makedirs(work_dir, exist_ok=True)
+    root = pack_tiles(tiles, bits)
+    monitor = _SearchMonitor(stats, time_limit, progress_fn, progress_interval)
+
+    def layer_path(bound: int, depth: int) -> str:
+        return os.path.join(work_dir, f"layer-{bound}-{depth}.z")
+
+    def save_checkpoint(bound: int, depth: int) -> None:
+        tmp_path = os.path.join(work_dir, CHECKPOINT + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"tiles": initial_state.tiles, "bound": bound, "depth": depth, "stats": stats}, f)
+        os.replace(tmp_path, os.path.join(work_dir, CHECKPOINT))
+
+    bound = start_h if prune else None
+    depth = 0
+    checkpoint_path = os.path.join(work_dir, CHECKPOINT)
+    if resume and os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint["tiles"] != initial_state.tiles:
+            raise ValueError(f"checkpoint in {work_dir} belongs to a different board")
+        bound, depth = checkpoint["bound"], checkpoint["depth"]
+        stats.update(checkpoint["stats"])
+        stats["resumed_at"] = depth
+
+    def record(packed: int, blank: int, move: int) -> bytes:
+        return packed.to_bytes(width, "big") + bytes((blank, move))
+
+    def trace(depth: int, bound: int, packed: int, blank: int, move: int) -> str:
+        moves = []
+        while move != NO_MOVE:
+            moves.append(MOVE_CODES[move])
+            old_blank = blank
+            for new_blank, back in moves_table[blank]:
+                if back == _OPPOSITE[move]:
+                    tile = (packed >> shifts[new_blank]) & mask
+                    packed ^= (tile << shifts[new_blank]) ^ (tile << shifts[old_blank])
+                    blank = new_blank
+                    break
+            depth -= 1
+            target = packed.to_bytes(width, "big")
+            for entry in read_run(layer_path(bound, depth), record_size):
+                if entry[:width] == target:
+                    move = entry[width + 1]
+                    break
+        return "".join(reversed(moves))
+
+    def finish(moves: Optional[str]) -> Tuple[Optional[PuzzleState], dict]:
+        if moves is None:
+            return None, stats
+        solution = build_solution(initial_state, moves)
+        stats["solution_depth"] = solution.depth
+        stats["end_heuristic"] = 0
+        return solution, stats
+
+    best_h = start_h
+    try:
+        while True:
+            if depth == 0:
+                stats["iterations"] += 1
+                stats["bound"] = bound
+                if root == goal:
+                    return finish("")
+                writer = RunWriter(layer_path(bound, 0))
+                writer.write(record(root, initial_state.blank_pos, NO_MOVE))
+                writer.close()
+                save_checkpoint(bound, 0)
+
+            runs: List[str] = []
+            buffer: List[bytes] = []
+
+            def spill() -> None:
+                buffer.sort()
+                path = os.path.join(work_dir, f"run-{bound}-{depth + 1}-{len(runs)}.z")
+                writer = RunWriter(path)
+                for entry in _unique(iter(buffer), width):
+                    writer.write(entry)
+                writer.close()
+                stats["runs"] += 1
+                stats["bytes_written"] += writer.bytes_written
+                runs.append(path)
+                buffer.clear()
+
+            layer_size = 0
+            pruned = False
+            for entry in read_run(layer_path(bound, depth), record_size):
+                packed = int.from_bytes(entry[:width], "big")
+                blank = entry[width]
+                incoming = entry[width + 1]
+                layer_size += 1
+                stats["nodes_expanded"] += 1
+                tiles[:] = [(packed >> shift) & mask for shift in shifts]
+                scratch.blank_pos = blank
+                if prune or recorder is not None:
+                    h = heuristic_fn(scratch)
+                    if h < best_h:
+                        best_h = h
+                if recorder is not None:
+                    recorder.record(stats["nodes_expanded"], len(buffer), h, depth)
+                if stats["nodes_expanded"] >= max_nodes or (
+                    stats["nodes_expanded"] >= monitor.next_check
+                    and monitor.check(layer_size + len(buffer), best_h)
+                ):
+                    stats["end_heuristic"] = best_h
+                    return finish(None)
+                for new_blank, move in moves_table[blank]:
+                    if move == _OPPOSITE[incoming]:
+                        continue
+                    tile = tiles[new_blank]
+                    child = packed ^ (tile << shifts[new_blank]) ^ (tile << shifts[blank])
+                    if child == goal:
+                        moves = trace(depth, bound, packed, blank, incoming)
+                        return finish(moves + MOVE_CODES[move])
+                    if prune:
+                        if incremental:
+                            child_h = h + deltas[(tile * n + new_blank) * 4 + move]
+                        else:
+                            tiles[blank] = tile
+                            tiles[new_blank] = 0
+                            scratch.blank_pos = new_blank
+                            child_h = heuristic_fn(scratch)
+                            tiles[new_blank] = tile
+                            tiles[blank] = 0
+                            scratch.blank_pos = blank
+                        if depth + 1 + child_h > bound:
+                            pruned = True
+                            continue
+                    buffer.append(record(child, new_blank, move))
+                    if len(buffer) >= buffer_limit:
+                        spill()
+
+            if buffer or not runs:
+                spill()
+            if stats["max_queue_size"] < layer_size:
+                stats["max_queue_size"] = layer_size
+            stats["layers"] += 1
+
+            runs, written = reduce_runs(runs, record_size, width, chunk_size)
+            stats["bytes_written"] += written
+            readers = (read_run(path, record_size, chunk_size) for path in runs)
+            merged = _unique(heapq.merge(*readers), width)
+            if depth > 0:
+                previous = read_run(layer_path(bound, depth - 1), record_size, chunk_size)
+                merged = _subtract(merged, previous, width)
+            writer = RunWriter(layer_path(bound, depth + 1))
+            for entry in merged:
+                writer.write(entry)
+            writer.close()
+            stats["bytes_written"] += writer.bytes_written
+            for path in runs:
+                os.remove(path)
+
+            if writer.records:
+                depth += 1
+                save_checkpoint(bound, depth)
+            elif prune and pruned:
+                for name in os.listdir(work_dir):
+                    if name.startswith(f"layer-{bound}-"):
+                        os.remove(os.path.join(work_dir, name))
+                bound += 2
+                depth = 0
+            else:
+                stats["end_heuristic"] = best_h
+                return finish(None)
+    finally:
+        if owns_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def parse_size(text: str) -> int:
+    units = {"k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+    if text and text[-1].lower() in units:
+        return int(float(text[:-1]) * units[text[-1].lower()])
+    return int(text)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from heuristics import HEURISTICS
+
+    parser = argparse.ArgumentParser(description="Out-of-core layered search with checkpoints.")
+    parser.add_argument("board", help="tiles separated by spaces or commas, 0 for the blank")
+    parser.add_argument("--work-dir", required=True)
+    parser.add_argument("--memory-limit", type=parse_size, default=64 << 20, help="e.g. 512M")
+    parser.add_argument("--max-nodes", type=int, default=10**10)
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS), default="manhattan_distance")
+    parser.add_argument("--no-prune", action="store_true", help="plain breadth-first search")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    args = parser.parse_args(argv)
+
+    from batch import parse_board
+
+    tiles = parse_board(args.board)
+    state = PuzzleState(int(len(tiles) ** 0.5), tiles)
+    start = time.perf_counter()
+
+    def progress(info: dict) -> None:
+        print(
+            f"{info['nodes_expanded']} nodes, frontier {info['frontier_size']}, "
+            f"best h {info['best_heuristic']}, {info['elapsed']:.0f}s",
+            file=sys.stderr,
+        )
+
+    solution, stats = external_search(
+        state,
+        HEURISTICS[args.heuristic],
+        args.max_nodes,
+        progress_fn=progress,
+        progress_interval=100000,
+        work_dir=args.work_dir,
+        memory_limit=args.memory_limit,
+        resume=args.resume,
+        prune=not args.no_prune,
+    )
+    stats["time"] = time.perf_counter() - start
+    stats["moves"] = decode_moves(solution_moves(solution)) if solution else None
+    print(json.dumps(stats))
+    return 0 if solution else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
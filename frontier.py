@@ -0,0 +1,151 @@
+import heapq
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from profiling import active_profiler
+
+CLOSED = -1
+
+
+class BucketQueue:
+    __slots__ = ("buckets", "minimum", "size", "key", "seen", "on_stale")
+
+    def __init__(
+        self,
+        key: Optional[Callable[[int], int]] = None,
+        on_stale: Optional[Callable[[int], None]] = None,
+    ):
+        self.buckets: List[List[int]] = []
+        self.minimum = 0
+        self.size = 0
+        self.key = key
+        self.seen: Optional[Dict[int, int]] = {} if key is not None else None
+        self.on_stale = on_stale
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for priority in range(self.minimum, len(self.buckets)):
+            for item in self.buckets[priority]:
+                if self.key is None or self.seen[self.key(item)] == priority:
+                    yield priority, item
+
+    def accepts(self, priority: int, key: int) -> bool:
+        old = self.seen.get(key) if self.seen is not None else None
+        return old is None or old > priority
+
+    def push(self, priority: int, item: int) -> bool:
+        if self.key is not None:
+            key = self.key(item)
+            old = self.seen.get(key)
+            if old is not None and old <= priority:
+                return False
+            self.seen[key] = priority
+            if old is None:
+                self.size += 1
+        else:
+            self.size += 1
+        buckets = self.buckets
+        while len(buckets) <= priority:
+            buckets.append([])
+        buckets[priority].append(item)
+        if priority < self.minimum:
+            self.minimum = priority
+        return True
+
+    def peek(self) -> int:
+        if not self.size:
+            raise IndexError("peek from an empty queue")
+        buckets = self.buckets
+        while not buckets[self.minimum]:
+            self.minimum += 1
+        return self.minimum
+
+    def pop(self) -> Tuple[int, int]:
+        while True:
+            priority = self.peek()
+            item = self.buckets[priority].pop()
+            if self.key is not None:
+                key = self.key(item)
+                if self.seen[key] != priority:
+                    if self.on_stale is not None:
+                        self.on_stale(item)
+                    continue
+                self.seen[key] = CLOSED
+            self.size -= 1
+            return priority, item
+
+
+class HeapQueue:
+    __slots__ = ("heap", "size", "key", "seen", "on_stale")
+
+    def __init__(
+        self,
+        key: Optional[Callable[[int], int]] = None,
+        on_stale: Optional[Callable[[int], None]] = None,
+    ):
+        self.heap: List[int] = []
+        self.size = 0
+        self.key = key
+        self.seen: Optional[Dict[int, int]] = {} if key is not None else None
+        self.on_stale = on_stale
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for entry in self.heap:
+            priority, item = entry >> 32, entry & 0xFFFFFFFF
+            if self.key is None or self.seen[self.key(item)] == priority:
+                yield priority, item
+
+    def accepts(self, priority: int, key: int) -> bool:
+        old = self.seen.get(key) if self.seen is not None else None
+        return old is None or old > priority
+
+    def push(self, priority: int, item: int) -> bool:
+        if self.key is not None:
+            key = self.key(item)
+            old = self.seen.get(key)
+            if old is not None and old <= priority:
+                return False
+            self.seen[key] = priority
+            if old is None:
+                self.size += 1
+        else:
+            self.size += 1
+        heapq.heappush(self.heap, (priority << 32) | item)
+        return True
+
+    def peek(self) -> int:
+        if not self.size:
+            raise IndexError("peek from an empty queue")
+        return self.heap[0] >> 32
+
+    def pop(self) -> Tuple[int, int]:
+        while True:
+            entry = heapq.heappop(self.heap)
+            priority, item = entry >> 32, entry & 0xFFFFFFFF
+            if self.key is not None:
+                key = self.key(item)
+                if self.seen[key] != priority:
+                    if self.on_stale is not None:
+                        self.on_stale(item)
+                    continue
+                self.seen[key] = CLOSED
+            self.size -= 1
+            return priority, item
+
+
+FRONTIERS = {
+    "bucket": BucketQueue,
+    "heap": HeapQueue,
+}
+
+
+def make_frontier(name: str, keys=None, on_stale: Optional[Callable[[int], None]] = None):
+    if name not in FRONTIERS:
+        raise ValueError(f"unknown frontier {name!r}")
+    queue = FRONTIERS[name](keys.__getitem__ if keys is not None else None, on_stale)
+    profiler = active_profiler()
+    return queue if profiler is None else profiler.frontier(queue)
@@ -1,4 +1,8 @@
 from puzzle import PuzzleState
+from pattern_db import load_database
+from eight_puzzle import exact_distance
+from walking import load_walking_table
+from moves import conflict_penalty
 
 
 def misplaced_tiles(state: PuzzleState) -> int:
@@ -90,3 +94,42 @@ def nilssons_sequence(state: PuzzleState) -> int:
             if next_goal_idx != expected_next_idx:
                 sequence_score += 2
     return manhattan + 3 * sequence_score
+
+
+def walking_distance(state: PuzzleState) -> int:
+    table = load_walking_table(state.size)
+    conflicts = manhattan_distance(state) + conflict_penalty(state.tiles, state.size)
+    if table is None:
+        return conflicts
+    return max(table.value(state.tiles), conflicts)
+
+
+def pattern_database(state: PuzzleState) -> int:
+    database = load_database(state.size)
+    if database is None:
+        return manhattan_distance(state)
+    return database.evaluate(state.tiles)
+
+
+HEURISTICS = {
+    "manhattan_distance": manhattan_distance,
+    "misplaced_tiles": misplaced_tiles,
+    "linear_conflict": linear_conflict,
+    "nilssons_sequence": nilssons_sequence,
+    "walking_distance": walking_distance,
+    "pattern_database": pattern_database,
+    "exact_distance": exact_distance,
+}
+
+# Heuristics that never overestimate, so an optimal search with them proves its result.
+# linear_conflict scores every conflicting pair and nilssons_sequence adds 3x a sequence
+# score; both can overestimate.
+ADMISSIBLE = frozenset(
+    {
+        manhattan_distance,
+        misplaced_tiles,
+        walking_distance,
+        pattern_database,
+        exact_distance,
+    }
+)
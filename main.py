@@ -1,6 +1,6 @@
+import contextlib
 import sys
 import time
-import matplotlib.pyplot as plt
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -11,19 +11,119 @@ from PyQt5.QtWidgets import (
     QLabel,
     QMessageBox,
     QComboBox,
+    QSlider,
 )
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt, QThread, QTimer, pyqtSignal
 from puzzle import PuzzleState
-from search import best_first_search
-from heuristics import (manhattan_distance,misplaced_tiles,nilssons_sequence,linear_conflict)
+from packed import replay, solution_moves
+from metrics import MetricsRecorder
+from cache import SolutionCache, cached_solve
+from profiling import SearchProfiler
+from eight_puzzle import table_solve
+from external import external_search
+from search import (
+    anytime_search,
+    batched_best_first_search,
+    best_first_search,
+    bidirectional_search,
+    hda_star_search,
+    ida_star_search,
+    weighted_a_star_search,
+)
+from heuristics import (manhattan_distance,misplaced_tiles,nilssons_sequence,linear_conflict,pattern_database,walking_distance)
+
+class SearchWorker(QThread):
+    progress = pyqtSignal(str, object)
+    result = pyqtSignal(str, object, object, float, object)
+    improved = pyqtSignal(str, object, float)
+
+    def __init__(
+        self,
+        name,
+        search_fn,
+        state,
+        heuristic_fn,
+        max_nodes,
+        cache,
+        time_limit=None,
+        profile=False,
+        report_interval=0.2,
+    ):
+        super().__init__()
+        self.name = name
+        self.search_fn = search_fn
+        self.state = state
+        self.heuristic_fn = heuristic_fn
+        self.max_nodes = max_nodes
+        self.cache = cache
+        self.time_limit = time_limit
+        self.profile = profile
+        self.report_interval = report_interval
+        self.cancelled = False
+        self.last_report = 0.0
+        self.recorder = MetricsRecorder()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def report(self, info):
+        now = time.perf_counter()
+        if now - self.last_report >= self.report_interval:
+            self.last_report = now
+            self.progress.emit(self.name, info)
+        return self.cancelled
+
+    def publish(self, solution, stats):
+        self.improved.emit(self.name, solution, stats["solutions"][-1]["elapsed"])
+
+    def run(self):
+        start_time = time.perf_counter()
+        options = {"on_solution": self.publish} if self.search_fn is anytime_search else {}
+        profiler = SearchProfiler() if self.profile else None
+        heuristic_fn = profiler.heuristic(self.heuristic_fn) if profiler else self.heuristic_fn
+        with profiler or contextlib.nullcontext():
+            if self.cache is None:
+                solution, stats = self.search_fn(
+                    self.state,
+                    heuristic_fn,
+                    self.max_nodes,
+                    self.time_limit,
+                    self.report,
+                    recorder=self.recorder,
+                    **options,
+                )
+            else:
+                solution, stats = cached_solve(
+                    self.cache,
+                    self.search_fn,
+                    self.state,
+                    heuristic_fn,
+                    self.max_nodes,
+                    self.time_limit,
+                    self.report,
+                    recorder=self.recorder,
+                    **options,
+                )
+        if profiler is not None:
+            stats["profile"] = profiler.report(stats["nodes_expanded"])
+        elapsed = time.perf_counter() - start_time
+        self.result.emit(self.name, solution, stats, elapsed, self.recorder.to_dict())
+
 
 class NPuzzleGame(QMainWindow):
     def __init__(self):
         super().__init__()
         self.size = 3
         self.heuristic_fn = manhattan_distance
+        self.search_fn = best_first_search
         self.max_nodes = (100000 if self.size == 3 else 1000000 if self.size == 4 else 5000000)
         self.search_stats = {}
+        self.workers = {}
+        self.progress = {}
+        self.solution_cache = SolutionCache()
+        self.anytime_budget = 5.0
+        self.tile_buttons = []
+        self.playback = None
         self.initUI()
 
     def initUI(self):
@@ -46,10 +146,28 @@ class NPuzzleGame(QMainWindow):
                 "Misplaced Tiles",
                 "Nilssons Sequence",
                 "Linear Conflict",
+                "Walking Distance",
+                "Pattern Database",
             ]
         )
         self.heuristic_dropdown.currentIndexChanged.connect(self.update_heuristic)
         self.layout.addWidget(self.heuristic_dropdown)
+        self.algorithm_dropdown = QComboBox()
+        self.algorithm_dropdown.addItems(
+            [
+                "Best-First Search",
+                "IDA*",
+                "Batched Best-First Search",
+                "Bidirectional BFS",
+                "Weighted A*",
+                "Anytime A* (ARA*)",
+                "External-Memory Search",
+                "Parallel HDA*",
+                "Lookup Table (3x3)",
+            ]
+        )
+        self.algorithm_dropdown.currentIndexChanged.connect(self.update_algorithm)
+        self.layout.addWidget(self.algorithm_dropdown)
         self.shuffle_button = QPushButton("Shuffle")
         self.shuffle_button.clicked.connect(self.shuffle_puzzle)
         self.layout.addWidget(self.shuffle_button)
@@ -62,29 +180,114 @@ class NPuzzleGame(QMainWindow):
         self.plot_button = QPushButton("Generate Plot")
         self.plot_button.clicked.connect(self.generate_plot)
         self.layout.addWidget(self.plot_button)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.cancel_search)
+        self.cancel_button.setEnabled(False)
+        self.layout.addWidget(self.cancel_button)
+        self.speed_label = QLabel()
+        self.layout.addWidget(self.speed_label)
+        self.speed_slider = QSlider(Qt.Horizontal)
+        self.speed_slider.setRange(1, 20)
+        self.speed_slider.setValue(2)
+        self.speed_slider.valueChanged.connect(self.update_speed)
+        self.layout.addWidget(self.speed_slider)
+        self.skip_button = QPushButton("Skip to End")
+        self.skip_button.clicked.connect(self.skip_animation)
+        self.skip_button.setEnabled(False)
+        self.layout.addWidget(self.skip_button)
+        self.animation_timer = QTimer(self)
+        self.animation_timer.timeout.connect(self.animate_step)
+        self.update_speed()
         self.status_label = QLabel("Welcome to N-Puzzle!")
         self.layout.addWidget(self.status_label)
+        self.progress_label = QLabel("")
+        self.layout.addWidget(self.progress_label)
         self.goal_state = PuzzleState(self.size)
         self.current_state = self.goal_state
         self.update_grid()
 
-    def update_grid(self):
-        print("Updating GUI with state:", self.current_state.tiles)
-        for i in reversed(range(self.grid_layout.count())):
-            self.grid_layout.itemAt(i).widget().setParent(None)
+    def set_controls_enabled(self, enabled):
+        self.shuffle_button.setEnabled(enabled)
+        self.solve_button.setEnabled(enabled)
+        self.compare_button.setEnabled(enabled)
+        self.plot_button.setEnabled(enabled)
+
+    def start_search(self, name, heuristic_fn, on_result, profile=False):
+        worker = SearchWorker(
+            name,
+            self.search_fn,
+            self.current_state,
+            heuristic_fn,
+            self.max_nodes,
+            None if profile else self.solution_cache,
+            self.anytime_budget if self.search_fn is anytime_search else None,
+            profile,
+        )
+        worker.progress.connect(self.show_progress)
+        worker.improved.connect(self.show_improvement)
+        worker.result.connect(on_result)
+        self.workers[name] = worker
+        self.cancel_button.setEnabled(True)
+        worker.start()
+
+    def finish_search(self, name):
+        worker = self.workers.pop(name)
+        worker.wait()
+        self.progress.pop(name, None)
+        if not self.workers:
+            self.cancel_button.setEnabled(False)
+            self.progress_label.setText("")
+
+    def show_progress(self, name, info):
+        self.progress[name] = (
+            f"{name}: {info['nodes_expanded']} nodes, "
+            f"frontier {info['frontier_size']}, "
+            f"best h {info['best_heuristic']}, "
+            f"{info['elapsed']:.1f}s"
+        )
+        self.progress_label.setText("\n".join(self.progress.values()))
+
+    def show_improvement(self, name, solution, elapsed):
+        self.status_label.setText(
+            f"{name}: found {solution.depth} moves after {elapsed:.2f}s, improving..."
+        )
+
+    def cancel_search(self):
+        for worker in self.workers.values():
+            worker.cancel()
+        self.status_label.setText("Cancelling search...")
+
+    def closeEvent(self, event):
+        for worker in self.workers.values():
+            worker.cancel()
+            worker.wait()
+        super().closeEvent(event)
+
+    def build_grid(self):
+        for button in self.tile_buttons:
+            button.setParent(None)
+        self.tile_buttons = []
         for i in range(self.size):
             for j in range(self.size):
-                tile_value = self.current_state.tiles[i * self.size + j]
-                button = QPushButton(str(tile_value) if tile_value != 0 else "")
+                button = QPushButton()
                 button.setFixedSize(80, 80)
                 button.setStyleSheet("font-size: 20px;")
                 self.grid_layout.addWidget(button, i, j)
+                self.tile_buttons.append(button)
+
+    def update_grid(self):
+        print("Updating GUI with state:", self.current_state.tiles)
+        if len(self.tile_buttons) != self.size * self.size:
+            self.build_grid()
+        self.update_tiles(range(self.size * self.size))
+
+    def update_tiles(self, positions):
+        tiles = self.current_state.tiles
+        for pos in positions:
+            self.tile_buttons[pos].setText(str(tiles[pos]) if tiles[pos] != 0 else "")
 
     def shuffle_puzzle(self):
-        self.shuffle_button.setEnabled(False)
-        self.solve_button.setEnabled(False)
-        self.compare_button.setEnabled(False)
-        self.plot_button.setEnabled(False)
+        self.set_controls_enabled(False)
         QApplication.processEvents()
 
         try:
@@ -103,16 +306,10 @@ class NPuzzleGame(QMainWindow):
             )
             self.status_label.setText("Failed to shuffle puzzle.")
 
-        self.shuffle_button.setEnabled(True)
-        self.solve_button.setEnabled(True)
-        self.compare_button.setEnabled(True)
-        self.plot_button.setEnabled(True)
+        self.set_controls_enabled(True)
 
     def solve_puzzle(self):
-        self.shuffle_button.setEnabled(False)
-        self.solve_button.setEnabled(False)
-        self.compare_button.setEnabled(False)
-        self.plot_button.setEnabled(False)
+        self.set_controls_enabled(False)
         QApplication.processEvents()
 
         self.update_grid()
@@ -121,81 +318,88 @@ class NPuzzleGame(QMainWindow):
         if self.current_state.is_goal():
             QMessageBox.warning(self, "Invalid State", "Puzzle is already solved! Please shuffle first.")
             self.status_label.setText("Puzzle is already solved!")
-            self.shuffle_button.setEnabled(True)
-            self.solve_button.setEnabled(True)
-            self.compare_button.setEnabled(True)
-            self.plot_button.setEnabled(True)
+            self.set_controls_enabled(True)
             return
 
         if not self.current_state.is_solvable():
             QMessageBox.warning(self, "Unsolvable Puzzle", "The current puzzle is unsolvable.")
             self.status_label.setText("Unsolvable puzzle!")
-            self.shuffle_button.setEnabled(True)
-            self.solve_button.setEnabled(True)
-            self.compare_button.setEnabled(True)
-            self.plot_button.setEnabled(True)
+            self.set_controls_enabled(True)
             return
 
         heuristic_name = self.heuristic_dropdown.currentText()
-        status_text = f"Solving with Best-First Search and {heuristic_name}"
+        algorithm_name = self.algorithm_dropdown.currentText()
+        status_text = f"Solving with {algorithm_name} and {heuristic_name}"
         if self.size > 3:
             status_text += " (this may take a while for larger puzzles)..."
         self.status_label.setText(status_text)
         QApplication.processEvents()
 
         print("Solving from state:", self.current_state.tiles)
-        start_time = time.perf_counter()
-        solution, stats = best_first_search(
-            self.current_state, self.heuristic_fn, self.max_nodes
-        )
-        elapsed = time.perf_counter() - start_time
+        self.start_search(heuristic_name, self.heuristic_fn, self.on_solve_finished)
+
+    def on_solve_finished(self, heuristic_name, solution, stats, elapsed, metrics):
+        self.finish_search(heuristic_name)
         self.search_stats[heuristic_name] = {
             "solution": solution,
             "stats": stats,
             "time": elapsed,
+            "metrics": metrics,
         }
         print(f"{heuristic_name}: {elapsed:.6f} seconds")
 
         if solution:
             print("Solution depth:", solution.depth)
+            if stats["cache"]["hit"]:
+                print("Served from solution cache")
             QTimer.singleShot(100, lambda: self.show_solution_path(solution))
         else:
-            self.status_label.setText("No solution found within node limit.")
-            self.shuffle_button.setEnabled(True)
-            self.solve_button.setEnabled(True)
-            self.compare_button.setEnabled(True)
-            self.plot_button.setEnabled(True)
+            if stats.get("cancelled"):
+                self.status_label.setText("Search cancelled.")
+            else:
+                self.status_label.setText("No solution found within node limit.")
+            self.set_controls_enabled(True)
 
     def show_solution_path(self, solution):
-        self.path = solution.get_path()
-        print(
-            "Solution path first state:", self.path[0].tiles if self.path else "Empty"
-        )
-        if self.path and self.path[0].tiles != self.current_state.tiles:
-            print("Warning: Path start does not match current state!")
-        self.path_index = 0
-
-        def display_next_state():
-            if self.path_index < len(self.path):
-                self.current_state = self.path[self.path_index]
-                self.update_grid()
-                QApplication.processEvents()
-                self.path_index += 1
-                QTimer.singleShot(500, display_next_state)
-            else:
-                self.status_label.setText("Solution path completed!")
-                self.shuffle_button.setEnabled(True)
-                self.solve_button.setEnabled(True)
-                self.compare_button.setEnabled(True)
-                self.plot_button.setEnabled(True)
+        moves = solution_moves(solution)
+        print("Solution moves:", moves)
+        self.current_state = PuzzleState(self.size, self.current_state.tiles)
+        self.update_grid()
+        self.playback = replay(self.current_state.tiles, self.size, moves)
+        self.skip_button.setEnabled(True)
+        self.animation_timer.start()
+
+    def update_speed(self):
+        moves_per_second = self.speed_slider.value()
+        self.speed_label.setText(f"Animation speed: {moves_per_second} moves/s")
+        self.animation_timer.setInterval(1000 // moves_per_second)
+
+    def animate_step(self):
+        changed = next(self.playback, None)
+        if changed is None:
+            self.finish_animation()
+        else:
+            self.update_tiles(changed)
+
+    def skip_animation(self):
+        for _ in self.playback or ():
+            pass
+        self.update_grid()
+        self.finish_animation()
 
-        QTimer.singleShot(0, display_next_state)
+    def stop_animation(self):
+        self.animation_timer.stop()
+        self.playback = None
+        self.skip_button.setEnabled(False)
+        self.current_state = PuzzleState(self.size, self.current_state.tiles)
+
+    def finish_animation(self):
+        self.stop_animation()
+        self.status_label.setText("Solution path completed!")
+        self.set_controls_enabled(True)
 
     def compare_heuristics(self):
-        self.shuffle_button.setEnabled(False)
-        self.solve_button.setEnabled(False)
-        self.compare_button.setEnabled(False)
-        self.plot_button.setEnabled(False)
+        self.set_controls_enabled(False)
         QApplication.processEvents()
 
         if not self.current_state.is_solvable():
@@ -203,37 +407,41 @@ class NPuzzleGame(QMainWindow):
                 self, "Unsolvable Puzzle", "The current puzzle is unsolvable."
             )
             self.status_label.setText("Unsolvable puzzle!")
-            self.shuffle_button.setEnabled(True)
-            self.solve_button.setEnabled(True)
-            self.compare_button.setEnabled(True)
-            self.plot_button.setEnabled(True)
+            self.set_controls_enabled(True)
             return
 
-        self.status_label.setText("Comparing all heuristics with Best-First Search...")
+        algorithm_name = self.algorithm_dropdown.currentText()
+        self.status_label.setText(f"Comparing all heuristics with {algorithm_name}...")
         QApplication.processEvents()
         heuristics = [
             ("Manhattan Distance", manhattan_distance),
             ("Misplaced Tiles", misplaced_tiles),
             ("Nilssons Sequence", nilssons_sequence),
             ("Linear Conflict", linear_conflict),
+            ("Walking Distance", walking_distance),
         ]
         self.search_stats = {}
+        self.comparison_algorithm = algorithm_name
         for heuristic_name, heuristic_fn in heuristics:
-            self.status_label.setText(f"Solving with {heuristic_name}...")
-            QApplication.processEvents()
-            start_time = time.perf_counter()
-            solution, stats = best_first_search(
-                self.current_state, heuristic_fn, self.max_nodes
+            self.start_search(
+                heuristic_name, heuristic_fn, self.on_compare_finished, profile=True
             )
-            elapsed = time.perf_counter() - start_time
-            self.search_stats[heuristic_name] = {
-                "solution": solution,
-                "stats": stats,
-                "time": elapsed,
-            }
-            print(f"{heuristic_name}: {elapsed:.6f} seconds")
-
-        results_text = "Heuristic Comparison Results (Best-First Search):\n\n"
+
+    def on_compare_finished(self, heuristic_name, solution, stats, elapsed, metrics):
+        self.finish_search(heuristic_name)
+        self.search_stats[heuristic_name] = {
+            "solution": solution,
+            "stats": stats,
+            "time": elapsed,
+            "metrics": metrics,
+        }
+        print(f"{heuristic_name}: {elapsed:.6f} seconds")
+        if not self.workers:
+            self.show_comparison_results()
+
+    def show_comparison_results(self):
+        algorithm_name = self.comparison_algorithm
+        results_text = f"Heuristic Comparison Results ({algorithm_name}):\n\n"
         for heuristic_name, data in self.search_stats.items():
             stats = data["stats"]
             elapsed = data["time"]
@@ -243,21 +451,31 @@ class NPuzzleGame(QMainWindow):
                     f"{heuristic_name}:\n"
                     f"  Time: {elapsed:.4f} seconds\n"
                     f"  Depth: {solution.depth}\n"
-                    f"  Nodes Expanded: {stats['nodes_expanded']}\n\n"
+                    f"  Nodes Expanded: {stats['nodes_expanded']}\n"
                 )
             else:
+                reason = "Cancelled" if stats.get("cancelled") else "No solution found within node limit"
                 results_text += (
                     f"{heuristic_name}:\n"
-                    f"  No solution found within node limit\n"
+                    f"  {reason}\n"
                     f"  Time: {elapsed:.4f} seconds\n"
-                    f"  Nodes Expanded: {stats['nodes_expanded']}\n\n"
+                    f"  Nodes Expanded: {stats['nodes_expanded']}\n"
+                )
+            profile = stats.get("profile")
+            if profile:
+                results_text += (
+                    f"  Heuristic: {profile['heuristic_time']:.4f}s "
+                    f"({profile['heuristic_calls']} calls)\n"
+                    f"  Expansion: {profile['expansion_time']:.4f}s\n"
+                    f"  Frontier: {profile['frontier_time']:.4f}s "
+                    f"({profile['frontier_pushes']} pushes, {profile['frontier_pops']} pops)\n"
+                    f"  Retained allocations/node (whole process, all running searches): "
+                    f"{profile['retained_blocks_per_node']:.2f}\n"
                 )
+            results_text += "\n"
         QMessageBox.information(self, "Heuristic Comparison", results_text)
         self.status_label.setText("Comparison results displayed.")
-        self.shuffle_button.setEnabled(True)
-        self.solve_button.setEnabled(True)
-        self.compare_button.setEnabled(True)
-        self.plot_button.setEnabled(True)
+        self.set_controls_enabled(True)
 
     def update_heuristic(self):
         selected_heuristic = self.heuristic_dropdown.currentText()
@@ -269,9 +487,38 @@ class NPuzzleGame(QMainWindow):
             self.heuristic_fn = linear_conflict
         elif selected_heuristic == "Nilssons Sequence":
             self.heuristic_fn = nilssons_sequence
+        elif selected_heuristic == "Walking Distance":
+            self.heuristic_fn = walking_distance
+        elif selected_heuristic == "Pattern Database":
+            self.heuristic_fn = pattern_database
         self.status_label.setText(f"Heuristic set to {selected_heuristic}")
 
+    def update_algorithm(self):
+        selected_algorithm = self.algorithm_dropdown.currentText()
+        if selected_algorithm == "Best-First Search":
+            self.search_fn = best_first_search
+        elif selected_algorithm == "IDA*":
+            self.search_fn = ida_star_search
+        elif selected_algorithm == "Batched Best-First Search":
+            self.search_fn = batched_best_first_search
+        elif selected_algorithm == "Bidirectional BFS":
+            self.search_fn = bidirectional_search
+        elif selected_algorithm == "Weighted A*":
+            self.search_fn = weighted_a_star_search
+        elif selected_algorithm == "Anytime A* (ARA*)":
+            self.search_fn = anytime_search
+        elif selected_algorithm == "External-Memory Search":
+            self.search_fn = external_search
+        elif selected_algorithm == "Parallel HDA*":
+            self.search_fn = hda_star_search
+        elif selected_algorithm == "Lookup Table (3x3)":
+            self.search_fn = table_solve
+        self.status_label.setText(f"Algorithm set to {selected_algorithm}")
+
     def update_size(self):
+        if self.playback is not None:
+            self.stop_animation()
+            self.set_controls_enabled(True)
         selected_size = self.size_dropdown.currentText()
         if selected_size == "3x3":
             self.size = 3
@@ -293,20 +540,20 @@ class NPuzzleGame(QMainWindow):
             QMessageBox.warning(self, "No Data", "No search data available to plot!")
             self.status_label.setText("No search data available to plot!")
             return
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(10, 6))
         for heuristic_name, data in self.search_stats.items():
-            stats = data["stats"]
-            if "nodes_explored_at_steps" not in stats:
+            if "metrics" not in data:
                 continue
-            nodes_explored = stats["nodes_explored_at_steps"]
-            iterations = list(range(len(nodes_explored)))
+            series = data["metrics"]["series"]
             plt.plot(
-                iterations,
-                nodes_explored,
+                series["elapsed"],
+                series["nodes_expanded"],
                 label=f"{heuristic_name} (Time: {data['time']:.4f}s)",
             )
-        plt.title("Nodes Explored vs. Iterations for Each Heuristic (Best-First Search)")
-        plt.xlabel("Iterations")
+        plt.title("Nodes Explored over Time for Each Heuristic")
+        plt.xlabel("Elapsed Time (s)")
         plt.ylabel("Number of Nodes Explored")
         plt.grid(True)
         plt.legend()
@@ -0,0 +1,66 @@
+import csv
+import json
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+SERIES = ("nodes_expanded", "frontier_size", "h", "elapsed")
+
+
+class MetricsRecorder:
+    def __init__(self, capacity: int = 512):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.capacity = capacity
+        self.stride = 1
+        self.samples = 0
+        self.start = time.perf_counter()
+        self.series: Dict[str, List[float]] = {name: [] for name in SERIES}
+        self.counters: Counter = Counter()
+        self.h_histogram: Counter = Counter()
+        self.depth_histogram: Counter = Counter()
+
+    def record(
+        self, nodes_expanded: int, frontier_size: int, h: Optional[int], depth: int
+    ) -> None:
+        if h is not None:
+            self.h_histogram[h] += 1
+        self.depth_histogram[depth] += 1
+        self.samples += 1
+        if self.samples % self.stride:
+            return
+        series = self.series
+        series["nodes_expanded"].append(nodes_expanded)
+        series["frontier_size"].append(frontier_size)
+        series["h"].append(h)
+        series["elapsed"].append(time.perf_counter() - self.start)
+        if len(series["elapsed"]) >= self.capacity:
+            for name in SERIES:
+                del series[name][::2]
+            self.stride *= 2
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        self.counters[name] += amount
+
+    def to_dict(self) -> dict:
+        return {
+            "stride": self.stride,
+            "samples": self.samples,
+            "series": {name: list(values) for name, values in self.series.items()},
+            "counters": dict(self.counters),
+            "h_histogram": dict(sorted(self.h_histogram.items())),
+            "depth_histogram": dict(sorted(self.depth_histogram.items())),
+        }
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        text = json.dumps(self.to_dict())
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+    def to_csv(self, path: str) -> None:
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(SERIES)
+            writer.writerows(zip(*(self.series[name] for name in SERIES)))
@@ -0,0 +1,100 @@
+from typing import Dict, List, Sequence
+
+from packed import neighbors
+
+_MANHATTAN_TABLES: Dict[int, List[List[int]]] = {}
+_MANHATTAN_DELTAS: Dict[int, List[int]] = {}
+_LINE_PENALTIES: Dict[tuple, int] = {}
+
+
+def manhattan_table(size: int) -> List[List[int]]:
+    table = _MANHATTAN_TABLES.get(size)
+    if table is None:
+        table = [[0] * (size * size)]
+        for tile in range(1, size * size):
+            goal_row, goal_col = divmod(tile - 1, size)
+            table.append(
+                [
+                    abs(goal_row - pos // size) + abs(goal_col - pos % size)
+                    for pos in range(size * size)
+                ]
+            )
+        _MANHATTAN_TABLES[size] = table
+    return table
+
+
+def manhattan_deltas(size: int) -> List[int]:
+    deltas = _MANHATTAN_DELTAS.get(size)
+    if deltas is None:
+        n = size * size
+        table = manhattan_table(size)
+        deltas = [0] * (n * n * 4)
+        for blank, moves in enumerate(neighbors(size)):
+            for new_blank, move in moves:
+                for tile in range(1, n):
+                    deltas[(tile * n + new_blank) * 4 + move] = (
+                        table[tile][blank] - table[tile][new_blank]
+                    )
+        _MANHATTAN_DELTAS[size] = deltas
+    return deltas
+
+
+def line_penalty(goals: tuple) -> int:
+    penalty = _LINE_PENALTIES.get(goals)
+    if penalty is None:
+        longest = [1] * len(goals)
+        for i in range(len(goals)):
+            for j in range(i):
+                if goals[j] < goals[i] and longest[j] + 1 > longest[i]:
+                    longest[i] = longest[j] + 1
+        penalty = 2 * (len(goals) - max(longest, default=0))
+        _LINE_PENALTIES[goals] = penalty
+    return penalty
+
+
+def conflict_penalty(tiles: Sequence[int], size: int) -> int:
+    penalty = 0
+    for line in range(size):
+        row_goals = []
+        col_goals = []
+        for i in range(size):
+            tile = tiles[line * size + i]
+            if tile and (tile - 1) // size == line:
+                row_goals.append((tile - 1) % size)
+            tile = tiles[i * size + line]
+            if tile and (tile - 1) % size == line:
+                col_goals.append((tile - 1) // size)
+        penalty += line_penalty(tuple(row_goals)) + line_penalty(tuple(col_goals))
+    return penalty
+
+
+class Board:
+    __slots__ = ("size", "n", "tiles", "blank", "manhattan", "neighbors", "deltas")
+
+    def __init__(self, size: int, tiles: Sequence[int]):
+        self.size = size
+        self.n = size * size
+        self.tiles = list(tiles)
+        self.blank = self.tiles.index(0)
+        self.neighbors = neighbors(size)
+        self.deltas = manhattan_deltas(size)
+        table = manhattan_table(size)
+        self.manhattan = sum(table[tile][pos] for pos, tile in enumerate(self.tiles))
+
+    def make(self, new_blank: int, move: int) -> int:
+        tiles = self.tiles
+        tile = tiles[new_blank]
+        tiles[self.blank] = tile
+        tiles[new_blank] = 0
+        self.blank = new_blank
+        self.manhattan += self.deltas[(tile * self.n + new_blank) * 4 + move]
+        return tile
+
+    def unmake(self, old_blank: int, move: int) -> None:
+        tiles = self.tiles
+        new_blank = self.blank
+        tile = tiles[old_blank]
+        tiles[new_blank] = tile
+        tiles[old_blank] = 0
+        self.blank = old_blank
+        self.manhattan -= self.deltas[(tile * self.n + new_blank) * 4 + move]
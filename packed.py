@@ -0,0 +1,246 @@
+from array import array
+from typing import Dict, Iterator, List, MutableSequence, Sequence, Tuple, Union
+
+from puzzle import PuzzleState
+
+DIRECTIONS = ("up", "down", "left", "right")
+MOVE_CODES = "UDLR"
+
+_NEIGHBORS: Dict[int, Tuple[Tuple[Tuple[int, int], ...], ...]] = {}
+
+
+def tile_bits(size: int) -> int:
+    return max(4, (size * size - 1).bit_length())
+
+
+def pack_tiles(tiles: List[int], bits: int) -> int:
+    packed = 0
+    for i, tile in enumerate(tiles):
+        packed |= tile << (i * bits)
+    return packed
+
+
+def unpack_tiles(packed: int, n: int, bits: int) -> List[int]:
+    mask = (1 << bits) - 1
+    return [(packed >> (i * bits)) & mask for i in range(n)]
+
+
+def goal_packed(size: int) -> int:
+    return pack_tiles(list(range(1, size * size)) + [0], tile_bits(size))
+
+
+def neighbors(size: int) -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    table = _NEIGHBORS.get(size)
+    if table is None:
+        rows = []
+        for blank in range(size * size):
+            row, col = divmod(blank, size)
+            moves = []
+            if row > 0:
+                moves.append((blank - size, 0))
+            if row < size - 1:
+                moves.append((blank + size, 1))
+            if col > 0:
+                moves.append((blank - 1, 2))
+            if col < size - 1:
+                moves.append((blank + 1, 3))
+            rows.append(tuple(moves))
+        table = _NEIGHBORS[size] = tuple(rows)
+    return table
+
+
+class NodeStore:
+    __slots__ = ("keys", "blanks", "parents", "moves", "depths")
+
+    def __init__(self, size: int):
+        if size * size * tile_bits(size) <= 64:
+            self.keys = array("Q")
+        else:
+            self.keys = []
+        self.blanks = bytearray()
+        self.parents = array("i")
+        self.moves = bytearray()
+        self.depths = array("I")
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def add(self, packed: int, blank: int, parent: int, move: int) -> int:
+        index = len(self.parents)
+        self.keys.append(packed)
+        self.blanks.append(blank)
+        self.parents.append(parent)
+        self.moves.append(move)
+        self.depths.append(self.depths[parent] + 1 if parent >= 0 else 0)
+        return index
+
+    def moves_to(self, index: int) -> str:
+        path = []
+        while self.parents[index] >= 0:
+            path.append(MOVE_CODES[self.moves[index]])
+            index = self.parents[index]
+        return "".join(reversed(path))
+
+    def nbytes(self) -> int:
+        if isinstance(self.keys, array):
+            key_bytes = self.keys.itemsize * len(self.keys)
+        else:
+            key_bytes = sum(8 + (k.bit_length() + 7) // 8 for k in self.keys)
+        return (
+            key_bytes
+            + len(self.blanks)
+            + self.parents.itemsize * len(self.parents)
+            + len(self.moves)
+            + self.depths.itemsize * len(self.depths)
+        )
+
+
+# Each slot keeps its board, blank, parent index and a 2-bit incoming move, four moves to a
+# byte. A slot counts its children; when a popped node ends up with none it is released and
+# the release walks up through ancestors whose last child just went, so only the frontier
+# and the paths leading to it stay allocated.
+class NodeArena:
+    __slots__ = ("keys", "blanks", "parents", "moves", "depths", "children", "free")
+
+    def __init__(self, size: int):
+        if size * size * tile_bits(size) <= 64:
+            self.keys = array("Q")
+        else:
+            self.keys = []
+        self.blanks = bytearray()
+        self.parents = array("i")
+        self.moves = bytearray()
+        self.depths = array("I")
+        self.children = bytearray()
+        self.free = array("i")
+
+    def __len__(self) -> int:
+        return len(self.parents) - len(self.free)
+
+    @property
+    def slots(self) -> int:
+        return len(self.parents)
+
+    def add(self, packed: int, blank: int, parent: int, move: int) -> int:
+        depth = 0
+        if parent >= 0:
+            self.children[parent] += 1
+            depth = self.depths[parent] + 1
+        shift = 0
+        if self.free:
+            index = self.free.pop()
+            self.keys[index] = packed
+            self.blanks[index] = blank
+            self.parents[index] = parent
+            self.depths[index] = depth
+            self.children[index] = 0
+            shift = (index & 3) * 2
+            self.moves[index >> 2] &= ~(3 << shift) & 0xFF
+        else:
+            index = len(self.parents)
+            self.keys.append(packed)
+            self.blanks.append(blank)
+            self.parents.append(parent)
+            self.depths.append(depth)
+            self.children.append(0)
+            if index & 3:
+                shift = (index & 3) * 2
+            else:
+                self.moves.append(0)
+        self.moves[index >> 2] |= move << shift
+        return index
+
+    def move(self, index: int) -> int:
+        return (self.moves[index >> 2] >> ((index & 3) * 2)) & 3
+
+    def release(self, index: int) -> None:
+        children = self.children
+        parents = self.parents
+        free = self.free
+        while True:
+            free.append(index)
+            index = parents[index]
+            if index < 0:
+                return
+            children[index] -= 1
+            if children[index]:
+                return
+
+    def moves_to(self, index: int) -> str:
+        path = []
+        while self.parents[index] >= 0:
+            path.append(MOVE_CODES[self.move(index)])
+            index = self.parents[index]
+        return "".join(reversed(path))
+
+    def nbytes(self) -> int:
+        if isinstance(self.keys, array):
+            key_bytes = self.keys.itemsize * len(self.keys)
+        else:
+            key_bytes = sum(8 + (k.bit_length() + 7) // 8 for k in self.keys)
+        return (
+            key_bytes
+            + len(self.blanks)
+            + self.parents.itemsize * len(self.parents)
+            + len(self.moves)
+            + self.depths.itemsize * len(self.depths)
+            + len(self.children)
+            + self.free.itemsize * len(self.free)
+        )
+
+    def bytes_per_node(self) -> float:
+        return self.nbytes() / max(len(self.parents), 1)
+
+
+def encode_moves(moves: Sequence[str]) -> str:
+    return "".join(MOVE_CODES[DIRECTIONS.index(direction)] for direction in moves)
+
+
+def decode_moves(codes: str) -> List[str]:
+    return [DIRECTIONS[MOVE_CODES.index(letter)] for letter in codes]
+
+
+def build_solution(initial_state: PuzzleState, moves: Union[str, Sequence[str]]) -> PuzzleState:
+    codes = moves if isinstance(moves, str) else encode_moves(moves)
+    if not codes:
+        return initial_state
+    tiles = initial_state.tiles.copy()
+    blank = initial_state.blank_pos
+    for _, blank in replay(tiles, initial_state.size, codes):
+        pass
+    solution = PuzzleState(initial_state.size, tiles, blank)
+    solution.move_from_parent = DIRECTIONS[MOVE_CODES.index(codes[-1])]
+    solution.depth = initial_state.depth + len(codes)
+    solution.path_root = initial_state
+    solution.path_moves = codes
+    return solution
+
+
+def solution_moves(solution: PuzzleState) -> str:
+    codes = []
+    state = solution
+    while True:
+        if state.path_moves is not None:
+            codes.append(state.path_moves[::-1])
+            state = state.path_root
+        elif state.parent is not None:
+            codes.append(MOVE_CODES[DIRECTIONS.index(state.move_from_parent)])
+            state = state.parent
+        else:
+            return "".join(codes)[::-1]
+
+
+def replay(tiles: MutableSequence[int], size: int, moves: str) -> Iterator[Tuple[int, int]]:
+    blank = tiles.index(0)
+    offsets = (-size, size, -1, 1)
+    for letter in moves:
+        move = MOVE_CODES.index(letter)
+        row, col = divmod(blank, size)
+        if (move == 0 and row == 0) or (move == 1 and row == size - 1) or (
+            move == 2 and col == 0
+        ) or (move == 3 and col == size - 1):
+            raise ValueError(f"move {letter!r} leaves the board from position {blank}")
+        target = blank + offsets[move]
+        tiles[blank], tiles[target] = tiles[target], 0
+        yield blank, target
+        blank = target
@@ -0,0 +1,56 @@
+from typing import List, Sequence
+
+
+def inversion_count(tiles: Sequence[int]) -> int:
+    n = len(tiles)
+    tree = [0] * n
+    inversions = 0
+    for tile in reversed(tiles):
+        if tile == 0:
+            continue
+        i = tile - 1
+        while i > 0:
+            inversions += tree[i]
+            i &= i - 1
+        i = tile
+        while i < n:
+            tree[i] += 1
+            i += i & -i
+    return inversions
+
+
+def inversion_parity(tiles: Sequence[int]) -> int:
+    n = len(tiles)
+    visited = bytearray(n)
+    cycles = 0
+    blank_pos = 0
+    for start in range(n):
+        if visited[start]:
+            continue
+        cycles += 1
+        pos = start
+        while not visited[pos]:
+            visited[pos] = 1
+            tile = tiles[pos]
+            if tile == 0:
+                blank_pos = pos
+                pos = n - 1
+            else:
+                pos = tile - 1
+    return (n - cycles + n - 1 - blank_pos) & 1
+
+
+def is_solvable(tiles: Sequence[int], size: int) -> bool:
+    parity = inversion_parity(tiles)
+    if size % 2 == 1:
+        return parity == 0
+    blank_row_from_bottom = size - tiles.index(0) // size
+    return (parity + blank_row_from_bottom) % 2 == 1
+
+
+def make_solvable(tiles: List[int], size: int) -> List[int]:
+    if not is_solvable(tiles, size):
+        first = 0 if tiles[0] != 0 else 1
+        second = first + 1 if tiles[first + 1] != 0 else first + 2
+        tiles[first], tiles[second] = tiles[second], tiles[first]
+    return tiles
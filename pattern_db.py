@@ -0,0 +1,270 @@
+import argparse
+import mmap
+import os
+import struct
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+MAGIC = b"NPDB"
+VERSION = 1
+UNSEEN = 0xFF
+
+DEFAULT_PARTITIONS = {
+    3: ((1, 2, 3, 4), (5, 6, 7, 8)),
+    4: ((1, 5, 6, 9, 13), (2, 3, 4, 7, 8), (10, 11, 12, 14, 15)),
+    5: (
+        (1, 2, 6, 7),
+        (3, 4, 8, 9),
+        (5, 10, 15, 20),
+        (11, 12, 16, 17),
+        (13, 14, 18, 19),
+        (21, 22, 23, 24),
+    ),
+}
+AUTO_BUILD_SIZES = (3,)
+
+_HEADER = struct.Struct("<4sHBB")
+_ENTRY = struct.Struct("<QQ")
+
+_DATABASES: Dict[int, Optional["PatternDatabase"]] = {}
+
+
+def table_dir() -> str:
+    return os.environ.get(
+        "NPUZZLE_TABLE_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables"),
+    )
+
+
+def default_path(size: int) -> str:
+    return os.path.join(table_dir(), f"pdb_{size}x{size}.npdb")
+
+
+def permutation_count(n: int, k: int) -> int:
+    count = 1
+    for i in range(k):
+        count *= n - i
+    return count
+
+
+def rank_positions(positions: Sequence[int], n: int) -> int:
+    rank = 0
+    for i, pos in enumerate(positions):
+        smaller = 0
+        for j in range(i):
+            if positions[j] < pos:
+                smaller += 1
+        rank = rank * (n - i) + pos - smaller
+    return rank
+
+
+def _neighbor_cells(size: int) -> List[List[int]]:
+    cells = []
+    for pos in range(size * size):
+        row, col = divmod(pos, size)
+        adjacent = []
+        if row > 0:
+            adjacent.append(pos - size)
+        if row < size - 1:
+            adjacent.append(pos + size)
+        if col > 0:
+            adjacent.append(pos - 1)
+        if col < size - 1:
+            adjacent.append(pos + 1)
+        cells.append(adjacent)
+    return cells
+
+
+def unrank_positions(rank: int, n: int, k: int) -> List[int]:
+    digits = [0] * k
+    for i in range(k - 1, -1, -1):
+        rank, digits[i] = divmod(rank, n - i)
+    free = list(range(n))
+    return [free.pop(digit) for digit in digits]
+
+
+def _region_masks(size: int) -> Tuple[int, int, int]:
+    full = (1 << (size * size)) - 1
+    first_col = sum(1 << (row * size) for row in range(size))
+    last_col = first_col << (size - 1)
+    return full, full & ~first_col, full & ~last_col
+
+
+def _blank_region(start: int, empty: int, size: int, masks: Tuple[int, int, int]) -> int:
+    full, not_first, not_last = masks
+    region = start
+    while True:
+        grown = (
+            region
+            | ((region << 1) & not_first)
+            | ((region >> 1) & not_last)
+            | ((region << size) & full)
+            | (region >> size)
+        ) & empty
+        if grown == region:
+            return region
+        region = grown
+
+
+# Breadth-first from the goal over (pattern rank, blank region) pairs. Blank moves that do not
+# touch a pattern tile are free, so the blank is only tracked up to its region, named by its
+# smallest cell; regions are flood-filled as bitmasks of empty cells. Each layer is a flat
+# array of rank * n + region keys and the visited set is a bitset over the same keys.
+def build_pattern_table(size: int, pattern: Sequence[int]) -> bytearray:
+    n = size * size
+    k = len(pattern)
+    adjacent = _neighbor_cells(size)
+    masks = _region_masks(size)
+    full = masks[0]
+    table = bytearray([UNSEEN]) * permutation_count(n, k)
+    seen = bytearray((len(table) * n + 7) // 8)
+
+    positions = [tile - 1 for tile in pattern]
+    empty = full
+    for pos in positions:
+        empty ^= 1 << pos
+    rank = rank_positions(positions, n)
+    table[rank] = 0
+    region = _blank_region(1 << (n - 1), empty, size, masks)
+    key = rank * n + (region & -region).bit_length() - 1
+    seen[key >> 3] |= 1 << (key & 7)
+
+    frontier = array("Q", [key])
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = array("Q")
+        append = next_frontier.append
+        for key in frontier:
+            rank, blank = divmod(key, n)
+            positions = unrank_positions(rank, n, k)
+            board = [-1] * n
+            empty = full
+            for i, pos in enumerate(positions):
+                board[pos] = i
+                empty ^= 1 << pos
+            cells = _blank_region(1 << blank, empty, size, masks)
+            while cells:
+                bit = cells & -cells
+                cells ^= bit
+                cell = bit.bit_length() - 1
+                for nb in adjacent[cell]:
+                    index = board[nb]
+                    if index < 0:
+                        continue
+                    positions[index] = cell
+                    child = rank_positions(positions, n)
+                    positions[index] = nb
+                    region = _blank_region(1 << nb, empty ^ bit ^ (1 << nb), size, masks)
+                    key = child * n + (region & -region).bit_length() - 1
+                    if seen[key >> 3] & (1 << (key & 7)):
+                        continue
+                    seen[key >> 3] |= 1 << (key & 7)
+                    if table[child] == UNSEEN:
+                        table[child] = depth
+                    append(key)
+        frontier = next_frontier
+    return table
+
+
+def save_database(
+    path: str, size: int, patterns: Sequence[Sequence[int]], tables: Sequence[bytes]
+) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    header = _HEADER.pack(MAGIC, VERSION, size, len(patterns))
+    descriptors = b"".join(bytes([len(p)]) + bytes(p) for p in patterns)
+    offset = len(header) + len(descriptors) + _ENTRY.size * len(patterns)
+    offset = (offset + 4095) & ~4095
+    entries = []
+    for table in tables:
+        entries.append(_ENTRY.pack(offset, len(table)))
+        offset = (offset + len(table) + 4095) & ~4095
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header + descriptors + b"".join(entries))
+        for entry, table in zip(entries, tables):
+            f.seek(_ENTRY.unpack(entry)[0])
+            f.write(table)
+    os.replace(tmp_path, path)
+
+
+class PatternDatabase:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, size, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a pattern database")
+        if version != VERSION:
+            raise ValueError(f"{path} has unsupported version {version}")
+        self.size = size
+        self.path = path
+        self.patterns: List[Tuple[int, ...]] = []
+        offset = _HEADER.size
+        for _ in range(count):
+            k = self._mmap[offset]
+            self.patterns.append(tuple(self._mmap[offset + 1 : offset + 1 + k]))
+            offset += 1 + k
+        view = memoryview(self._mmap)
+        self.tables = []
+        for i in range(count):
+            start, length = _ENTRY.unpack_from(self._mmap, offset + i * _ENTRY.size)
+            self.tables.append(view[start : start + length])
+
+    def evaluate(self, tiles: Sequence[int]) -> int:
+        where = [0] * len(tiles)
+        for pos, tile in enumerate(tiles):
+            where[tile] = pos
+        n = len(tiles)
+        total = 0
+        for pattern, table in zip(self.patterns, self.tables):
+            total += table[rank_positions([where[t] for t in pattern], n)]
+        return total
+
+
+def build_database(
+    size: int,
+    patterns: Optional[Sequence[Sequence[int]]] = None,
+    path: Optional[str] = None,
+) -> str:
+    patterns = patterns or DEFAULT_PARTITIONS[size]
+    path = path or default_path(size)
+    tiles = [tile for pattern in patterns for tile in pattern]
+    if len(set(tiles)) != len(tiles) or not all(0 < t < size * size for t in tiles):
+        raise ValueError("patterns must be disjoint sets of tiles 1..n-1")
+    tables = [build_pattern_table(size, pattern) for pattern in patterns]
+    save_database(path, size, patterns, tables)
+    return path
+
+
+def load_database(size: int) -> Optional[PatternDatabase]:
+    if size in _DATABASES:
+        return _DATABASES[size]
+    path = default_path(size)
+    if not os.path.exists(path) and size in AUTO_BUILD_SIZES:
+        build_database(size, path=path)
+    database = PatternDatabase(path) if os.path.exists(path) else None
+    _DATABASES[size] = database
+    return database
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build additive pattern databases.")
+    parser.add_argument("size", type=int)
+    parser.add_argument("--output")
+    parser.add_argument(
+        "--pattern",
+        action="append",
+        help="comma-separated tiles of one pattern; repeat for each pattern",
+    )
+    args = parser.parse_args(argv)
+    patterns = None
+    if args.pattern:
+        patterns = [tuple(int(t) for t in p.split(",")) for p in args.pattern]
+    print(build_database(args.size, patterns, args.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import functools
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+MODES = ("timers", "cprofile", "tracemalloc")
+
+_ACTIVE = threading.local()
+
+
+def active_profiler() -> Optional["SearchProfiler"]:
+    return getattr(_ACTIVE, "profiler", None)
+
+
+class _TimedQueue:
+    __slots__ = ("queue", "profiler")
+
+    def __init__(self, queue, profiler: "SearchProfiler"):
+        self.queue = queue
+        self.profiler = profiler
+
+    def __len__(self) -> int:
+        return len(self.queue)
+
+    def __iter__(self):
+        return iter(self.queue)
+
+    def accepts(self, priority: int, key: int) -> bool:
+        return self.queue.accepts(priority, key)
+
+    def peek(self) -> int:
+        return self.queue.peek()
+
+    def push(self, priority: int, item: int) -> bool:
+        start = time.perf_counter()
+        result = self.queue.push(priority, item)
+        self.profiler.frontier_time += time.perf_counter() - start
+        self.profiler.pushes += 1
+        return result
+
+    def pop(self):
+        start = time.perf_counter()
+        result = self.queue.pop()
+        self.profiler.frontier_time += time.perf_counter() - start
+        self.profiler.pops += 1
+        return result
+
+
+class SearchProfiler:
+    def __init__(self, mode: str = "timers", output: Optional[str] = None):
+        if mode not in MODES:
+            raise ValueError(f"unknown profiling mode {mode!r}")
+        self.mode = mode
+        self.output = output
+        self.heuristic_time = 0.0
+        self.heuristic_calls = 0
+        self.frontier_time = 0.0
+        self.pushes = 0
+        self.pops = 0
+        self.total_time = 0.0
+        self.peak_bytes = 0
+        self.blocks = 0
+        self._profile = None
+        self._previous: Optional["SearchProfiler"] = None
+
+    def __enter__(self) -> "SearchProfiler":
+        self._previous = active_profiler()
+        _ACTIVE.profiler = self
+        if self.mode == "cprofile":
+            import cProfile
+
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif self.mode == "tracemalloc":
+            import tracemalloc
+
+            tracemalloc.start()
+        self._blocks = sys.getallocatedblocks()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.total_time = time.perf_counter() - self._start
+        self.blocks = sys.getallocatedblocks() - self._blocks
+        _ACTIVE.profiler = self._previous
+        if self._profile is not None:
+            self._profile.disable()
+            if self.output:
+                self._profile.dump_stats(self.output)
+        elif self.mode == "tracemalloc":
+            import tracemalloc
+
+            self.peak_bytes = tracemalloc.get_traced_memory()[1]
+            if self.output:
+                tracemalloc.take_snapshot().dump(self.output)
+            tracemalloc.stop()
+
+    def heuristic(self, heuristic_fn: Callable) -> Callable:
+        @functools.wraps(heuristic_fn)
+        def timed(state):
+            start = time.perf_counter()
+            value = heuristic_fn(state)
+            self.heuristic_time += time.perf_counter() - start
+            self.heuristic_calls += 1
+            return value
+
+        return timed
+
+    def frontier(self, queue):
+        return _TimedQueue(queue, self)
+
+    def report(self, nodes_expanded: int = 0) -> dict:
+        nodes = max(nodes_expanded, 1)
+        report = {
+            "mode": self.mode,
+            "total_time": self.total_time,
+            "heuristic_time": self.heuristic_time,
+            "frontier_time": self.frontier_time,
+            "expansion_time": max(self.total_time - self.heuristic_time - self.frontier_time, 0.0),
+            "heuristic_calls": self.heuristic_calls,
+            "frontier_pushes": self.pushes,
+            "frontier_pops": self.pops,
+            "retained_blocks_per_node": self.blocks / nodes,
+        }
+        if self.mode == "tracemalloc":
+            report["peak_bytes_per_node"] = self.peak_bytes / nodes
+        if self.output:
+            report["output"] = self.output
+        return report
+
+    def top_functions(self, limit: int = 10) -> str:
+        if self._profile is None:
+            return ""
+        import pstats
+        from io import StringIO
+
+        stream = StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats("tottime").print_stats(limit)
+        return stream.getvalue()
+
+
+def profile_search(
+    search_fn: Callable,
+    initial_state,
+    heuristic_fn: Callable,
+    *args,
+    mode: str = "timers",
+    output: Optional[str] = None,
+    **kwargs,
+):
+    if output:
+        directory = os.path.dirname(output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    with SearchProfiler(mode, output) as profiler:
+        solution, stats = search_fn(
+            initial_state, profiler.heuristic(heuristic_fn), *args, **kwargs
+        )
+    stats["profile"] = profiler.report(stats["nodes_expanded"])
+    return solution, stats
+
+
+def profiled(mode: str = "timers", output: Optional[str] = None):
+    def decorator(search_fn: Callable) -> Callable:
+        @functools.wraps(search_fn)
+        def wrapper(initial_state, heuristic_fn, *args, **kwargs):
+            return profile_search(
+                search_fn, initial_state, heuristic_fn, *args, mode=mode, output=output, **kwargs
+            )
+
+        return wrapper
+
+    return decorator
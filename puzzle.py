@@ -1,6 +1,8 @@
 import random
 from typing import List, Tuple, Optional
 
+from parity import is_solvable, make_solvable
+
 
 class PuzzleState:
     def __init__(
@@ -20,6 +22,8 @@ class PuzzleState:
         self.parent = None
         self.move_from_parent = None
         self.depth = 0
+        self.path_root = None
+        self.path_moves = None
         self._path_cache = None
 
     def __str__(self) -> str:
@@ -42,6 +46,8 @@ class PuzzleState:
         new_state.parent = self.parent
         new_state.move_from_parent = self.move_from_parent
         new_state.depth = self.depth
+        new_state.path_root = self.path_root
+        new_state.path_moves = self.path_moves
         return new_state
 
     def move(self, direction: str) -> Optional["PuzzleState"]:
@@ -88,64 +94,19 @@ class PuzzleState:
         return self.tiles == list(range(1, self.n)) + [0]
 
     def is_solvable(self) -> bool:
-        inversions = 0
-        for i in range(len(self.tiles)):
-            if self.tiles[i] == 0:
-                continue
-            for j in range(i + 1, len(self.tiles)):
-                if self.tiles[j] == 0:
-                    continue
-                if self.tiles[i] > self.tiles[j]:
-                    inversions += 1
-
-        blank_row_from_bottom = self.size - (self.blank_pos // self.size)
-
-        if self.size % 2 == 1:
-            return inversions % 2 == 0
-        else:
-            return (inversions + blank_row_from_bottom) % 2 == 0
+        return is_solvable(self.tiles, self.size)
 
-    def shuffle(self, moves: int = 100) -> "PuzzleState":
-        import random
+    def shuffle(
+        self, moves: Optional[int] = None, rng: Optional[random.Random] = None
+    ) -> "PuzzleState":
+        rng = rng or random
+        if moves is not None:
+            from scramble import random_walk
 
+            return PuzzleState(self.size, random_walk(self.size, moves, rng))
         tiles = list(range(1, self.n)) + [0]
-        random.shuffle(tiles)
-
-        inversions = 0
-        for i in range(len(tiles)):
-            if tiles[i] == 0:
-                continue
-            for j in range(i + 1, len(tiles)):
-                if tiles[j] == 0:
-                    continue
-                if tiles[i] > tiles[j]:
-                    inversions += 1
-
-        blank_pos = tiles.index(0)
-        blank_row_from_bottom = self.size - (blank_pos // self.size)
-
-        if self.size % 2 == 0:
-            if (inversions + blank_row_from_bottom) % 2 != 0:
-                for i in range(len(tiles)):
-                    if tiles[i] != 0:
-                        for j in range(i + 1, len(tiles)):
-                            if tiles[j] != 0:
-                                tiles[i], tiles[j] = tiles[j], tiles[i]
-                                break
-                        break
-        else:
-            if inversions % 2 != 0:
-                for i in range(len(tiles)):
-                    if tiles[i] != 0:
-                        for j in range(i + 1, len(tiles)):
-                            if tiles[j] != 0:
-                                tiles[i], tiles[j] = tiles[j], tiles[i]
-                                break
-                        break
-
-
-        new_state = PuzzleState(self.size, tiles)
-        return new_state
+        rng.shuffle(tiles)
+        return PuzzleState(self.size, make_solvable(tiles, self.size))
 
     def get_path(self) -> List["PuzzleState"]:
         if self._path_cache is not None:
@@ -153,8 +114,21 @@ class PuzzleState:
 
         path = []
         current = self
-        while current is not None:
+        while current.parent is not None and current.path_moves is None:
             path.append(current)
             current = current.parent
-        self._path_cache = path[::-1]
-        return self._path_cache
+        if current.path_moves is None:
+            path.append(current)
+            path.reverse()
+        else:
+            # Solvers return the final board with its moves as a string; the states in
+            # between are only built here, on request.
+            from packed import decode_moves
+
+            prefix = current.path_root.get_path().copy()
+            for direction in decode_moves(current.path_moves[:-1]):
+                prefix.append(prefix[-1].move(direction))
+            prefix.append(current)
+            path = prefix + path[::-1]
+        self._path_cache = path
+        return path
@@ -0,0 +1,283 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from puzzle import PuzzleState
+from packed import neighbors
+
+MAGIC = b"NPSC"
+VERSION = 1
+MEASURES = ("walk", "heuristic", "exact")
+MAX_ATTEMPTS = 10000
+
+_HEADER = struct.Struct("<4sHBxQ")
+_OPPOSITE = (1, 0, 3, 2, -1)
+
+
+def random_walk(size: int, depth: int, rng: random.Random) -> List[int]:
+    tiles = list(range(1, size * size)) + [0]
+    blank = size * size - 1
+    moves_table = neighbors(size)
+    previous = -1
+    for _ in range(depth):
+        choices = [nb for nb, _ in moves_table[blank] if nb != previous]
+        new_blank = rng.choice(choices)
+        tiles[blank], tiles[new_blank] = tiles[new_blank], 0
+        previous, blank = blank, new_blank
+    return tiles
+
+
+def _value_function(
+    size: int, measure: str, heuristic_fn: Optional[Callable[[PuzzleState], int]]
+) -> Callable[[List[int], int], int]:
+    if measure == "exact":
+        if size != 3:
+            raise ValueError("exact distances are only tabled for 3x3")
+        from eight_puzzle import distance
+
+        return lambda tiles, blank: distance(tiles)
+    if heuristic_fn is None:
+        from heuristics import manhattan_distance
+
+        heuristic_fn = manhattan_distance
+    scratch = PuzzleState(size)
+
+    def evaluate(tiles: List[int], blank: int) -> int:
+        scratch.tiles = tiles
+        scratch.blank_pos = blank
+        return heuristic_fn(scratch)
+
+    return evaluate
+
+
+def _check_band(size: int, band: Tuple[int, int], measure: str) -> None:
+    low, high = band
+    if low > high or high < 0:
+        raise ValueError(f"empty band {band}")
+    if measure == "exact" and size == 3:
+        from eight_puzzle import MAX_DISTANCE
+
+        if low > MAX_DISTANCE:
+            raise ValueError(f"no 3x3 board is more than {MAX_DISTANCE} moves from the goal")
+
+
+def scramble(
+    size: int,
+    band: Tuple[int, int],
+    seed=None,
+    measure: str = "walk",
+    heuristic_fn: Optional[Callable[[PuzzleState], int]] = None,
+    count: Optional[int] = None,
+    max_walk: Optional[int] = None,
+    max_attempts: int = MAX_ATTEMPTS,
+) -> Iterator[bytes]:
+    if measure not in MEASURES:
+        raise ValueError(f"unknown measure {measure!r}")
+    low, high = band
+    _check_band(size, band, measure)
+    rng = random.Random(seed)
+    moves_table = neighbors(size)
+    goal = list(range(1, size * size)) + [0]
+    value_fn = None if measure == "walk" else _value_function(size, measure, heuristic_fn)
+    max_walk = max_walk or high * 8 + size * size * 4
+    produced = 0
+    misses = 0
+    while count is None or produced < count:
+        target = rng.randint(low, high)
+        tiles = goal.copy()
+        blank = len(tiles) - 1
+        previous = -1
+        value = 0
+        for step in range(target if value_fn is None else max_walk):
+            choices = [nb for nb, _ in moves_table[blank] if nb != previous]
+            new_blank = rng.choice(choices)
+            tiles[blank], tiles[new_blank] = tiles[new_blank], 0
+            previous, blank = blank, new_blank
+            value = step + 1 if value_fn is None else value_fn(tiles, blank)
+            if value >= target:
+                break
+        if low <= value <= high:
+            produced += 1
+            misses = 0
+            yield bytes(tiles)
+        else:
+            misses += 1
+            if misses >= max_attempts:
+                raise ValueError(f"no board landed in band {band} after {misses} walks")
+
+
+def scramble_batch(
+    size: int,
+    count: int,
+    band: Tuple[int, int],
+    seed=None,
+    measure: str = "walk",
+    heuristic_fn: Optional[Callable[[PuzzleState], int]] = None,
+    max_walk: Optional[int] = None,
+    max_attempts: int = MAX_ATTEMPTS,
+):
+    import numpy as np
+
+    if measure == "heuristic":
+        from heuristics import manhattan_distance
+        from vectorized import BATCH_HEURISTICS
+
+        heuristic_fn = heuristic_fn or manhattan_distance
+        batch_fn = BATCH_HEURISTICS.get(heuristic_fn)
+        if batch_fn is None:
+            raise ValueError(f"heuristic {heuristic_fn.__name__!r} has no batch version")
+    elif measure != "walk":
+        raise ValueError(f"measure {measure!r} has no batch version")
+    low, high = band
+    _check_band(size, band, measure)
+    n = size * size
+    rng = np.random.default_rng(seed)
+    table = np.full((n, 4), -1, dtype=np.intp)
+    for blank, moves in enumerate(neighbors(size)):
+        for new_blank, move in moves:
+            table[blank, move] = new_blank
+    opposite = np.array(_OPPOSITE, dtype=np.intp)
+    directions = np.arange(4)
+    max_walk = high if measure == "walk" else max_walk or high * 8 + n * 4
+
+    accepted = []
+    total = 0
+    misses = 0
+    while total < count:
+        batch = count - total
+        boards = np.tile(np.append(np.arange(1, n), 0).astype(np.uint8), (batch, 1))
+        blanks = np.full(batch, n - 1, dtype=np.intp)
+        previous = np.full(batch, 4, dtype=np.intp)
+        targets = rng.integers(low, high + 1, size=batch)
+        values = np.zeros(batch, dtype=np.int64)
+        active = values < targets
+        for step in range(max_walk):
+            rows = np.flatnonzero(active)
+            if not len(rows):
+                break
+            blank = blanks[rows]
+            choices = table[blank]
+            valid = (choices >= 0) & (directions != opposite[previous[rows]][:, None])
+            weights = np.where(valid, rng.random((len(rows), 4)), -1.0)
+            move = weights.argmax(axis=1)
+            new_blank = choices[np.arange(len(rows)), move]
+            boards[rows, blank] = boards[rows, new_blank]
+            boards[rows, new_blank] = 0
+            blanks[rows] = new_blank
+            previous[rows] = move
+            if measure == "walk":
+                values[rows] = step + 1
+            else:
+                values[rows] = batch_fn(boards[rows])
+            active[rows] = values[rows] < targets[rows]
+        keep = (values >= low) & (values <= high)
+        accepted.append(boards[keep])
+        hits = int(keep.sum())
+        total += hits
+        misses = 0 if hits else misses + batch
+        if misses >= max_attempts:
+            raise ValueError(f"no board landed in band {band} after {misses} walks")
+    return np.concatenate(accepted)[:count]
+
+
+def write_corpus(path: str, size: int, boards: Iterable) -> int:
+    n = size * size
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    count = 0
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, size, 0))
+        if hasattr(boards, "tobytes"):
+            data = boards.astype("uint8").tobytes()
+            f.write(data)
+            count = len(data) // n
+        else:
+            for board in boards:
+                f.write(bytes(board))
+                count += 1
+        f.seek(0)
+        f.write(_HEADER.pack(MAGIC, VERSION, size, count))
+    os.replace(tmp_path, path)
+    return count
+
+
+def is_corpus(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class Corpus:
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a board corpus")
+        if version != VERSION:
+            raise ValueError(f"{path} has unsupported version {version}")
+        self.n = self.size * self.size
+        if len(self._mmap) < _HEADER.size + self.count * self.n:
+            raise ValueError(f"{path} is truncated")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int) -> List[int]:
+        if not 0 <= index < self.count:
+            raise IndexError(index)
+        start = _HEADER.size + index * self.n
+        return list(self._mmap[start : start + self.n])
+
+    def __iter__(self) -> Iterator[List[int]]:
+        for index in range(self.count):
+            yield self[index]
+
+    def as_array(self):
+        import numpy as np
+
+        return np.frombuffer(
+            self._mmap, dtype=np.uint8, count=self.count * self.n, offset=_HEADER.size
+        ).reshape(self.count, self.n)
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from heuristics import HEURISTICS
+
+    parser = argparse.ArgumentParser(description="Write a seeded corpus of scrambled boards.")
+    parser.add_argument("size", type=int)
+    parser.add_argument("--band", type=int, nargs=2, required=True, metavar=("LOW", "HIGH"))
+    parser.add_argument("--measure", choices=MEASURES, default="walk")
+    parser.add_argument("--heuristic", choices=sorted(HEURISTICS), default="manhattan_distance")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--vectorized", action="store_true", help="generate with NumPy")
+    parser.add_argument("-o", "--output", required=True)
+    args = parser.parse_args(argv)
+
+    heuristic_fn = HEURISTICS[args.heuristic]
+    if args.vectorized:
+        boards = scramble_batch(
+            args.size, args.count, tuple(args.band), args.seed, args.measure, heuristic_fn
+        )
+    else:
+        boards = scramble(
+            args.size, tuple(args.band), args.seed, args.measure, heuristic_fn, args.count
+        )
+    count = write_corpus(args.output, args.size, boards)
+    print(f"wrote {count} boards to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,1183 @@
-import heapq
-from typing import Callable, Optional, Tuple
+import os
+import time
+from array import array
+from queue import Empty
+from fractions import Fraction
+from typing import Callable, Optional, Sequence, Tuple
 from puzzle import PuzzleState
+from packed import (
+    MOVE_CODES,
+    NodeArena,
+    NodeStore,
+    build_solution,
+    encode_moves,
+    goal_packed,
+    neighbors,
+    pack_tiles,
+    tile_bits,
+)
+from heuristics import ADMISSIBLE, linear_conflict, manhattan_distance, walking_distance
+from metrics import MetricsRecorder
+from frontier import make_frontier
+from moves import Board, line_penalty, manhattan_deltas
+from visited import make_visited
+from walking import load_walking_table
+from eight_puzzle import table_solve
+from external import external_search
+
+
+def _unwrap(heuristic_fn: Callable[[PuzzleState], int]) -> Callable[[PuzzleState], int]:
+    return getattr(heuristic_fn, "__wrapped__", heuristic_fn)
+
+
+class _SearchMonitor:
+    def __init__(
+        self,
+        stats: dict,
+        time_limit: Optional[float],
+        progress_fn: Optional[Callable[[dict], Optional[bool]]],
+        progress_interval: int,
+    ):
+        self.stats = stats
+        self.start = time.perf_counter()
+        self.deadline = None if time_limit is None else self.start + time_limit
+        self.progress_fn = progress_fn
+        self.interval = progress_interval
+        self.next_check = progress_interval
+
+    def expired(self) -> bool:
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            self.stats["timed_out"] = True
+            return True
+        return False
+
+    def check(self, frontier_size: int, best_h: int) -> bool:
+        self.next_check = self.stats["nodes_expanded"] + self.interval
+        now = time.perf_counter()
+        if self.expired():
+            return True
+        if self.progress_fn is not None and self.progress_fn(
+            {
+                "nodes_expanded": self.stats["nodes_expanded"],
+                "frontier_size": frontier_size,
+                "best_heuristic": best_h,
+                "elapsed": now - self.start,
+            }
+        ):
+            self.stats["cancelled"] = True
+            return True
+        return False
+
+
+def _arena_stats(stats: dict, nodes: NodeArena) -> None:
+    stats["live_nodes"] = len(nodes)
+    stats["node_slots"] = nodes.slots
+    stats["bytes_per_node"] = nodes.bytes_per_node()
 
 
 def best_first_search(
     initial_state: PuzzleState,
     heuristic_fn: Callable[[PuzzleState], int],
     max_nodes: int = 100000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder: Optional[MetricsRecorder] = None,
+    cache=None,
+    cache_namespace: str = "",
+    frontier: str = "bucket",
+    dedupe: bool = False,
 ) -> Tuple[Optional[PuzzleState], dict]:
 
-    priority_queue = []
-    node_count = 0
-    h = heuristic_fn(initial_state)
-    heapq.heappush(priority_queue, (h, node_count, initial_state))
-    node_count += 1
+    size = initial_state.size
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    shifts = [i * bits for i in range(size * size)]
+    moves_table = neighbors(size)
+    goal = goal_packed(size)
+
+    scratch = PuzzleState(size, initial_state.tiles, initial_state.blank_pos)
+    tiles = scratch.tiles
+    if cache is not None and not cache.has_entries(size, cache_namespace):
+        cache = None
+    nodes = NodeArena(size)
+    keys = nodes.keys
+    blanks = nodes.blanks
+    children = nodes.children
+    release = nodes.release
+
+    root = nodes.add(pack_tiles(tiles, bits), initial_state.blank_pos, -1, 0)
+    h = heuristic_fn(scratch)
+    incremental = _unwrap(heuristic_fn) is manhattan_distance
+    deltas = manhattan_deltas(size)
+    n = size * size
+    # With dedupe, a superseded entry is skipped when it reaches the top of the frontier;
+    # releasing it then lets its slot, and any ancestors it kept alive, be reused.
+    queue = make_frontier(frontier, keys if dedupe else None, release)
+    queue.push(h, root)
+    push = queue.push
+    pop = queue.pop
 
-    explored = set()
+    explored = make_visited(size, min(max_nodes, 1 << 16))
+    explore = explored.add
     stats = {
         "nodes_expanded": 0,
         "max_queue_size": 1,
         "start_heuristic": h,
-        "nodes_explored_at_steps": [0],
     }
+    monitor = _SearchMonitor(stats, time_limit, progress_fn, progress_interval)
+    best_h = h
 
-    while priority_queue:
-        if len(priority_queue) > stats["max_queue_size"]:
-            stats["max_queue_size"] = len(priority_queue)
+    while queue:
+        if len(queue) > stats["max_queue_size"]:
+            stats["max_queue_size"] = len(queue)
 
-        _, _, current = heapq.heappop(priority_queue)
+        h, index = pop()
+        packed = keys[index]
         stats["nodes_expanded"] += 1
-        stats["nodes_explored_at_steps"].append(stats["nodes_expanded"])
+        if recorder is not None:
+            recorder.record(stats["nodes_expanded"], len(queue), h, nodes.depths[index])
 
-        if current.is_goal():
-            stats["solution_depth"] = current.depth
+        if packed == goal:
+            solution = build_solution(initial_state, nodes.moves_to(index))
+            stats["solution_depth"] = solution.depth
             stats["end_heuristic"] = 0
-            return current, stats
+            _arena_stats(stats, nodes)
+            return solution, stats
 
-        state_hash = hash(tuple(current.tiles))
-        if state_hash in explored:
+        if not explore(packed):
+            release(index)
             continue
 
-        explored.add(state_hash)
+        blank = blanks[index]
+        if not incremental or cache is not None:
+            tiles[:] = [(packed >> shift) & mask for shift in shifts]
+            scratch.blank_pos = blank
 
-        if stats["nodes_expanded"] >= max_nodes:
-            stats["end_heuristic"] = heuristic_fn(current)
+        if cache is not None and index:
+            suffix = cache.lookup_suffix(tiles, size, cache_namespace)
+            if suffix is not None:
+                moves = nodes.moves_to(index) + encode_moves(suffix)
+                solution = build_solution(initial_state, moves)
+                stats["solution_depth"] = solution.depth
+                stats["end_heuristic"] = 0
+                stats["cache_suffix_hit"] = True
+                _arena_stats(stats, nodes)
+                return solution, stats
+
+        if h < best_h:
+            best_h = h
+
+        if stats["nodes_expanded"] >= max_nodes or (
+            stats["nodes_expanded"] >= monitor.next_check and monitor.check(len(queue), best_h)
+        ):
+            stats["end_heuristic"] = h
+            _arena_stats(stats, nodes)
             return None, stats
 
-        for move in current.get_valid_moves():
-            new_state = current.move(move)
-            if new_state is not None and hash(tuple(new_state.tiles)) not in explored:
-                h = heuristic_fn(new_state)
-                heapq.heappush(priority_queue, (h, node_count, new_state))
-                node_count += 1
+        for new_blank, move in moves_table[blank]:
+            tile = (packed >> shifts[new_blank]) & mask
+            child = packed ^ (tile << shifts[new_blank]) ^ (tile << shifts[blank])
+            if child not in explored:
+                if incremental:
+                    child_h = h + deltas[(tile * n + new_blank) * 4 + move]
+                else:
+                    tiles[blank] = tile
+                    tiles[new_blank] = 0
+                    scratch.blank_pos = new_blank
+                    child_h = heuristic_fn(scratch)
+                    tiles[new_blank] = tile
+                    tiles[blank] = 0
+                if dedupe and not queue.accepts(child_h, child):
+                    continue
+                push(child_h, nodes.add(child, new_blank, index, move))
+        scratch.blank_pos = blank
+        if not children[index]:
+            release(index)
 
-    stats["end_heuristic"] = heuristic_fn(current)
+    stats["end_heuristic"] = h
+    _arena_stats(stats, nodes)
     return None, stats
+
+
+def _weighted_search(
+    initial_state: PuzzleState,
+    heuristic_fn: Callable[[PuzzleState], int],
+    max_nodes: int,
+    time_limit: Optional[float],
+    progress_fn: Optional[Callable[[dict], Optional[bool]]],
+    progress_interval: int,
+    recorder: Optional[MetricsRecorder],
+    weights: Sequence[float],
+    on_solution: Optional[Callable[[PuzzleState, dict], None]],
+    frontier: str,
+) -> Tuple[Optional[PuzzleState], dict]:
+
+    size = initial_state.size
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    shifts = [i * bits for i in range(size * size)]
+    moves_table = neighbors(size)
+    goal = goal_packed(size)
+
+    scratch = PuzzleState(size, initial_state.tiles, initial_state.blank_pos)
+    tiles = scratch.tiles
+    nodes = NodeStore(size)
+    keys = nodes.keys
+    blanks = nodes.blanks
+    depths = nodes.depths
+    hs = array("H")
+
+    root = nodes.add(pack_tiles(tiles, bits), initial_state.blank_pos, -1, 0)
+    h = heuristic_fn(scratch)
+    hs.append(h)
+    incremental = _unwrap(heuristic_fn) is manhattan_distance
+    deltas = manhattan_deltas(size)
+    n = size * size
+
+    stats = {
+        "nodes_expanded": 0,
+        "max_queue_size": 1,
+        "start_heuristic": h,
+        "solutions": [],
+        "suboptimality_bound": None,
+    }
+    if not initial_state.is_solvable():
+        stats["end_heuristic"] = h
+        return None, stats
+
+    monitor = _SearchMonitor(stats, time_limit, progress_fn, progress_interval)
+    best_g = {keys[root]: 0}
+    best_h = h
+    incumbent = -1
+    cost = 1 << 31
+    if keys[root] == goal:
+        incumbent, cost = root, 0
+    open_nodes = [root]
+
+    for weight in weights:
+        ratio = Fraction(weight).limit_denominator(64)
+        num, den = ratio.numerator, ratio.denominator
+        queue = make_frontier(frontier)
+        for i in open_nodes:
+            queue.push(depths[i] * den + hs[i] * num, i)
+        closed = make_visited(size, min(max_nodes, 1 << 16))
+        inconsistent = []
+        stats["weight"] = float(ratio)
+        stopped = False
+
+        while queue and queue.peek() < cost * den:
+            if len(queue) > stats["max_queue_size"]:
+                stats["max_queue_size"] = len(queue)
+
+            index = queue.pop()[1]
+            packed = keys[index]
+            g = depths[index]
+            if best_g[packed] < g or not closed.add(packed):
+                continue
+            stats["nodes_expanded"] += 1
+            if recorder is not None:
+                recorder.record(stats["nodes_expanded"], len(queue), hs[index], g)
+            if hs[index] < best_h:
+                best_h = hs[index]
+
+            if stats["nodes_expanded"] >= max_nodes or (
+                stats["nodes_expanded"] >= monitor.next_check
+                and monitor.check(len(queue), best_h)
+            ):
+                stopped = True
+                break
+
+            blank = blanks[index]
+            if not incremental:
+                tiles[:] = [(packed >> shift) & mask for shift in shifts]
+            child_g = g + 1
+            if child_g >= cost:
+                continue
+            for new_blank, move in moves_table[blank]:
+                tile = (packed >> shifts[new_blank]) & mask
+                child = packed ^ (tile << shifts[new_blank]) ^ (tile << shifts[blank])
+                old_g = best_g.get(child)
+                if old_g is not None and old_g <= child_g:
+                    continue
+                best_g[child] = child_g
+                if incremental:
+                    h = hs[index] + deltas[(tile * n + new_blank) * 4 + move]
+                else:
+                    tiles[blank] = tile
+                    tiles[new_blank] = 0
+                    scratch.blank_pos = new_blank
+                    h = heuristic_fn(scratch)
+                    tiles[new_blank] = tile
+                    tiles[blank] = 0
+                child_index = nodes.add(child, new_blank, index, move)
+                hs.append(h)
+                if child == goal:
+                    incumbent, cost = child_index, child_g
+                    stats["solutions"].append(
+                        {
+                            "depth": cost,
+                            "weight": float(ratio),
+                            "nodes_expanded": stats["nodes_expanded"],
+                            "elapsed": time.perf_counter() - monitor.start,
+                        }
+                    )
+                    if on_solution is not None:
+                        on_solution(build_solution(initial_state, nodes.moves_to(incumbent)), stats)
+                elif child in closed:
+                    inconsistent.append(child_index)
+                else:
+                    queue.push(child_g * den + h * num, child_index)
+
+        if stopped:
+            break
+        if incumbent >= 0:
+            stats["suboptimality_bound"] = float(ratio)
+        open_nodes = [
+            index
+            for index in [item for _, item in queue] + inconsistent
+            if depths[index] == best_g[keys[index]]
+        ]
+
+    if incumbent < 0:
+        stats["end_heuristic"] = best_h
+        return None, stats
+    solution = build_solution(initial_state, nodes.moves_to(incumbent))
+    stats["solution_depth"] = solution.depth
+    stats["end_heuristic"] = 0
+    return solution, stats
+
+
+def weighted_a_star_search(
+    initial_state: PuzzleState,
+    heuristic_fn: Callable[[PuzzleState], int],
+    max_nodes: int = 100000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder: Optional[MetricsRecorder] = None,
+    weight: float = 1.5,
+    frontier: str = "bucket",
+) -> Tuple[Optional[PuzzleState], dict]:
+    return _weighted_search(
+        initial_state,
+        heuristic_fn,
+        max_nodes,
+        time_limit,
+        progress_fn,
+        progress_interval,
+        recorder,
+        (weight,),
+        None,
+        frontier,
+    )
+
+
+def anytime_search(
+    initial_state: PuzzleState,
+    heuristic_fn: Callable[[PuzzleState], int],
+    max_nodes: int = 100000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder: Optional[MetricsRecorder] = None,
+    weight: float = 3.0,
+    weight_step: float = 0.5,
+    on_solution: Optional[Callable[[PuzzleState, dict], None]] = None,
+    frontier: str = "bucket",
+) -> Tuple[Optional[PuzzleState], dict]:
+    if weight < 1 or weight_step <= 0:
+        raise ValueError("weight must be at least 1 and weight_step positive")
+    weights = []
+    while weight > 1:
+        weights.append(weight)
+        weight -= weight_step
+    weights.append(1.0)
+    return _weighted_search(
+        initial_state,
+        heuristic_fn,
+        max_nodes,
+        time_limit,
+        progress_fn,
+        progress_interval,
+        recorder,
+        weights,
+        on_solution,
+        frontier,
+    )
+
+
+_OPPOSITE = (1, 0, 3, 2, -1)
+class _LinearConflictEvaluator:
+    def __init__(self, board: Board):
+        self.board = board
+        self.size = board.size
+        self.rows = [self._row(board.tiles, r) for r in range(self.size)]
+        self.cols = [self._col(board.tiles, c) for c in range(self.size)]
+        self.conflicts = sum(self.rows) + sum(self.cols)
+        self.value = board.manhattan + self.conflicts
+        self.saved = []
+
+    def _row(self, tiles, row: int) -> int:
+        size = self.size
+        goals = []
+        for pos in range(row * size, (row + 1) * size):
+            tile = tiles[pos]
+            if tile and (tile - 1) // size == row:
+                goals.append((tile - 1) % size)
+        return line_penalty(tuple(goals))
+
+    def _col(self, tiles, col: int) -> int:
+        size = self.size
+        goals = []
+        for pos in range(col, size * size, size):
+            tile = tiles[pos]
+            if tile and (tile - 1) % size == col:
+                goals.append((tile - 1) // size)
+        return line_penalty(tuple(goals))
+
+    def push(self, tile: int, src: int, dst: int, move: int) -> int:
+        tiles = self.board.tiles
+        if move < 2:
+            lines, a, b = self.rows, src // self.size, dst // self.size
+            new_a, new_b = self._row(tiles, a), self._row(tiles, b)
+        else:
+            lines, a, b = self.cols, src % self.size, dst % self.size
+            new_a, new_b = self._col(tiles, a), self._col(tiles, b)
+        self.saved.append((self.conflicts, lines[a], lines[b]))
+        self.conflicts += new_a + new_b - lines[a] - lines[b]
+        lines[a] = new_a
+        lines[b] = new_b
+        return self.board.manhattan + self.conflicts
+
+    def pop(self, tile: int, src: int, dst: int, move: int) -> None:
+        if move < 2:
+            lines, a, b = self.rows, src // self.size, dst // self.size
+        else:
+            lines, a, b = self.cols, src % self.size, dst % self.size
+        self.conflicts, lines[a], lines[b] = self.saved.pop()
+
+
+class _WalkingDistanceEvaluator:
+    def __init__(self, board: Board, table):
+        self.size = board.size
+        self.conflicts = _LinearConflictEvaluator(board)
+        self.distances = table.distances
+        self.transitions = table.transitions
+        self.row, self.col = table.states(board.tiles)
+        self.value = max(self.distances[self.row] + self.distances[self.col], self.conflicts.value)
+        self.saved = []
+
+    def push(self, tile: int, src: int, dst: int, move: int) -> int:
+        size = self.size
+        direction = 0 if src < dst else 1
+        self.saved.append((self.row, self.col))
+        if move < 2:
+            self.row = self.transitions[(self.row * 2 + direction) * size + (tile - 1) // size]
+        else:
+            self.col = self.transitions[(self.col * 2 + direction) * size + (tile - 1) % size]
+        conflicts = self.conflicts.push(tile, src, dst, move)
+        walking = self.distances[self.row] + self.distances[self.col]
+        return walking if walking > conflicts else conflicts
+
+    def pop(self, tile: int, src: int, dst: int, move: int) -> None:
+        self.row, self.col = self.saved.pop()
+        self.conflicts.pop(tile, src, dst, move)
+
+
+class _CallbackEvaluator:
+    def __init__(self, board: Board, heuristic_fn):
+        self.state = PuzzleState(board.size, board.tiles, board.blank)
+        self.state.tiles = board.tiles
+        self.heuristic_fn = heuristic_fn
+        self.value = heuristic_fn(self.state)
+
+    def push(self, tile: int, src: int, dst: int, move: int) -> int:
+        self.state.blank_pos = src
+        return self.heuristic_fn(self.state)
+
+    def pop(self, tile: int, src: int, dst: int, move: int) -> None:
+        self.state.blank_pos = dst
+
+
+def ida_star_search(
+    initial_state: PuzzleState,
+    heuristic_fn: Callable[[PuzzleState], int],
+    max_nodes: int = 1000000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder: Optional[MetricsRecorder] = None,
+) -> Tuple[Optional[PuzzleState], dict]:
+
+    size = initial_state.size
+    board = Board(size, initial_state.tiles)
+    tiles = board.tiles
+    make = board.make
+    unmake = board.unmake
+    goal_tiles = list(range(1, size * size)) + [0]
+    moves_table = neighbors(size)
+
+    base_fn = _unwrap(heuristic_fn)
+    if base_fn is linear_conflict:
+        evaluator = _LinearConflictEvaluator(board)
+    elif base_fn is walking_distance and load_walking_table(size) is not None:
+        evaluator = _WalkingDistanceEvaluator(board, load_walking_table(size))
+    elif base_fn is manhattan_distance:
+        evaluator = None
+    else:
+        evaluator = _CallbackEvaluator(board, heuristic_fn)
+    h = board.manhattan if evaluator is None else evaluator.value
+
+    stats = {
+        "nodes_expanded": 0,
+        "max_queue_size": 1,
+        "start_heuristic": h,
+        "iterations": 0,
+    }
+    if not initial_state.is_solvable():
+        stats["end_heuristic"] = h
+        return None, stats
+
+    path = []
+    best_h = h
+    exhausted = False
+    bound = h
+    monitor = _SearchMonitor(stats, time_limit, progress_fn, progress_interval)
+
+    def search(blank: int, g: int, h: int, prev_move: int) -> Optional[int]:
+        nonlocal best_h, exhausted
+        f = g + h
+        if f > bound:
+            return f
+        if h < best_h:
+            best_h = h
+        if h == 0 and tiles == goal_tiles:
+            return None
+        stats["nodes_expanded"] += 1
+        if recorder is not None:
+            recorder.record(stats["nodes_expanded"], g + 1, h, g)
+        if stats["nodes_expanded"] >= max_nodes or (
+            stats["nodes_expanded"] >= monitor.next_check and monitor.check(g + 1, best_h)
+        ):
+            exhausted = True
+            return f
+        if g >= stats["max_queue_size"]:
+            stats["max_queue_size"] = g + 1
+        minimum = -1
+        for new_blank, move in moves_table[blank]:
+            if move == _OPPOSITE[prev_move]:
+                continue
+            tile = make(new_blank, move)
+            path.append(move)
+            if evaluator is None:
+                result = search(new_blank, g + 1, board.manhattan, move)
+            else:
+                child_h = evaluator.push(tile, new_blank, blank, move)
+                result = search(new_blank, g + 1, child_h, move)
+                evaluator.pop(tile, new_blank, blank, move)
+            if result is None:
+                return None
+            path.pop()
+            unmake(blank, move)
+            if exhausted:
+                return result
+            if minimum < 0 or result < minimum:
+                minimum = result
+        return minimum if minimum >= 0 else f
+
+    while True:
+        stats["iterations"] += 1
+        result = search(initial_state.blank_pos, 0, h, 4)
+        if result is None:
+            solution = build_solution(initial_state, "".join(MOVE_CODES[m] for m in path))
+            stats["solution_depth"] = solution.depth
+            stats["end_heuristic"] = 0
+            return solution, stats
+        if exhausted or result <= bound:
+            stats["end_heuristic"] = best_h
+            return None, stats
+        bound = result
+
+
+def batched_best_first_search(
+    initial_state: PuzzleState,
+    heuristic_fn: Callable[[PuzzleState], int],
+    max_nodes: int = 100000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder: Optional[MetricsRecorder] = None,
+    batch_size: int = 64,
+    frontier: str = "bucket",
+    dedupe: bool = False,
+) -> Tuple[Optional[PuzzleState], dict]:
+    from vectorized import BATCH_HEURISTICS, unpack_boards
+
+    batch_fn = BATCH_HEURISTICS.get(_unwrap(heuristic_fn))
+    if batch_fn is None:
+        return best_first_search(
+            initial_state,
+            heuristic_fn,
+            max_nodes,
+            time_limit,
+            progress_fn,
+            progress_interval,
+            recorder,
+            frontier=frontier,
+            dedupe=dedupe,
+        )
+
+    size = initial_state.size
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    shifts = [i * bits for i in range(size * size)]
+    moves_table = neighbors(size)
+    goal = goal_packed(size)
+
+    nodes = NodeStore(size)
+    keys = nodes.keys
+    blanks = nodes.blanks
+    root = nodes.add(pack_tiles(initial_state.tiles, bits), initial_state.blank_pos, -1, 0)
+    h = heuristic_fn(initial_state)
+    queue = make_frontier(frontier, keys if dedupe else None)
+    queue.push(h, root)
+
+    explored = make_visited(size, min(max_nodes, 1 << 16))
+    stats = {
+        "nodes_expanded": 0,
+        "max_queue_size": 1,
+        "start_heuristic": h,
+        "batches": 0,
+    }
+    monitor = _SearchMonitor(stats, time_limit, progress_fn, progress_interval)
+    last_h = best_h = h
+
+    while queue:
+        if len(queue) > stats["max_queue_size"]:
+            stats["max_queue_size"] = len(queue)
+
+        child_keys = []
+        child_blanks = []
+        child_parents = []
+        child_moves = []
+        popped = 0
+        while queue and popped < batch_size:
+            h, index = queue.pop()
+            packed = keys[index]
+            stats["nodes_expanded"] += 1
+            if recorder is not None:
+                recorder.record(
+                    stats["nodes_expanded"],
+                    len(queue) + len(child_keys),
+                    h,
+                    nodes.depths[index],
+                )
+
+            if packed == goal:
+                solution = build_solution(initial_state, nodes.moves_to(index))
+                stats["solution_depth"] = solution.depth
+                stats["end_heuristic"] = 0
+                return solution, stats
+
+            if not explored.add(packed):
+                continue
+
+            popped += 1
+            last_h = h
+            if last_h < best_h:
+                best_h = last_h
+
+            if stats["nodes_expanded"] >= max_nodes:
+                stats["end_heuristic"] = last_h
+                return None, stats
+
+            blank = blanks[index]
+            for new_blank, move in moves_table[blank]:
+                tile = (packed >> shifts[new_blank]) & mask
+                child = packed ^ (tile << shifts[new_blank]) ^ (tile << shifts[blank])
+                if child not in explored:
+                    child_keys.append(child)
+                    child_blanks.append(new_blank)
+                    child_parents.append(index)
+                    child_moves.append(move)
+
+        if stats["nodes_expanded"] >= monitor.next_check and monitor.check(
+            len(queue) + len(child_keys), best_h
+        ):
+            stats["end_heuristic"] = last_h
+            return None, stats
+
+        if child_keys:
+            stats["batches"] += 1
+            scores = batch_fn(unpack_boards(child_keys, size)).tolist()
+            for child, new_blank, parent, move, h in zip(
+                child_keys, child_blanks, child_parents, child_moves, scores
+            ):
+                if dedupe and not queue.accepts(h, child):
+                    continue
+                queue.push(h, nodes.add(child, new_blank, parent, move))
+
+    stats["end_heuristic"] = last_h
+    return None, stats
+
+
+def _chain_moves(visited: dict, packed: int, root_link: int) -> list:
+    moves = []
+    link = visited[packed]
+    while link != root_link:
+        moves.append(link & 3)
+        link = visited[link >> 2]
+    moves.reverse()
+    return moves
+
+
+def bidirectional_search(
+    initial_state: PuzzleState,
+    heuristic_fn: Callable[[PuzzleState], int],
+    max_nodes: int = 1000000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder: Optional[MetricsRecorder] = None,
+) -> Tuple[Optional[PuzzleState], dict]:
+
+    size = initial_state.size
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    shifts = [i * bits for i in range(size * size)]
+    moves_table = neighbors(size)
+
+    start = pack_tiles(initial_state.tiles, bits)
+    goal = goal_packed(size)
+    h = heuristic_fn(initial_state)
+    stats = {
+        "nodes_expanded": 0,
+        "max_queue_size": 1,
+        "start_heuristic": h,
+        "forward": {"nodes_expanded": 0, "visited": 1, "depth": 0},
+        "backward": {"nodes_expanded": 0, "visited": 1, "depth": 0},
+    }
+    if not initial_state.is_solvable():
+        stats["end_heuristic"] = h
+        return None, stats
+
+    root_link = -1
+    sides = {
+        "forward": ({start: root_link}, [(start, initial_state.blank_pos)]),
+        "backward": ({goal: root_link}, [(goal, size * size - 1)]),
+    }
+    monitor = _SearchMonitor(stats, time_limit, progress_fn, progress_interval)
+    meeting = None if start != goal else (start, 0)
+
+    while meeting is None:
+        forward_frontier = sides["forward"][1]
+        backward_frontier = sides["backward"][1]
+        if not forward_frontier or not backward_frontier:
+            stats["end_heuristic"] = h
+            return None, stats
+        frontier_size = len(forward_frontier) + len(backward_frontier)
+        if frontier_size > stats["max_queue_size"]:
+            stats["max_queue_size"] = frontier_size
+
+        name = "forward" if len(forward_frontier) <= len(backward_frontier) else "backward"
+        other_name = "backward" if name == "forward" else "forward"
+        visited, frontier = sides[name]
+        other_visited = sides[other_name][0]
+        side_stats = stats[name]
+        next_frontier = []
+        best = None
+        for packed, blank in frontier:
+            stats["nodes_expanded"] += 1
+            side_stats["nodes_expanded"] += 1
+            if recorder is not None:
+                recorder.record(stats["nodes_expanded"], frontier_size, None, side_stats["depth"])
+            if stats["nodes_expanded"] >= max_nodes or (
+                stats["nodes_expanded"] >= monitor.next_check
+                and monitor.check(frontier_size, h)
+            ):
+                stats["end_heuristic"] = h
+                return None, stats
+            for new_blank, move in moves_table[blank]:
+                tile = (packed >> shifts[new_blank]) & mask
+                child = packed ^ (tile << shifts[new_blank]) ^ (tile << shifts[blank])
+                if child in visited:
+                    continue
+                visited[child] = (packed << 2) | move
+                if child in other_visited:
+                    length = len(_chain_moves(other_visited, child, root_link))
+                    if best is None or length < best[1]:
+                        best = (child, length)
+                else:
+                    next_frontier.append((child, new_blank))
+        side_stats["depth"] += 1
+        side_stats["visited"] = len(visited)
+        sides[name] = (visited, next_frontier)
+        meeting = best
+
+    child = meeting[0]
+    forward_visited = sides["forward"][0]
+    backward_visited = sides["backward"][0]
+    moves = _chain_moves(forward_visited, child, root_link)
+    moves += [_OPPOSITE[m] for m in reversed(_chain_moves(backward_visited, child, root_link))]
+    solution = build_solution(initial_state, "".join(MOVE_CODES[m] for m in moves))
+    stats["solution_depth"] = solution.depth
+    stats["end_heuristic"] = 0
+    return solution, stats
+
+
+_NO_INCUMBENT = 2**31 - 1
+_OWNER_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+def _owner(packed: int, workers: int) -> int:
+    return ((((packed ^ (packed >> 64)) * _OWNER_MULTIPLIER) & 0xFFFFFFFFFFFFFFFF) >> 32) % workers
+
+
+def _hda_worker(
+    rank: int,
+    workers: int,
+    size: int,
+    heuristic_fn: Callable[[PuzzleState], int],
+    root: int,
+    root_blank: int,
+    batch_size: int,
+    chunk_size: int,
+    inboxes: list,
+    results,
+    incumbent,
+    incumbent_lock,
+    shared: dict,
+) -> None:
+    bits = tile_bits(size)
+    mask = (1 << bits) - 1
+    shifts = [i * bits for i in range(size * size)]
+    moves_table = neighbors(size)
+    goal = goal_packed(size)
+    n = size * size
+    incremental = _unwrap(heuristic_fn) is manhattan_distance
+    deltas = manhattan_deltas(size)
+    scratch = PuzzleState(size)
+    tiles = scratch.tiles
+
+    inbox = inboxes[rank]
+    expanded, open_sizes, best_hs = shared["expanded"], shared["open"], shared["best_h"]
+    floors = shared["floor"]
+    idle, sent, received, stop = shared["idle"], shared["sent"], shared["received"], shared["stop"]
+    best_g = {}
+    links = {}
+    keys = []
+    blanks = bytearray()
+    gs = array("I")
+    hs = array("H")
+    queue = make_frontier("bucket")
+    outgoing = [[] for _ in range(workers)]
+
+    def insert(packed: int, blank: int, g: int, h: int, link: int) -> None:
+        old = best_g.get(packed)
+        if old is not None and old <= g:
+            return
+        best_g[packed] = g
+        links[packed] = link
+        keys.append(packed)
+        blanks.append(blank)
+        gs.append(g)
+        hs.append(h)
+        queue.push(g + h, len(keys) - 1)
+
+    def flush(dest: int) -> None:
+        sent[rank] += 1
+        inboxes[dest].put(("nodes", outgoing[dest]))
+        outgoing[dest] = []
+
+    def handle(message) -> None:
+        if message[0] == "nodes":
+            idle[rank] = 0
+            bound = incumbent.value
+            for packed, blank, g, h, link in message[1]:
+                if g + h < bound:
+                    insert(packed, blank, g, h, link)
+            received[rank] += 1
+        elif message[0] == "trace":
+            results.put(("link", message[1], links[message[1]]))
+
+    if _owner(root, workers) == rank:
+        tiles[:] = [(root >> shift) & mask for shift in shifts]
+        scratch.blank_pos = root_blank
+        insert(root, root_blank, 0, heuristic_fn(scratch), -1)
+
+    nodes_expanded = 0
+    best_h = _NO_INCUMBENT
+    while not stop.value:
+        while True:
+            try:
+                handle(inbox.get_nowait())
+            except Empty:
+                break
+        bound = incumbent.value
+        if not queue or queue.peek() >= bound:
+            floors[rank] = _NO_INCUMBENT
+            for dest in range(workers):
+                if outgoing[dest]:
+                    flush(dest)
+            open_sizes[rank] = len(queue)
+            idle[rank] = 1
+            try:
+                handle(inbox.get(timeout=0.005))
+            except Empty:
+                pass
+            continue
+
+        floors[rank] = floor = queue.peek()
+        if floor > min(floors):
+            for dest in range(workers):
+                if outgoing[dest]:
+                    flush(dest)
+            try:
+                handle(inbox.get(timeout=0.001))
+            except Empty:
+                pass
+            continue
+
+        for _ in range(chunk_size):
+            if not queue or queue.peek() > floor:
+                break
+            f, index = queue.pop()
+            packed = keys[index]
+            g = gs[index]
+            if best_g[packed] != g:
+                continue
+            nodes_expanded += 1
+            h = hs[index]
+            if h < best_h:
+                best_h = h
+            parent = links[packed] >> 2
+            blank = blanks[index]
+            if not incremental:
+                tiles[:] = [(packed >> shift) & mask for shift in shifts]
+                scratch.blank_pos = blank
+            child_g = g + 1
+            for new_blank, move in moves_table[blank]:
+                tile = (packed >> shifts[new_blank]) & mask
+                child = packed ^ (tile << shifts[new_blank]) ^ (tile << shifts[blank])
+                if child == parent:
+                    continue
+                if child == goal:
+                    with incumbent_lock:
+                        if child_g < incumbent.value:
+                            incumbent.value = child_g
+                            results.put(("goal", child_g, packed, move))
+                    bound = incumbent.value
+                    continue
+                if incremental:
+                    child_h = h + deltas[(tile * n + new_blank) * 4 + move]
+                else:
+                    tiles[blank] = tile
+                    tiles[new_blank] = 0
+                    scratch.blank_pos = new_blank
+                    child_h = heuristic_fn(scratch)
+                    tiles[new_blank] = tile
+                    tiles[blank] = 0
+                    scratch.blank_pos = blank
+                if child_g + child_h >= bound:
+                    continue
+                link = (packed << 2) | move
+                dest = _owner(child, workers)
+                if dest == rank:
+                    insert(child, new_blank, child_g, child_h, link)
+                else:
+                    outgoing[dest].append((child, new_blank, child_g, child_h, link))
+                    if len(outgoing[dest]) >= batch_size:
+                        flush(dest)
+        for dest in range(workers):
+            if outgoing[dest]:
+                flush(dest)
+        expanded[rank] = nodes_expanded
+        open_sizes[rank] = len(queue)
+        best_hs[rank] = best_h
+
+    for other in inboxes:
+        other.cancel_join_thread()
+    results.cancel_join_thread()
+
+
+def _check_workers(processes) -> None:
+    for rank, process in enumerate(processes):
+        if process.exitcode is not None:
+            raise RuntimeError(f"HDA* worker {rank} exited with code {process.exitcode}")
+
+
+def hda_star_search(
+    initial_state: PuzzleState,
+    heuristic_fn: Callable[[PuzzleState], int],
+    max_nodes: int = 1000000,
+    time_limit: Optional[float] = None,
+    progress_fn: Optional[Callable[[dict], Optional[bool]]] = None,
+    progress_interval: int = 1024,
+    recorder: Optional[MetricsRecorder] = None,
+    workers: Optional[int] = None,
+    batch_size: int = 256,
+    chunk_size: int = 64,
+) -> Tuple[Optional[PuzzleState], dict]:
+
+    size = initial_state.size
+    bits = tile_bits(size)
+    workers = workers or os.cpu_count() or 1
+    root = pack_tiles(initial_state.tiles, bits)
+    h = heuristic_fn(initial_state)
+    stats = {
+        "nodes_expanded": 0,
+        "max_queue_size": 1,
+        "start_heuristic": h,
+        "workers": workers,
+    }
+    if not initial_state.is_solvable():
+        stats["end_heuristic"] = h
+        return None, stats
+    if root == goal_packed(size):
+        stats["solution_depth"] = 0
+        stats["end_heuristic"] = 0
+        return initial_state, stats
+
+    import multiprocessing
+
+    # Never fork: the GUI calls this from a QThread while other threads run. The workers get
+    # the bare heuristic because profiling wrappers cannot be pickled.
+    context = multiprocessing.get_context(
+        "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    )
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    incumbent = context.RawValue("i", _NO_INCUMBENT)
+    incumbent_lock = context.Lock()
+    shared = {
+        "expanded": context.RawArray("q", workers),
+        "open": context.RawArray("q", workers),
+        "best_h": context.RawArray("i", [h] * workers),
+        "floor": context.RawArray("i", [h] * workers),
+        "idle": context.RawArray("b", workers),
+        "sent": context.RawArray("q", workers),
+        "received": context.RawArray("q", workers),
+        "stop": context.RawValue("b", 0),
+    }
+    processes = [
+        context.Process(
+            target=_hda_worker,
+            args=(
+                rank,
+                workers,
+                size,
+                _unwrap(heuristic_fn),
+                root,
+                initial_state.blank_pos,
+                batch_size,
+                chunk_size,
+                inboxes,
+                results,
+                incumbent,
+                incumbent_lock,
+                shared,
+            ),
+            daemon=True,
+        )
+        for rank in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    # Workers only exit once stop is set, so an exit code before that means one crashed and
+    # the search can never finish.
+    def receive():
+        while True:
+            try:
+                return results.get(timeout=0.05)
+            except Empty:
+                _check_workers(processes)
+
+    monitor = _SearchMonitor(stats, time_limit, progress_fn, progress_interval)
+    best = None
+    previous = None
+    stopped = False
+    try:
+        while True:
+            try:
+                message = results.get(timeout=0.002)
+                if best is None or message[1] < best[0]:
+                    best = message[1:]
+            except Empty:
+                pass
+            _check_workers(processes)
+            nodes_expanded = sum(shared["expanded"])
+            frontier_size = sum(shared["open"])
+            best_h = min(shared["best_h"])
+            stats["nodes_expanded"] = nodes_expanded
+            if frontier_size > stats["max_queue_size"]:
+                stats["max_queue_size"] = frontier_size
+            if recorder is not None:
+                recorder.record(nodes_expanded, frontier_size, best_h, None)
+            if (
+                nodes_expanded >= max_nodes
+                or monitor.expired()
+                or (nodes_expanded >= monitor.next_check and monitor.check(frontier_size, best_h))
+            ):
+                stopped = True
+                break
+            if all(shared["idle"]):
+                counts = (sum(shared["sent"]), sum(shared["received"]))
+                if counts[0] == counts[1] and counts == previous:
+                    break
+                previous = counts
+            else:
+                previous = None
+
+        stats["messages"] = sum(shared["sent"])
+        stats["worker_nodes"] = list(shared["expanded"])
+        stats["end_heuristic"] = best_h
+        cost = incumbent.value
+        if cost == _NO_INCUMBENT:
+            return None, stats
+        while best is None or best[0] > cost:
+            message = receive()
+            if best is None or message[1] < best[0]:
+                best = message[1:]
+
+        moves = [best[2]]
+        packed = best[1]
+        while packed != root:
+            inboxes[_owner(packed, workers)].put(("trace", packed))
+            message = receive()
+            while message[0] != "link":
+                message = receive()
+            moves.append(message[2] & 3)
+            packed = message[2] >> 2
+        moves.reverse()
+        solution = build_solution(initial_state, "".join(MOVE_CODES[m] for m in moves))
+        stats["solution_depth"] = solution.depth
+        stats["end_heuristic"] = 0
+        stats["proven_optimal"] = not stopped and _unwrap(heuristic_fn) in ADMISSIBLE
+        return solution, stats
+    finally:
+        shared["stop"].value = 1
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+        for inbox in inboxes:
+            inbox.close()
+            inbox.cancel_join_thread()
+        results.close()
+        results.cancel_join_thread()
+
+
+ALGORITHMS = {
+    "best_first": best_first_search,
+    "ida_star": ida_star_search,
+    "batched_best_first": batched_best_first_search,
+    "bidirectional": bidirectional_search,
+    "weighted_a_star": weighted_a_star_search,
+    "anytime": anytime_search,
+    "table": table_solve,
+    "external": external_search,
+    "hda_star": hda_star_search,
+}
+WEIGHTED_ALGORITHMS = ("weighted_a_star", "anytime")
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set
+
+from batch import parse_board, solve_board
+from heuristics import HEURISTICS
+from search import ALGORITHMS, WEIGHTED_ALGORITHMS
+
+DEFAULT_PORT = 8765
+
+
+def _warm_worker() -> None:
+    from eight_puzzle import load_table
+    from moves import manhattan_deltas
+    from pattern_db import load_database
+    from walking import load_walking_table
+
+    load_table()
+    for size in (3, 4, 5):
+        manhattan_deltas(size)
+        load_database(size)
+        load_walking_table(size)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class SolverService:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        max_pending: int = 64,
+        max_nodes: int = 1000000,
+        time_limit: Optional[float] = 10.0,
+    ):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.in_flight: Dict[tuple, asyncio.Future] = {}
+        self.submitted: Set[Future] = set()
+        self.counters = {"requests": 0, "solves": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+
+    def start_pool(self) -> None:
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_warm_worker)
+            for future in [self.pool.submit(os.getpid) for _ in range(self.workers)]:
+                future.result()
+
+    def close(self) -> None:
+        if self.pool is not None:
+            # Drop queued solves instead of waiting for them; running ones still finish.
+            for future in list(self.submitted):
+                future.cancel()
+            self.pool.shutdown()
+            self.pool = None
+
+    def _budget(self, request: dict) -> tuple:
+        max_nodes = min(int(request.get("max_nodes", self.max_nodes)), self.max_nodes)
+        time_limit = request.get("time_limit")
+        if self.time_limit is not None and (time_limit is None or time_limit > self.time_limit):
+            time_limit = self.time_limit
+        return max_nodes, time_limit
+
+    async def solve(self, request: dict) -> dict:
+        self.counters["requests"] += 1
+        received = time.perf_counter()
+        response = {"id": request.get("id")}
+        try:
+            board = request["board"]
+            tiles = parse_board(board if isinstance(board, str) else " ".join(map(str, board)))
+            algorithm = request.get("algorithm", "best_first")
+            heuristic = request.get("heuristic", "manhattan_distance")
+            if algorithm not in ALGORITHMS or heuristic not in HEURISTICS:
+                raise ValueError(f"unknown algorithm or heuristic: {algorithm!r}, {heuristic!r}")
+            weight = request.get("weight")
+            if weight is not None:
+                if algorithm not in WEIGHTED_ALGORITHMS:
+                    raise ValueError(f"algorithm {algorithm!r} does not take a weight")
+                weight = float(weight)
+            max_nodes, time_limit = self._budget(request)
+        except (KeyError, TypeError, ValueError) as e:
+            self.counters["errors"] += 1
+            response["error"] = str(e)
+            return response
+
+        key = (tuple(tiles), algorithm, heuristic, max_nodes, time_limit, weight)
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            response["coalesced"] = True
+        elif len(self.in_flight) >= self.max_pending:
+            self.counters["rejected"] += 1
+            response["error"] = "busy"
+            response["pending"] = len(self.in_flight)
+            return response
+        else:
+            submitted = self.pool.submit(
+                solve_board,
+                0,
+                " ".join(map(str, tiles)),
+                algorithm,
+                heuristic,
+                max_nodes,
+                time_limit,
+                False,
+                weight,
+            )
+            self.submitted.add(submitted)
+            submitted.add_done_callback(self.submitted.discard)
+            future = asyncio.wrap_future(submitted)
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+            self.counters["solves"] += 1
+        try:
+            result = await asyncio.shield(future)
+        except Exception as e:
+            self.counters["errors"] += 1
+            response["error"] = f"{type(e).__name__}: {e}"
+            return response
+        response.update({k: v for k, v in result.items() if k != "index"})
+        response["latency"] = time.perf_counter() - received
+        return response
+
+    async def _handle_connection(self, reader, writer) -> None:
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(line: bytes) -> None:
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("expected a JSON object")
+            except ValueError as e:
+                self.counters["errors"] += 1
+                response = {"error": f"bad request: {e}"}
+            else:
+                try:
+                    if request.get("command") == "stats":
+                        response = {"id": request.get("id"), **self.stats()}
+                    else:
+                        response = await self.solve(request)
+                except Exception as e:
+                    self.counters["errors"] += 1
+                    response = {"id": request.get("id"), "error": f"{type(e).__name__}: {e}"}
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    task = asyncio.create_task(answer(line))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    def stats(self) -> dict:
+        return {**self.counters, "pending": len(self.in_flight), "workers": self.workers}
+
+    async def serve(
+        self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, path: Optional[str] = None
+    ):
+        self.start_pool()
+        if path is not None:
+            return await asyncio.start_unix_server(self._handle_connection, path)
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+
+async def request(
+    requests: List[dict],
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    path: Optional[str] = None,
+) -> List[dict]:
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for index, message in enumerate(requests):
+            writer.write(json.dumps({"id": index, **message}).encode() + b"\n")
+        await writer.drain()
+        responses = [json.loads(await reader.readline()) for _ in requests]
+    finally:
+        writer.close()
+    return sorted(responses, key=lambda response: response["id"])
+
+
+async def load_test(
+    boards: List[List[int]],
+    requests_total: int,
+    concurrency: int,
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    path: Optional[str] = None,
+    **options,
+) -> dict:
+    latencies: List[float] = []
+    outcomes = {"solved": 0, "unsolved": 0, "busy": 0, "errors": 0}
+    counter = iter(range(requests_total))
+
+    async def client() -> None:
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for index in counter:
+                message = {"id": index, "board": boards[index % len(boards)], **options}
+                start = time.perf_counter()
+                writer.write(json.dumps(message).encode() + b"\n")
+                await writer.drain()
+                response = json.loads(await reader.readline())
+                latencies.append(time.perf_counter() - start)
+                if response.get("error") == "busy":
+                    outcomes["busy"] += 1
+                elif "error" in response:
+                    outcomes["errors"] += 1
+                else:
+                    outcomes["solved" if response["solved"] else "unsolved"] += 1
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        **outcomes,
+        "requests": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies, default=0.0),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local solver service and load-test client.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "load"):
+        sub = subparsers.add_parser(name)
+        sub.add_argument("--host", default="127.0.0.1")
+        sub.add_argument("--port", type=int, default=DEFAULT_PORT)
+        sub.add_argument("--socket", help="Unix socket path instead of TCP")
+    serve_parser = subparsers.choices["serve"]
+    serve_parser.add_argument("--workers", type=int, default=None)
+    serve_parser.add_argument("--max-pending", type=int, default=64)
+    serve_parser.add_argument("--max-nodes", type=int, default=1000000)
+    serve_parser.add_argument("--time-limit", type=float, default=10.0)
+    load_parser = subparsers.choices["load"]
+    load_parser.add_argument("--requests", type=int, default=500)
+    load_parser.add_argument("--concurrency", type=int, default=16)
+    load_parser.add_argument("--size", type=int, default=4)
+    load_parser.add_argument("--depth", type=int, default=30)
+    load_parser.add_argument("--distinct", type=int, default=50, help="distinct boards to cycle")
+    load_parser.add_argument("--seed", type=int, default=0)
+    load_parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="best_first")
+    load_parser.add_argument("--heuristic", choices=sorted(HEURISTICS), default="manhattan_distance")
+    load_parser.add_argument("--max-nodes", type=int, default=100000)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        service = SolverService(args.workers, args.max_pending, args.max_nodes, args.time_limit)
+
+        async def run() -> None:
+            server = await service.serve(args.host, args.port, args.socket)
+            where = args.socket or f"{args.host}:{args.port}"
+            print(f"serving on {where} with {service.workers} warm workers", file=sys.stderr)
+            async with server:
+                await server.serve_forever()
+
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            service.close()
+        return
+
+    from benchmark import make_corpus
+
+    boards = make_corpus(args.size, args.depth, args.distinct, args.seed)
+    result = asyncio.run(
+        load_test(
+            boards,
+            args.requests,
+            args.concurrency,
+            args.host,
+            args.port,
+            args.socket,
+            algorithm=args.algorithm,
+            heuristic=args.heuristic,
+            max_nodes=args.max_nodes,
+        )
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,59 @@
+import asyncio
+import io
+import json
+import os
+import tempfile
 import unittest
 from puzzle import PuzzleState
 from heuristics import *
-from search import best_first_search
+from search import (
+    _WalkingDistanceEvaluator,
+    anytime_search,
+    batched_best_first_search,
+    best_first_search,
+    bidirectional_search,
+    hda_star_search,
+    ida_star_search,
+    weighted_a_star_search,
+)
+from batch import parse_board, run_batch
+from benchmark import bench_startup, compare_results, make_corpus
+from cache import SolutionCache, cached_solve, canonical_key
+from eight_puzzle import distance, permutation_rank, permutation_unrank, table_solve
+from external import RunWriter, external_search, read_run, reduce_runs
+from frontier import BucketQueue, HeapQueue
+from metrics import MetricsRecorder
+from moves import Board
+from packed import (
+    NodeArena,
+    decode_moves,
+    encode_moves,
+    goal_packed,
+    pack_tiles,
+    replay,
+    solution_moves,
+    tile_bits,
+    unpack_tiles,
+)
+from parity import inversion_count, inversion_parity, is_solvable, make_solvable
+from pattern_db import (
+    PatternDatabase,
+    build_database,
+    build_pattern_table,
+    permutation_count,
+    rank_positions,
+    unrank_positions,
+)
+from profiling import SearchProfiler, profile_search, profiled
+from scramble import Corpus, scramble, scramble_batch, write_corpus
+from service import SolverService, load_test, percentile, request
+from visited import PackedIndex, RankBitset, make_visited, set_bytes_per_entry
+from walking import load_walking_table
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 
 class TestPuzzleState(unittest.TestCase):
@@ -42,6 +94,14 @@ class TestPuzzleState(unittest.TestCase):
         unsolvable = PuzzleState(self.size, [1, 2, 3, 4, 5, 6, 8, 7, 0])
         self.assertFalse(unsolvable.is_solvable())
 
+    def test_is_solvable_even_size(self):
+        self.assertTrue(PuzzleState(4).is_solvable())
+        self.assertTrue(PuzzleState(4).move("up").is_solvable())
+        swapped = PuzzleState(4, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 15, 14, 0])
+        self.assertFalse(swapped.is_solvable())
+        for _ in range(20):
+            self.assertTrue(PuzzleState(4).shuffle().is_solvable())
+
 
 class TestHeuristics(unittest.TestCase):
     def setUp(self):
@@ -68,6 +128,86 @@ class TestHeuristics(unittest.TestCase):
         manhattan = manhattan_distance(conflict_state)
         self.assertEqual(linear_conflict(conflict_state), manhattan + 2)
 
+    def test_pattern_database(self):
+        self.assertEqual(pattern_database(self.goal_state), 0)
+        state = PuzzleState(self.size, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        self.assertGreaterEqual(pattern_database(state), manhattan_distance(state))
+        self.assertLessEqual(pattern_database(state), 31)
+        solution, stats = best_first_search(state, pattern_database)
+        self.assertTrue(solution.is_goal())
+
+
+class TestWalkingDistance(unittest.TestCase):
+    def test_table_and_admissibility(self):
+        self.assertEqual(len(load_walking_table(4)), 24964)
+        self.assertEqual(walking_distance(PuzzleState(4)), 0)
+        self.assertEqual(walking_distance(PuzzleState(3, [1, 2, 3, 4, 5, 6, 7, 0, 8])), 1)
+        for _ in range(100):
+            state = PuzzleState(3).shuffle()
+            self.assertLessEqual(walking_distance(state), distance(state.tiles))
+            self.assertGreaterEqual(walking_distance(state), manhattan_distance(state))
+
+    def test_incremental_matches_full_evaluation(self):
+        import random
+
+        rng = random.Random(0)
+        for size in (3, 4):
+            board = Board(size, PuzzleState(size).shuffle(rng=rng).tiles)
+            evaluator = _WalkingDistanceEvaluator(board, load_walking_table(size))
+            for _ in range(300):
+                new_blank, move = rng.choice(board.neighbors[board.blank])
+                old_blank = board.blank
+                tile = board.make(new_blank, move)
+                value = evaluator.push(tile, new_blank, old_blank, move)
+                self.assertEqual(value, walking_distance(PuzzleState(size, board.tiles)))
+
+    def test_ida_star_expands_fewer_nodes(self):
+        state = PuzzleState(4, [7, 1, 11, 8, 5, 4, 2, 12, 9, 0, 3, 15, 13, 10, 6, 14])
+        baseline, baseline_stats = ida_star_search(state, linear_conflict)
+        solution, stats = ida_star_search(state, walking_distance)
+        self.assertEqual(solution.depth, baseline.depth)
+        self.assertLessEqual(stats["nodes_expanded"], baseline_stats["nodes_expanded"])
+
+
+class TestPatternDatabase(unittest.TestCase):
+    def test_build_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = build_database(3, [(1, 2, 3), (4, 5, 6), (7, 8)], os.path.join(directory, "pdb.npdb"))
+            database = PatternDatabase(path)
+            self.assertEqual(database.patterns, [(1, 2, 3), (4, 5, 6), (7, 8)])
+            self.assertEqual(database.evaluate(PuzzleState(3).tiles), 0)
+            one_move = PuzzleState(3, [1, 2, 3, 4, 5, 6, 7, 0, 8])
+            self.assertEqual(database.evaluate(one_move.tiles), 1)
+
+    def test_pattern_table_counts_only_pattern_moves(self):
+        table = build_pattern_table(3, (8,))
+        self.assertEqual(len(table), 9)
+        self.assertEqual(table[7], 0)
+        self.assertEqual(table[0], 3)
+
+    def test_unrank_round_trip(self):
+        for rank in range(permutation_count(9, 3)):
+            self.assertEqual(rank_positions(unrank_positions(rank, 9, 3), 9), rank)
+
+    def test_pattern_table_covers_every_placement(self):
+        table = build_pattern_table(3, (1, 2, 3, 4))
+        self.assertNotIn(0xFF, table)
+        state = PuzzleState(3, [1, 2, 3, 4, 5, 6, 0, 7, 8])
+        where = [state.tiles.index(t) for t in (1, 2, 3, 4)]
+        self.assertEqual(table[rank_positions(where, 9)], 0)
+
+    def test_rejects_overlapping_patterns(self):
+        with self.assertRaises(ValueError):
+            build_database(3, [(1, 2), (2, 3)], os.devnull)
+
+
+def _crash_in_worker(state):
+    import multiprocessing
+
+    if multiprocessing.current_process().name != "MainProcess":
+        os._exit(3)
+    return manhattan_distance(state)
+
 
 class TestSearch(unittest.TestCase):
     def setUp(self):
@@ -92,6 +232,813 @@ class TestSearch(unittest.TestCase):
         solution, stats = best_first_search(unsolvable, manhattan_distance, max_nodes=1000)
         self.assertIsNone(solution)
 
+    def test_ida_star_optimal(self):
+        state = PuzzleState(self.size, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        for heuristic in (manhattan_distance, linear_conflict):
+            solution, stats = ida_star_search(state, heuristic)
+            self.assertTrue(solution.is_goal())
+            self.assertEqual(solution.depth, 31)
+            self.assertEqual(stats["solution_depth"], 31)
+
+    def test_ida_star_15_puzzle(self):
+        state = PuzzleState(4, [1, 2, 3, 4, 5, 6, 7, 8, 0, 10, 11, 12, 9, 13, 14, 15])
+        solution, stats = ida_star_search(state, linear_conflict)
+        self.assertTrue(solution.is_goal())
+        self.assertEqual(solution.depth, 4)
+        self.assertIs(solution.get_path()[0], state)
+
+    def test_ida_star_unsolvable(self):
+        unsolvable = PuzzleState(self.size, [1, 2, 3, 4, 5, 6, 8, 7, 0])
+        solution, stats = ida_star_search(unsolvable, manhattan_distance)
+        self.assertIsNone(solution)
+
+    def test_bidirectional_search(self):
+        state = PuzzleState(self.size, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        solution, stats = bidirectional_search(state, manhattan_distance)
+        self.assertTrue(solution.is_goal())
+        self.assertEqual(solution.depth, 31)
+        self.assertIs(solution.get_path()[0], state)
+        self.assertEqual(
+            stats["nodes_expanded"],
+            stats["forward"]["nodes_expanded"] + stats["backward"]["nodes_expanded"],
+        )
+        state = PuzzleState(4, [1, 2, 3, 4, 5, 6, 7, 8, 0, 10, 11, 12, 9, 13, 14, 15])
+        solution, stats = bidirectional_search(state, manhattan_distance)
+        self.assertEqual(solution.depth, 4)
+        solution, stats = bidirectional_search(self.goal_state, manhattan_distance)
+        self.assertEqual(solution.depth, 0)
+        unsolvable = PuzzleState(self.size, [1, 2, 3, 4, 5, 6, 8, 7, 0])
+        self.assertIsNone(bidirectional_search(unsolvable, manhattan_distance)[0])
+
+    def test_weighted_a_star(self):
+        state = PuzzleState(self.size, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        solution, stats = weighted_a_star_search(state, manhattan_distance, weight=1)
+        self.assertEqual(solution.depth, 31)
+        solution, stats = weighted_a_star_search(state, manhattan_distance, weight=2)
+        self.assertTrue(solution.is_goal())
+        self.assertLessEqual(solution.depth, 62)
+        self.assertEqual(stats["suboptimality_bound"], 2.0)
+
+    def test_anytime_search(self):
+        state = PuzzleState(self.size, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        found = []
+        solution, stats = anytime_search(
+            state,
+            manhattan_distance,
+            weight=4,
+            on_solution=lambda path, info: found.append(path.depth),
+        )
+        self.assertEqual(solution.depth, 31)
+        self.assertEqual(stats["suboptimality_bound"], 1.0)
+        self.assertEqual(found, sorted(found, reverse=True))
+        self.assertEqual(found[-1], 31)
+        self.assertEqual([s["depth"] for s in stats["solutions"]], found)
+
+    def test_anytime_keeps_best_on_timeout(self):
+        state = PuzzleState(4, [0, 15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1])
+        solution, stats = anytime_search(state, linear_conflict, 10000000, time_limit=1.0)
+        self.assertTrue(solution.is_goal())
+        self.assertTrue(stats["timed_out"])
+        self.assertEqual(solution.depth, stats["solutions"][-1]["depth"])
+
+    def test_hda_star(self):
+        for state in (
+            PuzzleState(3, [8, 6, 7, 2, 5, 4, 3, 0, 1]),
+            PuzzleState(4, [7, 1, 11, 8, 5, 4, 2, 12, 9, 0, 3, 15, 13, 10, 6, 14]),
+        ):
+            optimal = ida_star_search(state, manhattan_distance)[0].depth
+            for workers, heuristic_fn in ((1, manhattan_distance), (3, linear_conflict)):
+                solution, stats = hda_star_search(state, heuristic_fn, workers=workers)
+                self.assertTrue(solution.is_goal())
+                self.assertEqual(solution.depth, stats["solution_depth"])
+                if heuristic_fn is manhattan_distance:
+                    self.assertEqual(solution.depth, optimal)
+                else:
+                    self.assertGreaterEqual(solution.depth, optimal)
+                self.assertEqual(stats["proven_optimal"], heuristic_fn is manhattan_distance)
+                self.assertEqual(sum(stats["worker_nodes"]), stats["nodes_expanded"])
+        wrapped = SearchProfiler().heuristic(manhattan_distance)
+        solution, stats = hda_star_search(state, wrapped, workers=2)
+        self.assertEqual(solution.depth, optimal)
+        self.assertTrue(stats["proven_optimal"])
+        unsolvable = PuzzleState(3, [1, 2, 3, 4, 5, 6, 8, 7, 0])
+        self.assertIsNone(hda_star_search(unsolvable, manhattan_distance, workers=2)[0])
+
+    def test_hda_star_worker_crash(self):
+        state = PuzzleState(3, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        with self.assertRaises(RuntimeError):
+            hda_star_search(state, _crash_in_worker, workers=2, time_limit=30)
+
+    def test_hda_star_cancel(self):
+        state = PuzzleState(4, [0, 15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1])
+        solution, stats = hda_star_search(
+            state, manhattan_distance, progress_fn=lambda info: True, workers=2
+        )
+        self.assertIsNone(solution)
+        self.assertTrue(stats["cancelled"])
+
+    def test_progress_and_cancel(self):
+        state = PuzzleState(4, [0, 15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1])
+        for search_fn in (
+            best_first_search,
+            ida_star_search,
+            batched_best_first_search,
+            bidirectional_search,
+            weighted_a_star_search,
+            anytime_search,
+            external_search,
+        ):
+            reports = []
+
+            def progress_fn(info):
+                reports.append(info)
+                return len(reports) >= 3
+
+            solution, stats = search_fn(
+                state, manhattan_distance, 1000000, None, progress_fn, progress_interval=10
+            )
+            self.assertIsNone(solution)
+            self.assertTrue(stats["cancelled"])
+            self.assertEqual(len(reports), 3)
+            self.assertLess(stats["nodes_expanded"], 100)
+            self.assertEqual(
+                set(reports[0]), {"nodes_expanded", "frontier_size", "best_heuristic", "elapsed"}
+            )
+
+
+class TestEightPuzzleTable(unittest.TestCase):
+    def test_rank_round_trip(self):
+        self.assertEqual(permutation_rank(list(range(9))), 0)
+        self.assertEqual(permutation_rank(list(range(8, -1, -1))), 362879)
+        for _ in range(20):
+            tiles = PuzzleState(3).shuffle().tiles
+            self.assertEqual(permutation_unrank(permutation_rank(tiles)), tiles)
+
+    def test_distances(self):
+        self.assertEqual(distance(PuzzleState(3).tiles), 0)
+        self.assertEqual(distance([1, 2, 3, 4, 5, 6, 7, 0, 8]), 1)
+        self.assertEqual(distance([8, 6, 7, 2, 5, 4, 3, 0, 1]), 31)
+        self.assertIsNone(distance([1, 2, 3, 4, 5, 6, 8, 7, 0]))
+
+    def test_table_solve(self):
+        state = PuzzleState(3, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        solution, stats = table_solve(state)
+        self.assertTrue(solution.is_goal())
+        self.assertEqual(solution.depth, 31)
+        self.assertIsNone(table_solve(PuzzleState(3, [1, 2, 3, 4, 5, 6, 8, 7, 0]))[0])
+
+    def test_optimal_solvers_match_oracle(self):
+        for _ in range(20):
+            state = PuzzleState(3).shuffle()
+            optimal = distance(state.tiles)
+            self.assertEqual(exact_distance(state), optimal)
+            for search_fn in (ida_star_search, bidirectional_search):
+                solution, stats = search_fn(state, linear_conflict)
+                self.assertEqual(solution.depth, optimal)
+            for heuristic_fn in (manhattan_distance, pattern_database):
+                self.assertLessEqual(heuristic_fn(state), optimal)
+
+
+class TestMetricsRecorder(unittest.TestCase):
+    def test_fixed_size_series(self):
+        recorder = MetricsRecorder(capacity=16)
+        for i in range(10000):
+            recorder.record(i, i % 7, i % 5, i % 3)
+        self.assertLess(len(recorder.series["nodes_expanded"]), 16)
+        self.assertEqual(sum(recorder.h_histogram.values()), 10000)
+        self.assertEqual(sum(recorder.depth_histogram.values()), 10000)
+        values = recorder.series["nodes_expanded"]
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(values[1] - values[0], recorder.stride)
+
+    def test_search_records_and_exports(self):
+        state = PuzzleState(3, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        for search_fn in (best_first_search, ida_star_search, bidirectional_search):
+            recorder = MetricsRecorder(capacity=32)
+            solution, stats = search_fn(state, manhattan_distance, recorder=recorder)
+            self.assertNotIn("nodes_explored_at_steps", stats)
+            self.assertEqual(recorder.samples, stats["nodes_expanded"])
+            exported = json.loads(recorder.to_json())
+            self.assertEqual(set(exported["series"]), {"nodes_expanded", "frontier_size", "h", "elapsed"})
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.csv")
+            recorder.to_csv(path)
+            with open(path) as f:
+                rows = f.read().splitlines()
+            self.assertEqual(rows[0], "nodes_expanded,frontier_size,h,elapsed")
+            self.assertEqual(len(rows) - 1, len(recorder.series["elapsed"]))
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_corpus_is_reproducible(self):
+        self.assertEqual(make_corpus(4, 20, 3, seed=1), make_corpus(4, 20, 3, seed=1))
+        self.assertNotEqual(make_corpus(4, 20, 3, seed=1), make_corpus(4, 20, 3, seed=2))
+        for tiles in make_corpus(3, 12, 3, seed=1):
+            self.assertEqual(distance(tiles), 12)
+
+    def test_compare_flags_regressions(self):
+        baseline = {"results": {"a": {"nodes_per_sec": 100.0, "wall_time": 1.0, "nodes": 5}}}
+        current = {"results": {"a": {"nodes_per_sec": 80.0, "wall_time": 1.05, "nodes": 50}}}
+        regressions = compare_results(baseline, current, 0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("nodes_per_sec", regressions[0])
+        self.assertEqual(compare_results(baseline, baseline, 0.1), [])
+
+    def test_cold_start_is_headless(self):
+        result = bench_startup(3, 1)
+        self.assertEqual(result["heavy_modules"], [])
+        self.assertGreaterEqual(result["solution_length"], 20)
+        self.assertLess(result["wall_time"], 5.0)
+
+
+class TestParity(unittest.TestCase):
+    def quadratic_inversions(self, tiles):
+        tiles = [t for t in tiles if t]
+        return sum(a > b for i, a in enumerate(tiles) for b in tiles[i + 1 :])
+
+    def test_matches_quadratic_count(self):
+        import random
+
+        rng = random.Random(0)
+        for size in range(2, 11):
+            for _ in range(20):
+                tiles = rng.sample(range(size * size), size * size)
+                inversions = self.quadratic_inversions(tiles)
+                self.assertEqual(inversion_count(tiles), inversions)
+                self.assertEqual(inversion_parity(tiles), inversions % 2)
+
+    def test_make_solvable(self):
+        self.assertTrue(is_solvable(PuzzleState(6).tiles, 6))
+        tiles = [0, 2, 1, 3, 4, 5, 6, 7, 8]
+        self.assertFalse(is_solvable(tiles, 3))
+        self.assertEqual(make_solvable(tiles, 3), [0, 1, 2, 3, 4, 5, 6, 7, 8])
+        for size in (3, 4, 7, 10):
+            self.assertTrue(PuzzleState(size).shuffle().is_solvable())
+
+
+class TestScramble(unittest.TestCase):
+    def test_seeded_and_lazy(self):
+        first = list(scramble(4, (10, 20), seed=3, count=5))
+        self.assertEqual(first, list(scramble(4, (10, 20), seed=3, count=5)))
+        stream = scramble(4, (10, 20), seed=4)
+        self.assertEqual(len([next(stream) for _ in range(3)]), 3)
+        for board in first:
+            self.assertTrue(is_solvable(list(board), 4))
+
+    def test_difficulty_bands(self):
+        for board in scramble(3, (18, 20), seed=1, measure="exact", count=10):
+            self.assertIn(distance(list(board)), (18, 19, 20))
+        boards = scramble(
+            4, (25, 30), seed=1, measure="heuristic", heuristic_fn=linear_conflict, count=10
+        )
+        for board in boards:
+            self.assertTrue(25 <= linear_conflict(PuzzleState(4, list(board))) <= 30)
+
+    def test_unreachable_band_raises(self):
+        with self.assertRaises(ValueError):
+            next(scramble(3, (40, 50), measure="exact"))
+        with self.assertRaises(ValueError):
+            next(scramble(3, (60, 70), seed=0, measure="heuristic", max_attempts=50))
+
+    def test_shuffle_walk(self):
+        import random
+
+        state = PuzzleState(4).shuffle(1, random.Random(0))
+        self.assertEqual(manhattan_distance(state), 1)
+
+    def test_corpus_round_trip(self):
+        boards = list(scramble(3, (5, 10), seed=2, count=7))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "boards.npsc")
+            self.assertEqual(write_corpus(path, 3, boards), 7)
+            corpus = Corpus(path)
+            self.assertEqual(len(corpus), 7)
+            self.assertEqual(list(corpus), [list(board) for board in boards])
+            corpus.close()
+
+
+class TestFrontier(unittest.TestCase):
+    def test_bucket_order_is_lifo(self):
+        queue = BucketQueue()
+        for priority, item in [(3, 1), (1, 2), (3, 3), (1, 4), (0, 5)]:
+            queue.push(priority, item)
+        popped = [queue.pop() for _ in range(len(queue))]
+        self.assertEqual(popped, [(0, 5), (1, 4), (1, 2), (3, 3), (3, 1)])
+        self.assertFalse(queue)
+
+    def test_dedupe_and_decrease_key(self):
+        keys = [10, 20, 10, 10, 20]
+        for cls in (BucketQueue, HeapQueue):
+            queue = cls(keys.__getitem__)
+            self.assertTrue(queue.push(5, 0))
+            self.assertTrue(queue.push(4, 1))
+            self.assertFalse(queue.push(5, 2))
+            self.assertTrue(queue.push(2, 3))
+            self.assertEqual(len(queue), 2)
+            self.assertEqual(sorted(queue), [(2, 3), (4, 1)])
+            self.assertEqual(queue.pop(), (2, 3))
+            self.assertEqual(queue.pop(), (4, 1))
+            self.assertFalse(queue)
+            self.assertFalse(queue.push(9, 4))
+
+    def test_stale_entries_are_reported(self):
+        keys = [10, 10, 20, 30]
+        for cls in (BucketQueue, HeapQueue):
+            stale = []
+            queue = cls(keys.__getitem__, stale.append)
+            queue.push(5, 0)
+            queue.push(3, 1)
+            queue.push(4, 2)
+            self.assertEqual([queue.pop(), queue.pop()], [(3, 1), (4, 2)])
+            queue.push(6, 3)
+            self.assertEqual(queue.pop(), (6, 3))
+            self.assertEqual(stale, [0])
+
+    def test_searches_accept_every_frontier(self):
+        state = PuzzleState(3, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        for frontier in ("heap", "bucket"):
+            for dedupe in (False, True):
+                solution, _ = best_first_search(
+                    state, manhattan_distance, frontier=frontier, dedupe=dedupe
+                )
+                self.assertTrue(solution.is_goal())
+            solution, _ = weighted_a_star_search(
+                state, manhattan_distance, weight=1, frontier=frontier
+            )
+            self.assertEqual(solution.depth, 31)
+
+
+class TestSolutionCache(unittest.TestCase):
+    def transpose(self, state):
+        size = state.size
+        tiles = [0] * (size * size)
+        for pos, tile in enumerate(state.tiles):
+            row, col = divmod(pos, size)
+            if tile:
+                r, c = divmod(tile - 1, size)
+                tile = c * size + r + 1
+            tiles[col * size + row] = tile
+        return PuzzleState(size, tiles)
+
+    def replay(self, state, moves):
+        for move in moves:
+            state = state.move(move)
+        return state
+
+    def test_namespace_counts_track_eviction(self):
+        cache = SolutionCache(max_entries=2, store_suffixes=False)
+        self.assertFalse(cache.has_entries(3, "a"))
+        cache.put([1, 2, 3, 4, 5, 6, 7, 0, 8], 3, ["right"], "a")
+        self.assertTrue(cache.has_entries(3, "a"))
+        self.assertFalse(cache.has_entries(4, "a"))
+        cache.put([1, 2, 3, 4, 5, 6, 0, 7, 8], 3, ["right", "right"], "b")
+        cache.put([1, 2, 3, 4, 0, 6, 7, 5, 8], 3, ["down", "right"], "b")
+        self.assertFalse(cache.has_entries(3, "a"))
+        self.assertEqual(cache.namespace_sizes[("b", 3)], 2)
+
+    def test_transpose_shares_key(self):
+        state = PuzzleState(4).shuffle()
+        self.assertEqual(
+            canonical_key(state.tiles, 4)[0],
+            canonical_key(self.transpose(state).tiles, 4)[0],
+        )
+        cache = SolutionCache()
+        solution, _ = best_first_search(state, manhattan_distance)
+        moves = [s.move_from_parent for s in solution.get_path()[1:]]
+        cache.put(state.tiles, 4, moves)
+        mirrored = self.transpose(state)
+        self.assertTrue(self.replay(mirrored, cache.get(mirrored.tiles, 4)).is_goal())
+
+    def test_lru_eviction(self):
+        cache = SolutionCache(max_entries=2, store_suffixes=False)
+        boards = [PuzzleState(3).shuffle() for _ in range(3)]
+        for board in boards:
+            cache.put(board.tiles, 3, [], "a")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(boards[0].tiles, 3, "a"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_disk_tier(self):
+        state = PuzzleState(3, [1, 2, 3, 4, 5, 6, 0, 7, 8])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            cache = SolutionCache(path=path)
+            cache.put(state.tiles, 3, ["right", "right"])
+            cache.close()
+            cache = SolutionCache(path=path)
+            self.assertEqual(cache.get(state.tiles, 3), ["right", "right"])
+            self.assertEqual(cache.stats()["disk_hits"], 1)
+            cache.close()
+
+    def test_cached_solve(self):
+        cache = SolutionCache()
+        state = PuzzleState(3, [4, 1, 3, 7, 2, 6, 0, 5, 8])
+        first, stats = cached_solve(cache, best_first_search, state, manhattan_distance)
+        self.assertFalse(stats["cache"]["hit"])
+        second, stats = cached_solve(cache, best_first_search, state, manhattan_distance)
+        self.assertTrue(stats["cache"]["hit"])
+        self.assertEqual(stats["nodes_expanded"], 0)
+        self.assertEqual(second.depth, first.depth)
+        self.assertIs(second.get_path()[0], state)
+        _, stats = cached_solve(cache, best_first_search, state, misplaced_tiles)
+        self.assertFalse(stats["cache"]["hit"])
+
+    def test_search_stops_on_cached_suffix(self):
+        cache = SolutionCache()
+        near = PuzzleState(3, [1, 2, 3, 4, 0, 6, 7, 5, 8])
+        cache.put(near.tiles, 3, ["down", "right"], "ns")
+        state = near.move("left")
+        solution, stats = best_first_search(
+            state, manhattan_distance, cache=cache, cache_namespace="ns"
+        )
+        self.assertTrue(stats["cache_suffix_hit"])
+        self.assertTrue(solution.is_goal())
+        self.assertEqual(cache.stats()["suffix_hits"], 1)
+
+
+class TestMoves(unittest.TestCase):
+    def test_make_unmake(self):
+        import random
+
+        rng = random.Random(0)
+        for size in (3, 4, 5):
+            start = PuzzleState(size).shuffle()
+            board = Board(size, start.tiles)
+            history = []
+            for _ in range(200):
+                new_blank, move = rng.choice(board.neighbors[board.blank])
+                history.append((board.blank, move))
+                board.make(new_blank, move)
+                state = PuzzleState(size, board.tiles)
+                self.assertEqual(board.blank, state.blank_pos)
+                self.assertEqual(board.manhattan, manhattan_distance(state))
+            for old_blank, move in reversed(history):
+                board.unmake(old_blank, move)
+            self.assertEqual(board.tiles, start.tiles)
+            self.assertEqual(board.manhattan, manhattan_distance(start))
+
+
+class TestVisited(unittest.TestCase):
+    def test_exact_membership_and_growth(self):
+        for size in (3, 4, 5):
+            bits = tile_bits(size)
+            keys = {pack_tiles(PuzzleState(size).shuffle().tiles, bits) for _ in range(3000)}
+            visited = make_visited(size, capacity=8)
+            for key in keys:
+                self.assertTrue(visited.add(key))
+                self.assertFalse(visited.add(key))
+            self.assertEqual(len(visited), len(keys))
+            self.assertEqual(set(visited), keys)
+            self.assertNotIn(goal_packed(size) ^ 1, visited)
+            self.assertLess(visited.bytes_per_entry() * 1.5, set_bytes_per_entry(list(keys)))
+
+    def test_near_keys_stay_distinct(self):
+        visited = PackedIndex(36, capacity=8)
+        keys = [(i << 32) | 1 for i in range(1, 16)]
+        for key in keys:
+            visited.add(key)
+        self.assertEqual(sorted(visited), keys)
+        self.assertNotIn(1, visited)
+
+    def test_rank_bitset(self):
+        visited = RankBitset(3)
+        self.assertEqual(visited.nbytes, 45360)
+        for _ in range(100):
+            tiles = PuzzleState(3).shuffle().tiles
+            key = pack_tiles(tiles, tile_bits(3))
+            self.assertEqual(visited.rank(key), permutation_rank(tiles))
+            visited.add(key)
+            self.assertIn(key, visited)
+
+
+class TestExternalSearch(unittest.TestCase):
+    def test_matches_optimal_depth(self):
+        for state in (
+            PuzzleState(3, [8, 6, 7, 2, 5, 4, 3, 0, 1]),
+            PuzzleState(4, [5, 1, 3, 4, 9, 2, 7, 8, 13, 6, 10, 12, 0, 14, 11, 15]),
+        ):
+            optimal = ida_star_search(state, manhattan_distance)[0].depth
+            for heuristic_fn in (manhattan_distance, linear_conflict):
+                solution, stats = external_search(state, heuristic_fn, memory_limit=1 << 14)
+                self.assertTrue(solution.is_goal())
+                self.assertEqual(solution.depth, optimal)
+                self.assertGreater(stats["runs"], stats["layers"] - 1)
+        solution, stats = external_search(PuzzleState(3, [1, 2, 3, 4, 5, 6, 0, 7, 8]), None, prune=False)
+        self.assertEqual(solution.depth, 2)
+        self.assertIsNone(external_search(PuzzleState(3, [1, 2, 3, 4, 5, 6, 8, 7, 0]))[0])
+
+    def test_reduce_runs_bounds_fan_in(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            paths = []
+            for i in range(10):
+                path = os.path.join(work_dir, f"run-{i}.z")
+                writer = RunWriter(path)
+                for value in sorted({(i * 7 + j * 3) % 40 for j in range(12)}):
+                    writer.write(value.to_bytes(2, "big") + b"\x00")
+                writer.close()
+                paths.append(path)
+            expected = sorted({(i * 7 + j * 3) % 40 for i in range(10) for j in range(12)})
+            runs, written = reduce_runs(paths, 3, 2, 4096, fan_in=3)
+            self.assertLessEqual(len(runs), 3)
+            self.assertGreater(written, 0)
+            self.assertEqual(len(os.listdir(work_dir)), len(runs))
+            merged = sorted({r[:2] for run in runs for r in read_run(run, 3, 4096)})
+            self.assertEqual([int.from_bytes(r, "big") for r in merged], expected)
+
+    def test_resume_from_checkpoint(self):
+        state = PuzzleState(4, [7, 1, 11, 8, 5, 4, 2, 12, 9, 0, 3, 15, 13, 10, 6, 14])
+        with tempfile.TemporaryDirectory() as work_dir:
+            solution, stats = external_search(state, manhattan_distance, 200, work_dir=work_dir)
+            self.assertIsNone(solution)
+            self.assertTrue(os.path.exists(os.path.join(work_dir, "checkpoint.json")))
+            solution, stats = external_search(state, manhattan_distance, work_dir=work_dir, resume=True)
+            self.assertGreater(stats["resumed_at"], 0)
+            self.assertEqual(solution.depth, ida_star_search(state, manhattan_distance)[0].depth)
+            with self.assertRaises(ValueError):
+                external_search(PuzzleState(4), work_dir=work_dir, resume=True)
+
+
+class TestService(unittest.TestCase):
+    def setUp(self):
+        self.service = SolverService(workers=1, max_pending=1, max_nodes=5000, time_limit=5.0)
+        self.service.start_pool()
+        self.addCleanup(self.service.close)
+
+    def test_coalescing_backpressure_and_budgets(self):
+        easy = {"board": [1, 2, 3, 4, 5, 6, 7, 0, 8]}
+        hard = {
+            "board": "0 15 14 13 12 11 10 9 8 7 6 5 4 3 2 1",
+            "algorithm": "ida_star",
+            "max_nodes": 10**9,
+        }
+
+        async def scenario():
+            first = await asyncio.gather(
+                self.service.solve(easy), self.service.solve(easy), self.service.solve(hard)
+            )
+            return first, await self.service.solve(hard)
+
+        (solved, coalesced, busy), capped = asyncio.run(scenario())
+        self.assertEqual(solved["moves"], ["right"])
+        self.assertTrue(coalesced["coalesced"])
+        self.assertEqual(coalesced["moves"], solved["moves"])
+        self.assertEqual(busy["error"], "busy")
+        self.assertFalse(capped["solved"])
+        self.assertLessEqual(capped["stats"]["nodes_expanded"], 5000)
+        self.assertEqual(self.service.stats()["solves"], 2)
+
+    def test_socket_round_trip_and_load(self):
+        self.service.max_pending = 64
+
+        async def scenario():
+            server = await self.service.serve(port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                responses = await request(
+                    [{"board": "1 2 3 4 5 6 0 7 8"}, {"board": "1 2"}, {"command": "stats"}],
+                    port=port,
+                )
+                boards = [[1, 2, 3, 4, 5, 6, 0, 7, 8], [1, 2, 3, 4, 0, 6, 7, 5, 8]]
+                report = await load_test(boards, 20, 4, port=port)
+            return responses, report
+
+        responses, report = asyncio.run(scenario())
+        self.assertEqual(responses[0]["moves"], ["right", "right"])
+        self.assertIn("not a valid board", responses[1]["error"])
+        self.assertEqual(responses[2]["workers"], 1)
+        self.assertEqual(report["solved"], 20)
+        self.assertLessEqual(report["p50"], report["p99"])
+        self.assertEqual(percentile([3, 1, 2], 50), 2)
+
+    def test_errors_always_get_a_reply(self):
+        self.service.max_pending = 64
+        board = "1 2 3 4 5 6 7 0 8"
+
+        async def scenario():
+            server = await self.service.serve(port=0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+                writer.write(b"[1]\n")
+                await writer.drain()
+                raw = json.loads(await reader.readline())
+                writer.close()
+                responses = await request(
+                    [
+                        {"board": board, "weight": 2},
+                        {"board": board, "algorithm": "weighted_a_star", "weight": -1},
+                        {"board": board, "algorithm": "weighted_a_star", "weight": 2},
+                    ],
+                    port=port,
+                )
+            return raw, responses
+
+        raw, (unweighted, failed, weighted) = asyncio.run(asyncio.wait_for(scenario(), 30))
+        self.assertIn("JSON object", raw["error"])
+        self.assertIn("does not take a weight", unweighted["error"])
+        self.assertIn("IndexError", failed["error"])
+        self.assertEqual(weighted["moves"], ["right"])
+        self.assertEqual(self.service.stats()["errors"], 3)
+
+
+class TestProfiling(unittest.TestCase):
+    def test_timers_breakdown(self):
+        state = PuzzleState(3, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        plain, plain_stats = best_first_search(state, misplaced_tiles)
+        solution, stats = profile_search(best_first_search, state, misplaced_tiles)
+        self.assertEqual(solution.depth, plain.depth)
+        self.assertEqual(stats["nodes_expanded"], plain_stats["nodes_expanded"])
+        profile = stats["profile"]
+        self.assertEqual(profile["frontier_pops"], stats["nodes_expanded"])
+        self.assertGreater(profile["heuristic_calls"], 0)
+        self.assertGreater(profile["heuristic_time"], 0)
+        self.assertLessEqual(
+            profile["heuristic_time"] + profile["frontier_time"], profile["total_time"]
+        )
+
+    def test_profiled_keeps_fast_paths(self):
+        state = PuzzleState(3, [8, 6, 7, 2, 5, 4, 3, 0, 1])
+        solution, stats = profiled()(ida_star_search)(state, linear_conflict)
+        self.assertEqual(solution.depth, 31)
+        self.assertEqual(stats["profile"]["heuristic_calls"], 0)
+
+    def test_capture_files(self):
+        import pstats
+
+        state = PuzzleState(3, [4, 1, 3, 7, 2, 6, 0, 5, 8])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "search.prof")
+            _, stats = profile_search(
+                best_first_search, state, manhattan_distance, mode="cprofile", output=path
+            )
+            self.assertEqual(stats["profile"]["output"], path)
+            self.assertIn("best_first_search", str(pstats.Stats(path).stats))
+            with SearchProfiler("tracemalloc") as profiler:
+                best_first_search(state, misplaced_tiles)
+            self.assertGreater(profiler.report(1)["peak_bytes_per_node"], 0)
+
+
+class TestPacked(unittest.TestCase):
+    def test_round_trip(self):
+        for size in (3, 4, 5):
+            tiles = PuzzleState(size).shuffle().tiles
+            bits = tile_bits(size)
+            self.assertEqual(unpack_tiles(pack_tiles(tiles, bits), size * size, bits), tiles)
+        self.assertEqual(tile_bits(4), 4)
+        self.assertEqual(tile_bits(5), 5)
+
+    def test_goal_packed(self):
+        goal = PuzzleState(4)
+        self.assertEqual(goal_packed(4), pack_tiles(goal.tiles, tile_bits(4)))
+
+    def test_solution_path_is_consistent(self):
+        state = PuzzleState(4, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 0, 11, 13, 14, 15, 12])
+        solution, stats = best_first_search(state, manhattan_distance)
+        self.assertTrue(solution.is_goal())
+        path = solution.get_path()
+        self.assertIs(path[0], state)
+        self.assertEqual(len(path) - 1, stats["solution_depth"])
+
+    def test_solution_moves_replay(self):
+        import random
+
+        state = PuzzleState(4).shuffle(40, random.Random(7))
+        solution, stats = ida_star_search(state, linear_conflict)
+        moves = solution_moves(solution)
+        self.assertEqual(len(moves), stats["solution_depth"])
+        self.assertEqual(decode_moves(moves), [s.move_from_parent for s in solution.get_path()[1:]])
+        self.assertEqual(encode_moves(decode_moves(moves)), moves)
+        self.assertIsNone(solution.parent)
+        self.assertEqual(solution.path_moves, moves)
+        path = solution.get_path()
+        self.assertIs(path[0], state)
+        self.assertIs(path[-1], solution)
+        extended = solution.move(solution.get_valid_moves()[0])
+        self.assertEqual(len(extended.get_path()), len(path) + 1)
+        self.assertEqual(solution_moves(extended)[:-1], moves)
+        tiles = state.tiles.copy()
+        for blank, target in replay(tiles, 4, moves):
+            self.assertEqual(tiles[target], 0)
+            self.assertNotEqual(tiles[blank], 0)
+        self.assertEqual(tiles, solution.tiles)
+        with self.assertRaises(ValueError):
+            list(replay(PuzzleState(3).tiles, 3, "R"))
+
+    def test_node_arena_reclaims_dead_branches(self):
+        arena = NodeArena(3)
+        root = arena.add(1, 8, -1, 0)
+        left = arena.add(2, 7, root, 2)
+        up = arena.add(3, 5, root, 0)
+        leaf = arena.add(4, 4, up, 2)
+        self.assertEqual(arena.moves_to(leaf), "UL")
+        self.assertEqual(arena.depths[leaf], 2)
+        arena.release(leaf)
+        self.assertEqual(len(arena), 2)
+        self.assertEqual(arena.moves_to(left), "L")
+        reused = arena.add(5, 4, left, 3)
+        self.assertIn(reused, (leaf, up))
+        self.assertEqual(arena.slots, 4)
+        self.assertEqual(arena.moves_to(reused), "LR")
+        arena.depths[reused] = 70000
+        self.assertEqual(arena.depths[reused], 70000)
+
+    def test_best_first_reports_arena_usage(self):
+        import random
+
+        state = PuzzleState(4).shuffle(80, random.Random(7))
+        solution, stats = best_first_search(state, manhattan_distance, 100000)
+        self.assertTrue(solution.is_goal())
+        self.assertEqual(len(solution.get_path()) - 1, stats["solution_depth"])
+        self.assertLessEqual(stats["live_nodes"], stats["node_slots"])
+        self.assertLess(stats["bytes_per_node"], 19)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestVectorized(unittest.TestCase):
+    def test_batch_heuristics_match_scalar(self):
+        from vectorized import BATCH_HEURISTICS
+
+        for size in (3, 4, 5):
+            states = [PuzzleState(size).shuffle() for _ in range(20)] + [PuzzleState(size)]
+            boards = numpy.array([s.tiles for s in states], dtype=numpy.uint8)
+            for heuristic_fn, batch_fn in BATCH_HEURISTICS.items():
+                self.assertEqual(batch_fn(boards).tolist(), [heuristic_fn(s) for s in states])
+
+    def test_batch_is_solvable(self):
+        from vectorized import batch_is_solvable
+
+        for size in (3, 4, 8):
+            boards = numpy.array(
+                [numpy.random.permutation(size * size) for _ in range(50)], dtype=numpy.uint8
+            )
+            expected = [is_solvable(board.tolist(), size) for board in boards]
+            self.assertEqual(batch_is_solvable(boards).tolist(), expected)
+
+    def test_scramble_batch(self):
+        from vectorized import batch_is_solvable, batch_manhattan_distance
+
+        boards = scramble_batch(4, 200, (20, 25), seed=1, measure="heuristic")
+        self.assertEqual(boards.shape, (200, 16))
+        h = batch_manhattan_distance(boards)
+        self.assertTrue(((h >= 20) & (h <= 25)).all())
+        self.assertTrue(batch_is_solvable(boards).all())
+        again = scramble_batch(4, 200, (20, 25), seed=1, measure="heuristic")
+        self.assertTrue((boards == again).all())
+        with self.assertRaisesRegex(ValueError, "walking_distance"):
+            scramble_batch(3, 5, (5, 10), measure="heuristic", heuristic_fn=walking_distance)
+        with self.assertRaises(ValueError):
+            scramble_batch(3, 5, (60, 70), seed=0, measure="heuristic", max_attempts=50)
+
+    def test_unpack_boards(self):
+        from vectorized import unpack_boards
+
+        for size in (3, 4, 5):
+            states = [PuzzleState(size).shuffle() for _ in range(5)]
+            keys = [pack_tiles(s.tiles, tile_bits(size)) for s in states]
+            self.assertEqual(unpack_boards(keys, size).tolist(), [s.tiles for s in states])
+
+    def test_batched_best_first_search(self):
+        state = PuzzleState(3, [1, 2, 3, 0, 4, 6, 7, 5, 8])
+        for heuristic_fn in (manhattan_distance, linear_conflict, nilssons_sequence):
+            solution, stats = batched_best_first_search(state, heuristic_fn, batch_size=8)
+            self.assertTrue(solution.is_goal())
+            self.assertEqual(len(solution.get_path()) - 1, stats["solution_depth"])
+
+
+class TestBatch(unittest.TestCase):
+    def test_parse_board(self):
+        self.assertEqual(parse_board("1,2,3 4 5 6 7 8 0"), [1, 2, 3, 4, 5, 6, 7, 8, 0])
+        with self.assertRaises(ValueError):
+            parse_board("1 2 3")
+        with self.assertRaises(ValueError):
+            parse_board("1 1 2 3")
+
+    def test_run_batch(self):
+        lines = ["1 2 3 4 5 6 7 0 8", "# comment", "1 2 3 0 4 6 7 5 8", "bad"]
+        output = io.StringIO()
+        completed = run_batch(lines, output, "ida_star", "manhattan_distance", workers=1)
+        self.assertEqual(completed, 3)
+        results = {r["index"]: r for r in map(json.loads, output.getvalue().splitlines())}
+        self.assertEqual(results[0]["moves"], ["right"])
+        self.assertEqual(results[1]["stats"]["solution_depth"], len(results[1]["moves"]))
+        self.assertIn("error", results[2])
+
+    def test_worker_error_keeps_other_boards(self):
+        lines = ["1 2 3 4 5 6 7 0 8", "1 2 3 0 4 6 7 5 8"]
+        output = io.StringIO()
+        completed = run_batch(lines, output, "best_first", "manhattan_distance", workers=1, weight=2)
+        self.assertEqual(completed, 2)
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(sorted(r["index"] for r in results), [0, 1])
+        self.assertTrue(all("TypeError" in r["error"] for r in results))
+        self.assertEqual(results[0]["board"], lines[results[0]["index"]])
+
+    def test_time_limit(self):
+        state = PuzzleState(4, [0, 15, 14, 13, 12, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1])
+        solution, stats = ida_star_search(state, manhattan_distance, time_limit=0.01)
+        self.assertIsNone(solution)
+        self.assertTrue(stats["timed_out"])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,112 @@
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+
+from heuristics import linear_conflict, manhattan_distance, misplaced_tiles
+from packed import tile_bits
+
+_GOAL_TABLES: Dict[int, Tuple[np.ndarray, ...]] = {}
+
+
+def goal_tables(size: int) -> Tuple[np.ndarray, ...]:
+    tables = _GOAL_TABLES.get(size)
+    if tables is None:
+        n = size * size
+        tiles = np.arange(n)
+        goal_row = np.where(tiles == 0, -1, (tiles - 1) // size).astype(np.int16)
+        goal_col = np.where(tiles == 0, -1, (tiles - 1) % size).astype(np.int16)
+        goal = np.append(np.arange(1, n), 0).astype(np.uint8)
+        row = (np.arange(n) // size).astype(np.int16)
+        col = (np.arange(n) % size).astype(np.int16)
+        pairs = np.array(
+            [(i, j) for i in range(size) for j in range(i + 1, size)], dtype=np.intp
+        ).reshape(-1, 2)
+        tables = _GOAL_TABLES[size] = (goal_row, goal_col, goal, row, col, pairs)
+    return tables
+
+
+def _board_size(boards: np.ndarray) -> int:
+    size = int(round(boards.shape[1] ** 0.5))
+    if size * size != boards.shape[1]:
+        raise ValueError("boards must have size*size columns")
+    return size
+
+
+def batch_misplaced_tiles(boards: np.ndarray) -> np.ndarray:
+    _, _, goal, _, _, _ = goal_tables(_board_size(boards))
+    return np.count_nonzero((boards != goal) & (boards != 0), axis=1)
+
+
+def batch_manhattan_distance(boards: np.ndarray) -> np.ndarray:
+    goal_row, goal_col, _, row, col, _ = goal_tables(_board_size(boards))
+    distance = np.abs(goal_row[boards] - row) + np.abs(goal_col[boards] - col)
+    return np.where(boards != 0, distance, 0).sum(axis=1)
+
+
+def _line_conflicts(lines: np.ndarray, goal_line: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    size = lines.shape[1]
+    in_line = goal_line[lines] == np.arange(size, dtype=np.int16)[None, :, None]
+    first, second = pairs[:, 0], pairs[:, 1]
+    conflict = (
+        in_line[:, :, first]
+        & in_line[:, :, second]
+        & (lines[:, :, first] > lines[:, :, second])
+    )
+    return conflict.sum(axis=(1, 2))
+
+
+def batch_linear_conflict(boards: np.ndarray) -> np.ndarray:
+    size = _board_size(boards)
+    goal_row, goal_col, _, _, _, pairs = goal_tables(size)
+    grid = boards.reshape(-1, size, size)
+    conflicts = _line_conflicts(grid, goal_row, pairs)
+    conflicts += _line_conflicts(grid.transpose(0, 2, 1), goal_col, pairs)
+    return batch_manhattan_distance(boards) + 2 * conflicts
+
+
+BATCH_HEURISTICS: Dict[Callable, Callable[[np.ndarray], np.ndarray]] = {
+    misplaced_tiles: batch_misplaced_tiles,
+    manhattan_distance: batch_manhattan_distance,
+    linear_conflict: batch_linear_conflict,
+}
+
+
+def unpack_boards(keys, size: int) -> np.ndarray:
+    n = size * size
+    bits = tile_bits(size)
+    if n * bits <= 64:
+        shifts = np.arange(n, dtype=np.uint64) * np.uint64(bits)
+        packed = np.asarray(keys, dtype=np.uint64)[:, None]
+        return ((packed >> shifts) & np.uint64((1 << bits) - 1)).astype(np.uint8)
+    mask = (1 << bits) - 1
+    return np.array(
+        [[(key >> (i * bits)) & mask for i in range(n)] for key in keys], dtype=np.uint8
+    ).reshape(-1, n)
+
+
+def batch_inversion_parity(boards: np.ndarray) -> np.ndarray:
+    n = boards.shape[1]
+    rows = np.arange(boards.shape[0])
+    perm = np.where(boards == 0, n - 1, boards.astype(np.intp) - 1)
+    inverse = np.empty_like(perm)
+    inverse[rows[:, None], perm] = np.arange(n)
+    swaps = np.zeros(len(boards), dtype=np.intp)
+    for i in range(n):
+        j = inverse[:, i].copy()
+        value = perm[:, i].copy()
+        swaps += j != i
+        perm[rows, j] = value
+        perm[:, i] = i
+        inverse[rows, value] = j
+        inverse[:, i] = i
+    blank_pos = np.argmax(boards == 0, axis=1)
+    return (swaps + n - 1 - blank_pos) & 1
+
+
+def batch_is_solvable(boards: np.ndarray) -> np.ndarray:
+    size = _board_size(boards)
+    parity = batch_inversion_parity(boards)
+    if size % 2 == 1:
+        return parity == 0
+    blank_row_from_bottom = size - np.argmax(boards == 0, axis=1) // size
+    return (parity + blank_row_from_bottom) % 2 == 1
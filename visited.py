@@ -0,0 +1,171 @@
+import sys
+from array import array
+from math import factorial
+from typing import Iterator, List
+
+from packed import tile_bits
+
+_MULTIPLIER = 0x9E3779B97F4A7C15
+_WORD = (1 << 64) - 1
+
+
+# Keys are stored whole, so distinct boards never collide. The low 64 bits of a board hold
+# at least two tiles and so are never zero; zero marks an empty slot. Boards wider than 64
+# bits keep their high bits in a parallel column.
+class PackedIndex:
+    __slots__ = ("key_bits", "capacity", "max_load", "size", "slots", "high", "_limit", "_shift")
+
+    def __init__(self, key_bits: int = 64, capacity: int = 1 << 16, max_load: float = 0.5):
+        if not 0 < max_load < 1:
+            raise ValueError("max_load must be between 0 and 1")
+        self.key_bits = key_bits
+        self.max_load = max_load
+        self.size = 0
+        self._allocate(max(capacity, 8))
+
+    def _allocate(self, capacity: int) -> None:
+        capacity = 1 << (capacity - 1).bit_length()
+        self.capacity = capacity
+        self.slots = array("Q", bytes(8 * capacity))
+        if self.key_bits <= 64:
+            self.high = None
+        elif self.key_bits <= 128:
+            self.high = array("Q", bytes(8 * capacity))
+        else:
+            self.high = [0] * capacity
+        self._limit = int(capacity * self.max_load)
+        self._shift = 65 - capacity.bit_length()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, key: int) -> bool:
+        low = key & _WORD
+        high = key >> 64
+        slots = self.slots
+        highs = self.high
+        mask = self.capacity - 1
+        slot = (((low ^ high) * _MULTIPLIER) & _WORD) >> self._shift
+        while True:
+            stored = slots[slot]
+            if not stored:
+                return False
+            if stored == low and (highs is None or highs[slot] == high):
+                return True
+            slot = (slot + 1) & mask
+
+    def add(self, key: int) -> bool:
+        if self.size >= self._limit:
+            self._grow()
+        low = key & _WORD
+        high = key >> 64
+        slots = self.slots
+        highs = self.high
+        mask = self.capacity - 1
+        slot = (((low ^ high) * _MULTIPLIER) & _WORD) >> self._shift
+        while True:
+            stored = slots[slot]
+            if not stored:
+                slots[slot] = low
+                if highs is not None:
+                    highs[slot] = high
+                self.size += 1
+                return True
+            if stored == low and (highs is None or highs[slot] == high):
+                return False
+            slot = (slot + 1) & mask
+
+    def __iter__(self) -> Iterator[int]:
+        highs = self.high
+        for slot, low in enumerate(self.slots):
+            if low:
+                yield low if highs is None else (highs[slot] << 64) | low
+
+    def _grow(self) -> None:
+        keys = list(self)
+        self._allocate(self.capacity * 2)
+        self.size = 0
+        for key in keys:
+            self.add(key)
+
+    def clear(self) -> None:
+        self.size = 0
+        self._allocate(self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        total = self.slots.itemsize * len(self.slots)
+        if isinstance(self.high, array):
+            total += self.high.itemsize * len(self.high)
+        elif self.high is not None:
+            total += sys.getsizeof(self.high) + sum(
+                sys.getsizeof(high) for high in self.high if high
+            )
+        return total
+
+    def bytes_per_entry(self) -> float:
+        return self.nbytes / max(self.size, 1)
+
+
+class RankBitset:
+    __slots__ = ("n", "bits", "shifts", "mask", "factorials", "size")
+
+    def __init__(self, size: int = 3):
+        self.n = size * size
+        bits = tile_bits(size)
+        self.bits = bytearray((factorial(self.n) + 7) // 8)
+        self.shifts = [i * bits for i in range(self.n - 1)]
+        self.mask = (1 << bits) - 1
+        self.factorials = [factorial(self.n - 1 - i) for i in range(self.n - 1)]
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def rank(self, key: int) -> int:
+        mask = self.mask
+        used = 0
+        rank = 0
+        for shift, weight in zip(self.shifts, self.factorials):
+            tile = (key >> shift) & mask
+            rank += (tile - bin(used & ((1 << tile) - 1)).count("1")) * weight
+            used |= 1 << tile
+        return rank
+
+    def __contains__(self, key: int) -> bool:
+        rank = self.rank(key)
+        return bool(self.bits[rank >> 3] & (1 << (rank & 7)))
+
+    def add(self, key: int) -> bool:
+        rank = self.rank(key)
+        bit = 1 << (rank & 7)
+        if self.bits[rank >> 3] & bit:
+            return False
+        self.bits[rank >> 3] |= bit
+        self.size += 1
+        return True
+
+    def clear(self) -> None:
+        self.bits = bytearray(len(self.bits))
+        self.size = 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def bytes_per_entry(self) -> float:
+        return self.nbytes / max(self.size, 1)
+
+
+def make_visited(size: int, capacity: int = 1 << 16, bitset: bool = False):
+    if bitset:
+        if size != 3:
+            raise ValueError("the rank bitset only covers 3x3 boards")
+        return RankBitset(size)
+    return PackedIndex(size * size * tile_bits(size), capacity)
+
+
+def set_bytes_per_entry(keys: List[int]) -> float:
+    visited = set(keys)
+    total = sys.getsizeof(visited) + sum(sys.getsizeof(key) for key in visited)
+    return total / max(len(visited), 1)
@@ -0,0 +1,145 @@
+import os
+import struct
+from array import array
+from collections import deque
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pattern_db import table_dir
+
+MAGIC = b"NPWD"
+VERSION = 1
+SIZES = (2, 3, 4)
+
+_HEADER = struct.Struct("<4sHBxI")
+_TABLES: Dict[int, "WalkingTable"] = {}
+
+
+def default_path(size: int) -> str:
+    return os.path.join(table_dir(), f"walking_{size}x{size}.bin")
+
+
+def _encode(counts: Sequence[int], blank_row: int) -> int:
+    key = blank_row
+    for count in counts:
+        key = (key << 3) | count
+    return key
+
+
+def build_walking_table(size: int) -> Tuple[array, bytearray, array]:
+    n = size
+    goal = [0] * (n * n)
+    for row in range(n):
+        goal[row * n + row] = n
+    goal[n * n - 1] = n - 1
+    keys = array("Q", [_encode(goal, n - 1)])
+    states = [(tuple(goal), n - 1)]
+    distances = bytearray([0])
+    index = {keys[0]: 0}
+    edges: List[Tuple[int, int, int, int]] = []
+    queue = deque([0])
+    while queue:
+        current = queue.popleft()
+        counts, blank_row = states[current]
+        for direction, row in ((0, blank_row - 1), (1, blank_row + 1)):
+            if not 0 <= row < n:
+                continue
+            for group in range(n):
+                if not counts[row * n + group]:
+                    continue
+                child = list(counts)
+                child[row * n + group] -= 1
+                child[blank_row * n + group] += 1
+                key = _encode(child, row)
+                target = index.get(key)
+                if target is None:
+                    target = index[key] = len(states)
+                    keys.append(key)
+                    states.append((tuple(child), row))
+                    distances.append(distances[current] + 1)
+                    queue.append(target)
+                edges.append((current, direction, group, target))
+    transitions = array("i", [-1]) * (len(states) * 2 * n)
+    for current, direction, group, target in edges:
+        transitions[(current * 2 + direction) * n + group] = target
+    return keys, distances, transitions
+
+
+class WalkingTable:
+    __slots__ = ("size", "keys", "distances", "transitions", "index")
+
+    def __init__(self, size: int, keys: array, distances: bytearray, transitions: array):
+        self.size = size
+        self.keys = keys
+        self.distances = distances
+        self.transitions = transitions
+        self.index = {key: i for i, key in enumerate(keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def states(self, tiles: Sequence[int]) -> Tuple[int, int]:
+        n = self.size
+        rows = [0] * (n * n)
+        cols = [0] * (n * n)
+        blank_row = blank_col = 0
+        for pos, tile in enumerate(tiles):
+            row, col = divmod(pos, n)
+            if tile:
+                goal_row, goal_col = divmod(tile - 1, n)
+                rows[row * n + goal_row] += 1
+                cols[col * n + goal_col] += 1
+            else:
+                blank_row, blank_col = row, col
+        return self.index[_encode(rows, blank_row)], self.index[_encode(cols, blank_col)]
+
+    def value(self, tiles: Sequence[int]) -> int:
+        row, col = self.states(tiles)
+        return self.distances[row] + self.distances[col]
+
+    def step(self, state: int, tile_from: int, tile_to: int, group: int) -> int:
+        direction = 0 if tile_from < tile_to else 1
+        return self.transitions[(state * 2 + direction) * self.size + group]
+
+
+def save_walking_table(
+    path: str, size: int, keys: array, distances: bytearray, transitions: array
+) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, size, len(keys)))
+        f.write(keys.tobytes())
+        f.write(distances)
+        f.write(transitions.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_walking_table(path: str) -> WalkingTable:
+    with open(path, "rb") as f:
+        magic, version, size, count = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a walking-distance table")
+        if version != VERSION:
+            raise ValueError(f"{path} has unsupported version {version}")
+        keys = array("Q")
+        keys.frombytes(f.read(count * keys.itemsize))
+        distances = bytearray(f.read(count))
+        transitions = array("i")
+        transitions.frombytes(f.read(count * 2 * size * transitions.itemsize))
+    if len(keys) != count or len(distances) != count or len(transitions) != count * 2 * size:
+        raise ValueError(f"{path} is truncated")
+    return WalkingTable(size, keys, distances, transitions)
+
+
+def load_walking_table(size: int) -> Optional[WalkingTable]:
+    if size not in SIZES:
+        return None
+    table = _TABLES.get(size)
+    if table is None:
+        path = default_path(size)
+        if not os.path.exists(path):
+            save_walking_table(path, size, *build_walking_table(size))
+        table = _TABLES[size] = read_walking_table(path)
+    return table